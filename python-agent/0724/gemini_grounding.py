@@ -1,6 +1,17 @@
+import sys
+from pathlib import Path
+
+# Add repository root to Python path (for the shared utils package)
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 from agno.agent import Agent
 from agno.models.google import Gemini
+from utils.response_cache import CachedAgent, ResponseCache
+
+# Each run answers one prompt, so the cache is kept on disk across runs
+CACHE_PATH = str(Path(__file__).resolve().parent / "storage" / "response_cache.jsonl")
 
 # Grounding build applications that can:
 # 1. Increase factual accuracy: Reduce model hallucinations by basing responses on real world information.
@@ -14,4 +25,6 @@ agent = Agent(
     debug_mode=True,
 )
 
-agent.print_response("What's happening in Chengdu?", stream=True)
+# Grounded answers are cached with a short TTL since they reflect real-time information
+cached_agent = CachedAgent(agent, ResponseCache(path=CACHE_PATH))
+cached_agent.print_response("What's happening in Chengdu?", stream=True)
@@ -1,5 +1,17 @@
+import sys
+from pathlib import Path
+
+# Add repository root to Python path (for the shared utils package)
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
 from agno.agent import Agent
 from agno.models.google import Gemini
+from utils.response_cache import CachedAgent, ResponseCache
+
+# Each run answers one prompt, so the cache is kept on disk across runs
+CACHE_PATH = str(Path(__file__).resolve().parent / "storage" / "response_cache.jsonl")
 
 
 agent = Agent(
@@ -10,4 +22,5 @@ agent = Agent(
     debug_mode=True,
 )
 
-agent.print_response("Tell me a 2 sentence horror story.", stream=True)
+cached_agent = CachedAgent(agent, ResponseCache(path=CACHE_PATH))
+cached_agent.print_response("Tell me a 2 sentence horror story.", stream=True)
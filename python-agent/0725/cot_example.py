@@ -3,14 +3,16 @@ import sys
 import getpass
 from pathlib import Path
 
-# Add parent directory to Python path
-project_root = str(Path(__file__).parent.parent)
+# Add repository root to Python path (for the shared utils package)
+project_root = str(Path(__file__).resolve().parents[2])
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from utils.proxy_tool import ProxyTool
-from agno.agent import Agent
-from agno.models.google import Gemini
+from utils.proxy_tool import ProxyPool
+from utils.response_cache import CachedAgent, ResponseCache, gemini_embed_fn
+from utils.context_cache import ContextCacheManager, GeminiContextCacheBackend
+from utils.session_memory import SessionAgent, SqliteSessionStore
+from flower_prompts import role_prompt, system_cot_template
 
 def _set_env(var: str):
     if not os.environ.get(var):
@@ -20,38 +22,45 @@ def _set_env(var: str):
 # Set google api key
 _set_env("GOOGLE_API_KEY")
 
-# Set and enable proxy
-ProxyTool.set_proxy()
-ProxyTool.enable_proxy()
-
-# 设定 AI 的角色和目标
-role_prompt = "你是一个为花店电商公司工作的AI助手,你的目标 是帮助客户根据他们的喜好做出明智的鲜花购买决策"
-
-# COT的部分， AI解释推理过程并加入一些先前的对话示例 (Few-Shot Leanring)
-# COT 的模板
-system_cot_template = """
-作为一个为花店电商公司工作的AI助手，我的目标是帮助客户根据他们的喜好做出明智的决定。
-
-我会按部就班的思考，先理解客户的需求，然后考虑各种鲜花的涵义，最后根据这个需求，给出我的推荐。
-同时，我也会向客户解释我这样推荐的原因。
-
-示例 1:
-人类：我想找一种象征爱情的花。
-AI：首先，我理解你正在寻找一种可以象征爱情的花。在许多文化中，红玫瑰被视为爱情的象征，这是因为它们的红色通常与热情和浓烈的感情联系在一起。因此，考虑到这一点，我会推荐红玫瑰。红玫瑰不仅能够象征爱情，同时也可以传达出强烈的感情，这是你在寻找的。
-
-示例 2:
-人类：我想要一些独特和奇特的花。
-AI：从你的需求中，我理解你想要的是独一无二和引人注目的花朵。兰花是一种非常独特并且颜色鲜艳的花，它们在世界上的许多地方都被视为奢侈品和美的象征。因此，我建议你考虑兰花。选择兰花可以满足你对独特和奇特的要求，而且，兰花的美丽和它们所代表的力量和奢侈也可能会吸引你。
-"""
+# Route Gemini clients through the proxy pool (per client, no global environment changes)
+proxy_pool = ProxyPool()
+gemini_client_params = proxy_pool.gemini_client_params()
 
 # Usage a simple agent to test the setup
-agent = Agent(
-    model=Gemini(id="gemini-2.5-flash"),
+# The long few-shot system prompt is uploaded once as Gemini cached content and
+# referenced by handle on every request (falls back to inline if caching is unavailable)
+context_cache = ContextCacheManager(GeminiContextCacheBackend(client_params=gemini_client_params), ttl_seconds=3600)
+agent = context_cache.build_agent(
+    "gemini-2.5-flash",
     description=role_prompt,
     instructions=[system_cot_template],
     markdown=True,
+    model_params={"client_params": gemini_client_params},
     debug_mode=True,
 )
 
+# Cache answers: exact prompt matches plus embedding-similar questions
+cached_agent = CachedAgent(agent, ResponseCache(embed_fn=gemini_embed_fn(client_params=gemini_client_params)))
+
 human_promopt = "我想为我的情人购买一些花。她喜欢粉色和紫色，你有什么好的建议吗？"
-agent.print_response(human_promopt, stream=True)
+cached_agent.print_response(human_promopt, stream=True)
+
+# A near-identical question is answered from the cache
+cached_agent.print_response("我想给我的情人买些花，她喜欢粉色和紫色，有什么好的建议吗", stream=True)
+print(cached_agent.get_stats())
+
+# Multi-turn shopping assistant: history is persisted in SQLite, only the recent
+# turns plus a running summary of older ones are sent, so each turn costs about the same
+session_agent = SessionAgent(agent, SqliteSessionStore("flower_sessions.db"), window_turns=6)
+session_id = "customer-001"
+for question in [
+    "我想为我的情人购买一些花。她喜欢粉色和紫色，你有什么好的建议吗？",
+    "预算大概300元，下周五是我们的纪念日",
+    "那你刚才推荐的花能配一张卡片吗？",
+]:
+    session_agent.print_response(question, session_id=session_id, stream=True)
+print(session_agent.get_usage(session_id))
+session_agent.close()
+
+# Delete the cached context instead of waiting for its TTL
+context_cache.close()
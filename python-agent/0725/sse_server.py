@@ -0,0 +1,63 @@
+import os
+import sys
+import getpass
+from pathlib import Path
+
+# Add repository root to Python path (for the shared utils package)
+project_root = str(Path(__file__).resolve().parents[2])
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from agno.agent import Agent
+from agno.models.google import Gemini
+from utils.proxy_tool import ProxyPool
+from utils.sse_stream import AgentStreamer, create_sse_app
+from flower_prompts import role_prompt, system_cot_template
+
+if not os.environ.get("GOOGLE_API_KEY"):
+    os.environ["GOOGLE_API_KEY"] = getpass.getpass("GOOGLE_API_KEY: ")
+
+proxy_pool = ProxyPool()
+gemini_client_params = proxy_pool.gemini_client_params()
+
+
+# Each stream gets a fresh agent: agno agents keep per-run state
+def flower_agent() -> Agent:
+    return Agent(
+        model=Gemini(id="gemini-2.5-flash", client_params=gemini_client_params),
+        description=role_prompt,
+        instructions=[system_cot_template],
+        markdown=True,
+    )
+
+
+# The storyteller and grounded search agents from 0724
+def story_agent() -> Agent:
+    return Agent(
+        model=Gemini(id="gemini-2.5-flash", client_params=gemini_client_params),
+        description="You are a famous short shory writer asked to write for a magazine",
+        instructions=["You are a pilot on a plane flying from Hawaii to China."],
+        markdown=True,
+    )
+
+
+def grounding_agent() -> Agent:
+    return Agent(
+        model=Gemini(id="gemini-2.5-flash", search=True, client_params=gemini_client_params),
+        description="You are a helpful assistant.",
+    )
+
+
+app = create_sse_app(
+    {"flower": flower_agent, "story": story_agent, "grounding": grounding_agent},
+    AgentStreamer(max_streams=200, buffer_chunks=64, slow_client_timeout=30.0),
+)
+
+# Run: uvicorn sse_server:app --port 8000
+# Try: curl -N -X POST localhost:8000/agents/flower/stream -H 'Content-Type: application/json' \
+#        -d '{"message": "我想为我的情人购买一些花。她喜欢粉色和紫色，你有什么好的建议吗？"}'
+# Per-stream TTFT and tokens/sec arrive in the final "done" event; totals at GET /stats
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Measure memory held by conversion results on a large synthetic job
+"""
+
+import os
+import sys
+import tracemalloc
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+from utils.page_result import PageResult
+
+
+def _page_content(page_num: int, size: int) -> str:
+    """Build synthetic page markdown of roughly the given size"""
+    line = f"| row {page_num} | some converted table text |\n"
+    return f"# Page {page_num}\n\n" + line * (size // len(line))
+
+
+def measure(tool: LLMPdf2MarkdownTool, num_pages: int, page_size: int, compact: bool) -> int:
+    """Return bytes retained by the result of a synthetic job"""
+    tracemalloc.start()
+    results = []
+    for page_num in range(1, num_pages + 1):
+        fields = {
+            'page_num': page_num,
+            'content': _page_content(page_num, page_size),
+            'status': 'success',
+            'image_path': f"storage/pdf2images/0123456789abcdef/dpi72_q80_jpeg/page_{page_num:03d}.jpg"
+        }
+        results.append(PageResult(**fields) if compact else fields)
+
+    if compact:
+        result = tool._build_conversion_result({'success': True, 'results': results})
+    else:
+        # Previous behaviour: per-page dicts plus an eagerly combined copy
+        result = {'success': True, 'results': results, 'combined_markdown': tool._combine_markdown_results(results)}
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    """Compare dict results with compact page records"""
+    with patch('utils.llm_pdf2md_tool.getpass.getpass', return_value="benchmark"):
+        tool = LLMPdf2MarkdownTool(api_key="benchmark")
+
+    num_pages, page_size = 5000, 2000
+    before = measure(tool, num_pages, page_size, compact=False)
+    after = measure(tool, num_pages, page_size, compact=True)
+
+    print(f"Synthetic job: {num_pages} pages x ~{page_size} bytes")
+    print(f"Dict results + eager combined_markdown: {before / 1024 / 1024:.1f} MiB")
+    print(f"PageResult + lazy combined_markdown:    {after / 1024 / 1024:.1f} MiB")
+    print(f"Reduction: {(1 - after / before) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
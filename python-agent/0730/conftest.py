@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Shared pytest fixtures for the 0730 tests
+"""
+
+import pytest
+import fitz
+
+
+@pytest.fixture
+def make_pdf():
+    """Factory creating small text PDFs; returns the path as a string"""
+    def make(path, num_pages=3, texts=None):
+        if texts is None:
+            texts = [f"Test page {i + 1}" for i in range(num_pages)]
+        doc = fitz.open()
+        for text in texts:
+            page = doc.new_page()
+            page.insert_text((72, 72), text)
+        doc.save(path)
+        doc.close()
+        return str(path)
+    return make
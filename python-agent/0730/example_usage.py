@@ -40,8 +40,7 @@ def example_basic_usage():
             
             # Save to file
             output_file = "storage/output_basic.md"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(result['combined_markdown'])
+            result.write_markdown(output_file)  # also writes the page index <output_file>.pages.json
             print(f"💾 Markdown saved to: {output_file}")
         else:
             print(f"❌ Conversion failed: {result['error']}")
@@ -82,8 +81,7 @@ def example_custom_prompt():
             
             # Save to file
             output_file = "sample/output_custom_prompt.md"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(result['combined_markdown'])
+            result.write_markdown(output_file)  # also writes the page index <output_file>.pages.json
             print(f"💾 Markdown saved to: {output_file}")
         else:
             print(f"❌ Conversion failed: {result['error']}")
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for offline batch conversion
+"""
+
+import os
+import sys
+import json
+import pytest
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.batch_tool import (
+    LocalBatchClient, build_batch_request, parse_batch_output_line,
+    page_custom_id, page_num_from_custom_id, wait_for_batch
+)
+from utils.cancellation import CancellationToken, ConversionCancelled
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+
+class TestBatchTool:
+    """Test class for batch helpers"""
+
+    def test_custom_id_round_trip(self):
+        """Test page numbers survive the custom_id mapping"""
+        assert page_custom_id(7) == "page-00007"
+        assert page_num_from_custom_id(page_custom_id(123)) == 123
+
+    def test_build_batch_request(self, tmp_path):
+        """Test requests embed the image and carry generation settings"""
+        image_path = tmp_path / "page_001.png"
+        image_path.write_bytes(b"\x89PNG")
+        request = build_batch_request("page-00001", "qwen-vl-plus", "Convert", str(image_path),
+                                      temperature=0.1, max_tokens=512)
+
+        assert request['custom_id'] == "page-00001"
+        assert request['body']['model'] == "qwen-vl-plus"
+        assert request['body']['max_tokens'] == 512
+        image_url = request['body']['messages'][0]['content'][1]['image_url']['url']
+        assert image_url.startswith("data:image/png;base64,")
+        json.dumps(request)
+
+    def test_parse_batch_output_line(self):
+        """Test successful, failed and malformed output lines"""
+        ok = {'custom_id': 'page-00001',
+              'response': {'status_code': 200, 'body': {'choices': [{'message': {'content': '# One'}}]}}}
+        failed = {'custom_id': 'page-00002', 'response': None, 'error': {'message': 'rate limited'}}
+        http_error = {'custom_id': 'page-00003', 'response': {'status_code': 500, 'body': {}}}
+
+        assert parse_batch_output_line(ok) == ('page-00001', '# One', None)
+        assert parse_batch_output_line(failed) == ('page-00002', None, 'rate limited')
+        assert parse_batch_output_line(http_error)[2].startswith("HTTP 500")
+
+    def test_wait_for_batch_times_out(self, tmp_path):
+        """Test polling gives up after the timeout"""
+        client = LocalBatchClient(lambda body: "", str(tmp_path), polls_until_complete=100)
+        batch_file = tmp_path / "in.jsonl"
+        batch_file.write_text("")
+        batch_id = client.submit(str(batch_file))
+
+        with pytest.raises(TimeoutError):
+            wait_for_batch(client, batch_id, poll_interval=0.01, timeout=0.02)
+
+    def test_wait_for_batch_stops_on_cancel(self, tmp_path):
+        """Test polling stops as soon as the token is cancelled"""
+        client = LocalBatchClient(lambda body: "", str(tmp_path), polls_until_complete=100)
+        batch_file = tmp_path / "in.jsonl"
+        batch_file.write_text("")
+        batch_id = client.submit(str(batch_file))
+        token = CancellationToken()
+        token.cancel_after(0.05)
+
+        with pytest.raises(ConversionCancelled):
+            wait_for_batch(client, batch_id, poll_interval=10, cancel_token=token)
+
+
+class TestBatchConversion:
+    """Test class for LLMPdf2MarkdownTool batch mode"""
+
+    @pytest.fixture
+    def tool(self, tmp_path):
+        """Create a test instance of LLMPdf2MarkdownTool"""
+        return LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path / "storage"))
+
+    def test_convert_pdf_to_markdown_batch(self, tool, tmp_path, make_pdf):
+        """Test pages are submitted in one batch and mapped back in order"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf")
+        calls = []
+
+        def handler(body):
+            calls.append(body)
+            if len(calls) == 2:
+                raise RuntimeError("content filtered")
+            return f"# Page content {len(calls)}"
+
+        client = LocalBatchClient(handler, str(tmp_path / "batches"), polls_until_complete=1)
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01)
+
+        assert result['success'] is True
+        assert result['batch_status'] == 'completed'
+        assert len(calls) == 3
+        assert [r['page_num'] for r in result['results']] == [1, 2, 3]
+        assert result['successful_pages'] == 2
+        assert result['failed_pages'] == 1
+        assert result['results'][1]['error'] == "content filtered"
+        assert "## Page 1" in result['combined_markdown']
+
+    def test_batch_failure_marks_pages_failed(self, tool, tmp_path, make_pdf):
+        """Test pages of a failed batch are reported as errors"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=2)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"))
+        client.get_status = lambda batch_id: 'failed'
+
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01)
+
+        assert result['batch_status'] == 'failed'
+        assert result['failed_pages'] == 2
+
+    def test_batch_file_is_removed_after_submit(self, tool, tmp_path, make_pdf):
+        """Test the uploaded JSONL does not stay in storage"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=1)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"))
+
+        tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01)
+
+        batch_dir = os.path.join(tool.pdf2image_tool.base_path, 'batches')
+        assert not os.path.exists(batch_dir) or os.listdir(batch_dir) == []
+
+    def test_expired_batch_keeps_finished_pages(self, tool, tmp_path, make_pdf):
+        """Test the partial output of an expired batch is used"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=2)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"))
+        fetch_results = client.fetch_results
+        client.get_status = lambda batch_id: 'expired'
+        client.fetch_results = lambda batch_id: fetch_results(batch_id)[:1]
+
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01)
+
+        assert result['batch_status'] == 'expired'
+        assert result['successful_pages'] == 1
+        assert result['results'][1]['error'] == "Batch expired: no result for page"
+
+    def test_timeout_cancels_batch(self, tool, tmp_path, make_pdf):
+        """Test a batch that outlives the timeout is cancelled and reported by ID"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=1)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"), polls_until_complete=100)
+
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01,
+                                                    timeout=0.02)
+
+        assert result['success'] is False
+        assert result['batch_status'] == 'cancelling'
+        assert client.get_status(result['batch_id']) == 'cancelled'
+
+    def test_cancelled_token_submits_nothing(self, tool, tmp_path, make_pdf):
+        """Test a job cancelled before submission uploads no batch"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=2)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"))
+        client.submit = lambda path: pytest.fail("a cancelled job must not submit a batch")
+        token = CancellationToken()
+        token.cancel()
+
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, cancel_token=token)
+
+        assert result['cancel_reason'] == "cancelled by caller"
+        assert result['unprocessed_pages'] == [1, 2]
+
+    def test_cancel_token_cancels_running_batch(self, tool, tmp_path, make_pdf):
+        """Test cancelling the token while waiting cancels the submitted batch"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=1)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"), polls_until_complete=100)
+        token = CancellationToken()
+        token.cancel_after(0.05, reason="client disconnected")
+
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01,
+                                                    cancel_token=token)
+
+        assert result['success'] is False
+        assert result['cancel_reason'] == "client disconnected"
+        assert result['batch_status'] == 'cancelling'
+        assert client.get_status(result['batch_id']) == 'cancelled'
+
+    def test_resume_batch_after_timeout(self, tool, tmp_path, make_pdf):
+        """Test a timed-out batch can be collected later by its ID"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=2)
+        client = LocalBatchClient(lambda body: "# ok", str(tmp_path / "batches"), polls_until_complete=3)
+
+        first = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01,
+                                                   timeout=0.005, cancel_on_timeout=False)
+        assert first['success'] is False and first['batch_status'] == 'timeout'
+
+        client.submit = lambda path: pytest.fail("resuming must not submit a new batch")
+        result = tool.convert_pdf_to_markdown_batch(pdf_path, batch_client=client, poll_interval=0.01,
+                                                    batch_id=first['batch_id'])
+
+        assert result['batch_id'] == first['batch_id']
+        assert result['batch_status'] == 'completed'
+        assert result['successful_pages'] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
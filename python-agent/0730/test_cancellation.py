@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for cancellation tokens and job timeouts
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from agno.run.response import RunEvent
+
+from utils.cancellation import CancellationToken, ConversionCancelled
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+from utils.page_scheduler import PageScheduler
+from utils.pdf2image_tool import pdf2imageTool
+
+
+
+class TestCancellationToken:
+    """Test class for CancellationToken"""
+
+    def test_first_reason_wins(self):
+        """Test cancellation is sticky and keeps the first reason"""
+        token = CancellationToken()
+        reasons = []
+        token.add_callback(reasons.append)
+
+        assert token.cancel("stop") is True
+        assert token.cancel("again") is False
+        assert token.cancelled and token.reason == "stop"
+        assert reasons == ["stop"]
+        with pytest.raises(ConversionCancelled):
+            token.raise_if_cancelled()
+
+    def test_cancel_after_and_dispose(self):
+        """Test timeouts cancel the token unless disposed first"""
+        token = CancellationToken()
+        token.cancel_after(0.05)
+        assert token.wait(2)
+        assert token.reason == "timeout exceeded"
+
+        disposed = CancellationToken()
+        disposed.cancel_after(0.05)
+        disposed.dispose()
+        assert not disposed.wait(0.2)
+
+    def test_linked_token(self):
+        """Test a linked token follows its parent until disposed"""
+        parent = CancellationToken()
+        child = CancellationToken.linked(parent)
+        detached = CancellationToken.linked(parent)
+        detached.dispose()
+
+        parent.cancel("client disconnected")
+
+        assert child.reason == "client disconnected"
+        assert not detached.cancelled
+
+    def test_wrap_activates_token_on_worker(self):
+        """Test wrapped tasks see the token on their own thread"""
+        token = CancellationToken()
+        seen = []
+        worker = threading.Thread(target=token.wrap(lambda: seen.append(CancellationToken.current())))
+        worker.start()
+        worker.join()
+
+        assert seen == [token]
+        assert CancellationToken.current() is None
+
+
+class TestConversionCancellation:
+    """Test class for cancelling LLMPdf2MarkdownTool jobs"""
+
+    @pytest.fixture
+    def tool(self, tmp_path):
+        """Create a tool with one worker and a private storage folder"""
+        return LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path),
+                                   scheduler=PageScheduler(max_workers=1))
+
+    def test_timeout_abandons_in_flight_pages(self, tool, tmp_path, make_pdf):
+        """Test a timeout returns promptly with every unfinished page listed"""
+        release = threading.Event()
+        tool.agent.run = Mock(side_effect=lambda *args, **kwargs: release.wait(5))
+        pdf_path = make_pdf(tmp_path / "slow.pdf")
+
+        try:
+            start = time.time()
+            result = tool.convert_pdf_to_markdown(pdf_path, timeout=0.2)
+            elapsed = time.time() - start
+        finally:
+            release.set()
+
+        assert elapsed < 2
+        assert result['success'] is True
+        assert result['cancelled'] is True
+        assert result['cancel_reason'] == "timeout exceeded"
+        assert result['unprocessed_pages'] == [1, 2, 3]
+        assert tool.agent.run.call_count == 1
+
+    def test_cancelled_token_skips_rendering(self, tool, tmp_path, make_pdf):
+        """Test a job cancelled up front renders and converts nothing"""
+        token = CancellationToken()
+        token.cancel()
+        tool.agent.run = Mock()
+
+        result = tool.convert_pdf_to_markdown(make_pdf(tmp_path / "doc.pdf"), cancel_token=token)
+
+        assert result['success'] is True
+        assert result['cancel_reason'] == "cancelled by caller"
+        assert result['unprocessed_pages'] == [1, 2, 3]
+        assert result['total_pages'] == 3
+        tool.agent.run.assert_not_called()
+
+    def test_uncancelled_job_has_no_cancel_info(self, tool, tmp_path, make_pdf):
+        """Test normal jobs report no cancellation"""
+        run = Mock()
+        run.content = "# Page"
+        tool.agent.run = Mock(return_value=run)
+
+        result = tool.convert_pdf_to_markdown(make_pdf(tmp_path / "doc.pdf", 2), timeout=30)
+
+        assert 'cancelled' not in result
+        assert result['unprocessed_pages'] == []
+        assert result['successful_pages'] == 2
+
+    def test_stream_stops_on_cancel(self, tool):
+        """Test a streamed page stops reading once its job is cancelled"""
+        token = CancellationToken()
+        events = (SimpleNamespace(event=RunEvent.run_response_content.value, content=f"chunk {i}\n")
+                  for i in range(10))
+
+        def partial(delta, text):
+            if text.count("chunk") == 2:
+                token.cancel("client disconnected")
+
+        with token.activate(), pytest.raises(ConversionCancelled):
+            tool._consume_stream(events, on_partial=partial)
+
+    def test_cancelled_probe_keeps_endpoint_recoverable(self, tmp_path):
+        """Test cancelling a job during a recovery probe lets the endpoint be probed again"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path),
+                                   endpoints=[{'base_url': 'http://a/v1'}],
+                                   circuit_failure_threshold=1, circuit_recovery_timeout=0)
+        tool.endpoint_pool.record_failure(tool.endpoint_pool.endpoints[0])
+        agent = tool._get_endpoint_agent('http://a/v1', 'test_api_key', tool.model_id)
+        agent.run = Mock(side_effect=ConversionCancelled("client disconnected"))
+
+        with pytest.raises(ConversionCancelled):
+            tool._run_agent("prompt", Mock())
+        assert tool.get_endpoint_health()[0]['state'] == 'open'
+
+        agent.run = Mock(return_value=SimpleNamespace(content="# Page"))
+        assert tool._run_agent("prompt", Mock()).content == "# Page"
+        assert tool.get_endpoint_health()[0]['state'] == 'closed'
+
+    def test_rendering_stops_on_cancel(self, tmp_path, make_pdf):
+        """Test rendering returns the pages rendered before cancellation"""
+        image_tool = pdf2imageTool(base_storage_path=str(tmp_path))
+        token = CancellationToken()
+        render_page = image_tool._render_page
+
+        def render_then_cancel(page, image_path, clip=None, cancel_token=None):
+            rendered = render_page(page, image_path, clip, cancel_token)
+            token.cancel()
+            return rendered
+
+        image_tool._render_page = render_then_cancel
+        images = image_tool.convert_pdf_to_images(make_pdf(tmp_path / "doc.pdf", 4), cancel_token=token)
+
+        assert len(images) == 1
+
+    def test_progressive_timeout_covers_preview(self, tool, tmp_path, make_pdf):
+        """Test a progressive timeout abandons preview pages still in flight"""
+        release = threading.Event()
+        tool.agent.run = Mock(side_effect=lambda *args, **kwargs: release.wait(5))
+
+        try:
+            start = time.time()
+            conversion = tool.convert_pdf_progressively(make_pdf(tmp_path / "doc.pdf"), preview_pages=2,
+                                                        timeout=0.2)
+            elapsed = time.time() - start
+            result = conversion.result(timeout=5)
+        finally:
+            release.set()
+
+        assert elapsed < 2
+        assert conversion.preview['cancel_reason'] == "timeout exceeded"
+        assert result['cancelled'] is True
+        assert result['unprocessed_pages'] == [1, 2, 3]
+        assert tool.agent.run.call_count == 1
+
+    def test_progressive_cancel_token(self, tool, tmp_path, make_pdf):
+        """Test cancelling the caller's token stops the remainder of a progressive job"""
+        token = CancellationToken()
+        run = Mock()
+        run.content = "# Page"
+
+        def run_then_cancel(*args, **kwargs):
+            token.cancel("client disconnected")
+            return run
+
+        tool.agent.run = Mock(side_effect=run_then_cancel)
+        conversion = tool.convert_pdf_progressively(make_pdf(tmp_path / "doc.pdf"), preview_pages=1,
+                                                    cancel_token=token)
+        result = conversion.result(timeout=5)
+
+        assert result['cancel_reason'] == "client disconnected"
+        assert result['successful_pages'] == 1
+        assert result['unprocessed_pages'] == [2, 3]
+        assert tool.agent.run.call_count == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
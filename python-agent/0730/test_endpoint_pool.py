@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for endpoint load balancing and circuit breakers
+"""
+
+import os
+import sys
+import time
+import pytest
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.endpoint_pool import CircuitBreaker, EndpointPool, NoHealthyEndpointError
+
+
+class TestCircuitBreaker:
+    """Test class for CircuitBreaker"""
+
+    def test_opens_after_threshold(self):
+        """Test the circuit opens after consecutive failures"""
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10)
+        breaker.record_failure(0)
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure(0)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_half_open_probe(self):
+        """Test recovery probing after the timeout"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+        breaker.record_failure(0)
+        assert not breaker.try_probe(5)
+        assert breaker.try_probe(10)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        breaker.record_failure(11)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.try_probe(21)
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_released_probe_reopens(self):
+        """Test a probe released without a verdict reopens the circuit with its original cooldown"""
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+        breaker.record_failure(0)
+        assert breaker.try_probe(10)
+
+        breaker.release_probe()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.opened_at == 0
+        assert breaker.try_probe(10)
+
+
+class TestEndpointPool:
+    """Test class for EndpointPool"""
+
+    @pytest.fixture
+    def pool(self):
+        """Create a two-endpoint pool"""
+        return EndpointPool(
+            [{'base_url': 'http://a', 'weight': 3}, {'base_url': 'http://b', 'api_key': 'key_b'}],
+            default_api_key='default_key',
+            failure_threshold=1,
+            recovery_timeout=60
+        )
+
+    def test_default_api_key(self, pool):
+        """Test endpoints without a key use the default"""
+        assert [e.api_key for e in pool.endpoints] == ['default_key', 'key_b']
+
+    def test_failed_endpoint_is_skipped(self, pool):
+        """Test traffic stops going to an endpoint with an open circuit"""
+        pool.record_failure(pool.endpoints[0])
+        assert all(pool.acquire().base_url == 'http://b' for _ in range(20))
+
+    def test_no_healthy_endpoint(self, pool):
+        """Test an error is raised when every circuit is open"""
+        for endpoint in pool.endpoints:
+            pool.record_failure(endpoint)
+        with pytest.raises(NoHealthyEndpointError):
+            pool.acquire()
+
+    def test_health_stats(self, pool):
+        """Test health statistics"""
+        pool.record_success(pool.endpoints[0], 0.5)
+        pool.record_failure(pool.endpoints[1])
+        stats = pool.get_health_stats()
+
+        assert stats[0]['state'] == 'closed'
+        assert stats[0]['avg_latency_seconds'] == 0.5
+        assert stats[1]['state'] == 'open'
+        assert stats[1]['failures'] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
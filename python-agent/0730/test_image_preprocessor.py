@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for page image preprocessing
+"""
+
+import os
+import sys
+import pytest
+from unittest.mock import Mock
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.image_preprocessor import ImagePreprocessor
+from utils.pdf2image_tool import pdf2imageTool
+
+
+def _page(width=200, height=300):
+    """Create a white RGB page array"""
+    return np.full((height, width, 3), 255, dtype=np.uint8)
+
+
+class TestImagePreprocessor:
+    """Test class for ImagePreprocessor"""
+
+    def test_crops_margins_with_padding(self):
+        """Test whitespace around the content is removed"""
+        page = _page()
+        page[100:120, 50:150] = 0
+        img, info = ImagePreprocessor(padding=5).process(Image.fromarray(page))
+
+        assert info['cropped'] is True
+        assert img.size == (110, 30)
+
+    def test_blank_page_is_not_cropped(self):
+        """Test a page without content keeps its size"""
+        img, info = ImagePreprocessor().process(Image.fromarray(_page()))
+
+        assert info['cropped'] is False
+        assert img.size == (200, 300)
+
+    def test_text_page_goes_bitonal(self):
+        """Test black-on-white pages are encoded without mid-tones"""
+        page = _page()
+        page[100:120, 50:150] = 0
+        img, info = ImagePreprocessor().process(Image.fromarray(page), image_format='png')
+
+        assert info['color_mode'] == 'bitonal'
+        assert img.mode == '1'
+
+    def test_gray_page_goes_grayscale(self):
+        """Test pages with mid-tones but no color become grayscale"""
+        page = _page()
+        page[50:250, 20:180] = np.linspace(0, 255, 160, dtype=np.uint8)[None, :, None]
+        img, info = ImagePreprocessor().process(Image.fromarray(page))
+
+        assert info['color_mode'] == 'grayscale'
+        assert img.mode == 'L'
+
+    def test_color_page_keeps_color(self):
+        """Test pages with colored content stay RGB"""
+        page = _page()
+        page[100:150, 50:150] = (220, 30, 30)
+        img, info = ImagePreprocessor().process(Image.fromarray(page))
+
+        assert info['color_mode'] == 'color'
+        assert img.mode == 'RGB'
+
+    def test_invalid_color_mode(self):
+        """Test unknown color modes are rejected"""
+        with pytest.raises(ValueError):
+            ImagePreprocessor(color_mode='sepia')
+
+    def test_render_reports_bytes_saved(self, tmp_path, make_pdf):
+        """Test preprocessing shrinks rendered text pages and reports the savings"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", texts=["Preprocessed page"])
+
+        tool = pdf2imageTool(base_storage_path=str(tmp_path / "storage"), preprocessor=ImagePreprocessor())
+        images = tool.convert_pdf_to_images(pdf_path)
+        summary = tool.get_preprocess_summary(images)
+
+        assert "_crop" in tool.render_settings_key()
+        assert summary['preprocessed_pages'] == 1
+        assert summary['bytes_saved'] > 0
+        assert summary['output_bytes'] == os.path.getsize(images[0])
+
+    def test_cache_hits_report_savings(self, tmp_path, make_pdf):
+        """Test a rerun served from the render cache still reports the savings"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", texts=["Preprocessed page"])
+        storage = str(tmp_path / "storage")
+        first = pdf2imageTool(base_storage_path=storage, preprocessor=ImagePreprocessor())
+        images = first.convert_pdf_to_images(pdf_path)
+
+        rerun = pdf2imageTool(base_storage_path=storage, preprocessor=ImagePreprocessor())
+        rerun._render_image = Mock(side_effect=AssertionError("page must come from the cache"))
+
+        assert rerun.convert_pdf_to_images(pdf_path) == images
+        assert rerun.get_preprocess_summary(images) == first.get_preprocess_summary(images)
+
+    @pytest.mark.parametrize("setting", [{'chroma_threshold': 60}, {'color_pixel_ratio': 0.01},
+                                         {'bitonal_midtone_ratio': 0.05}, {'bitonal_threshold': 128}])
+    def test_settings_key_covers_output_settings(self, setting):
+        """Test every setting that changes the output changes the cache key"""
+        assert ImagePreprocessor(**setting).settings_key() != ImagePreprocessor().settings_key()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for per-job profiling
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import pytest
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.batch_tool import LocalBatchClient
+from utils.job_profiler import JobProfiler, profile_stage
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+def _profiled_tool(tmp_path, **kwargs):
+    """Create a profiling tool whose renderer and model are mocked"""
+    image_path = tmp_path / "page_001.jpg"
+    image_path.write_bytes(b"fake image")
+    tool = LLMPdf2MarkdownTool(api_key="test_api_key", profile=True, profile_dir=str(tmp_path / "profiles"),
+                               base_storage_path=str(tmp_path), **kwargs)
+    tool.pdf2image_tool = Mock()
+    tool.pdf2image_tool.base_path = str(tmp_path)
+    tool.pdf2image_tool.convert_pdf_to_images.return_value = [str(image_path)]
+    tool.pdf2image_tool.convert_pdf_bytes_to_images.return_value = [str(image_path)]
+    tool.pdf2image_tool.get_page_count.return_value = 1
+    tool.pdf2image_tool.preprocessor = None
+    run = Mock()
+    run.content = "# Page"
+    tool.agent.run = Mock(return_value=run)
+    return tool
+
+
+class TestJobProfiler:
+    """Test class for JobProfiler"""
+
+    def test_stage_breakdown_and_artifacts(self, tmp_path):
+        """Test stages are timed, profiled and written to disk"""
+        profiler = JobProfiler(str(tmp_path), "job_test")
+        with profiler.activate():
+            with profile_stage('render'):
+                sum(i * i for i in range(10000))
+                with profile_stage('encode'):
+                    time.sleep(0.01)
+        info = profiler.finish()
+
+        assert info['stages']['render']['count'] == 1
+        assert info['stages']['encode']['wall_seconds'] >= 0.01
+        assert info['stages']['render']['top_functions']
+        assert 'top_functions' not in info['stages']['encode']
+        with open(info['stages_path'], encoding='utf-8') as f:
+            assert json.load(f)['job_id'] == "job_test"
+        assert pstats.Stats(info['profile_path']).total_calls > 0
+
+    def test_stages_are_noops_without_profiler(self):
+        """Test stage hooks do nothing when profiling is off"""
+        assert JobProfiler.current() is None
+        with profile_stage('render'):
+            pass
+
+    def test_wrapped_tasks_record_queue_wait(self, tmp_path):
+        """Test wrapped tasks run under the job profiler on another thread"""
+        profiler = JobProfiler(str(tmp_path), "job_wrap", use_cprofile=False)
+        seen = []
+        task = profiler.wrap('page', lambda: seen.append(JobProfiler.current()))
+        task()
+        info = profiler.finish()
+
+        assert seen == [profiler]
+        assert info['stages']['queue_wait']['count'] == 1
+        assert info['stages']['page']['count'] == 1
+        assert info['profile_path'] is None
+
+
+class TestConversionProfiling:
+    """Test class for profiling LLMPdf2MarkdownTool jobs"""
+
+    def test_profiled_conversion(self, tmp_path):
+        """Test a profiled job reports render, page and model call stages"""
+        image_path = tmp_path / "page_001.jpg"
+        image_path.write_bytes(b"fake image")
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", profile=True, profile_dir=str(tmp_path / "profiles"))
+        tool.pdf2image_tool = Mock()
+        tool.pdf2image_tool.convert_pdf_to_images.return_value = [str(image_path)]
+        tool.pdf2image_tool.preprocessor = None
+        run = Mock()
+        run.content = "# Page"
+        tool.agent.run = Mock(return_value=run)
+
+        result = tool.convert_pdf_to_markdown("fake.pdf")
+
+        stages = result['profile']['stages']
+        assert {'render', 'queue_wait', 'page', 'memory_wait', 'model_call'} <= set(stages)
+        assert os.path.exists(result['profile']['stages_path'])
+
+    def test_profiled_bytes_conversion(self, tmp_path):
+        """Test in-memory conversions are profiled"""
+        tool = _profiled_tool(tmp_path)
+
+        result = tool.convert_pdf_bytes_to_markdown(b"%PDF-1.4")
+
+        assert {'render', 'page', 'model_call'} <= set(result['profile']['stages'])
+
+    def test_profiled_progressive_conversion(self, tmp_path):
+        """Test the final progressive result carries the profile of the whole job"""
+        tool = _profiled_tool(tmp_path)
+
+        conversion = tool.convert_pdf_progressively("fake.pdf", preview_pages=1)
+
+        assert 'profile' not in conversion.preview
+        stages = conversion.result(timeout=10)['profile']['stages']
+        assert {'render', 'page', 'model_call'} <= set(stages)
+
+    def test_profiled_batch_conversion(self, tmp_path):
+        """Test batch conversions report render and batch wait stages"""
+        tool = _profiled_tool(tmp_path)
+        client = LocalBatchClient(lambda body: "# Page", str(tmp_path / "batches"))
+
+        result = tool.convert_pdf_to_markdown_batch("fake.pdf", batch_client=client, poll_interval=0.01)
+
+        assert result['success']
+        assert {'render', 'batch_wait'} <= set(result['profile']['stages'])
+
+    def test_hedged_calls_are_profiled(self, tmp_path):
+        """Test model calls on the hedger's threads are recorded for the job"""
+        tool = _profiled_tool(tmp_path, hedge_percentile=90)
+        # Force the primary call onto a hedger thread
+        tool.hedger.tracker.percentile = Mock(return_value=10.0)
+        seen = []
+        run = tool.agent.run.return_value
+        tool.agent.run = Mock(side_effect=lambda *a, **k: seen.append(JobProfiler.current()) or run)
+
+        result = tool.convert_pdf_to_markdown("fake.pdf")
+
+        assert seen and seen[0] is not None
+        assert result['profile']['stages']['model_call']['count'] == 1
+
+    def test_profiling_disabled_by_default(self, tmp_path):
+        """Test results carry no profile unless profiling is enabled"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path))
+        tool.pdf2image_tool = Mock()
+        tool.pdf2image_tool.convert_pdf_to_images.return_value = []
+
+        result = tool.convert_pdf_to_markdown("fake.pdf")
+
+        assert 'profile' not in result
+        assert not os.path.exists(tmp_path / "profiles")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for layout analysis and hybrid conversion
+"""
+
+import os
+import sys
+import pytest
+import fitz
+from unittest.mock import Mock, patch
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.layout_analyzer import LayoutAnalyzer
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+def _make_mixed_pdf(path):
+    """Create a page with a heading, paragraphs, a ruled table and a chart"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "Quarterly Report", fontsize=20)
+    page.insert_text((72, 110), "Revenue grew strongly this quarter across all regions.", fontsize=11)
+    page.insert_text((72, 125), "The table below lists the figures per region.", fontsize=11)
+    for r in range(4):
+        for c in range(3):
+            rect = fitz.Rect(72 + c * 120, 150 + r * 20, 192 + c * 120, 170 + r * 20)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.8)
+            page.insert_text((rect.x0 + 4, rect.y1 - 6), f"R{r}C{c}", fontsize=10)
+    page.draw_circle((200, 400), 50, color=(1, 0, 0), fill=(0.2, 0.4, 0.8))
+    page.insert_text((72, 500), "Closing remarks follow the chart above.", fontsize=11)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _make_two_column_pdf(path):
+    """Create a page with a title over two text columns and a wide footer"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(72, 50, 520, 80), "Two Column Article Title Spanning The Page", fontsize=16)
+    for i, y in enumerate((100, 200, 300)):
+        page.insert_textbox(fitz.Rect(72, y, 280, y + 60), f"Left column paragraph {i + 1} text.", fontsize=11)
+        page.insert_textbox(fitz.Rect(310, y + 10, 520, y + 70), f"Right column paragraph {i + 1} text.",
+                            fontsize=11)
+    page.insert_textbox(fitz.Rect(72, 420, 520, 460),
+                        "Footer note that runs across the whole width of the page below both columns.",
+                        fontsize=11)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _make_scanned_pdf(path):
+    """Create a page that only holds an image (no text layer)"""
+    doc = fitz.open()
+    page = doc.new_page()
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 50, 50), False)
+    pix.clear_with(200)
+    page.insert_image(fitz.Rect(0, 0, page.rect.width, page.rect.height), pixmap=pix)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+class TestLayoutAnalyzer:
+    """Test class for LayoutAnalyzer"""
+
+    def test_mixed_page_regions(self, tmp_path):
+        """Test text, table and figure regions come out in reading order"""
+        with fitz.open(_make_mixed_pdf(tmp_path / "mixed.pdf")) as doc:
+            plan = LayoutAnalyzer().analyze(doc[0])
+
+        assert plan.needs_full_page is False
+        assert [r.kind for r in plan.regions] == ['text', 'text', 'table', 'figure', 'text']
+        assert plan.regions[0].text == "## Quarterly Report"
+        assert "R0C0" not in "".join(r.text or "" for r in plan.regions)
+        assert 0 < plan.vision_area_ratio < 0.2
+
+    def test_two_column_reading_order(self, tmp_path):
+        """Test a column is read to the end before the next one starts"""
+        with fitz.open(_make_two_column_pdf(tmp_path / "columns.pdf")) as doc:
+            plan = LayoutAnalyzer().analyze(doc[0])
+
+        texts = [r.text.lstrip("# ") for r in plan.regions]
+        assert texts[0].startswith("Two Column Article Title")
+        assert texts[1:7] == [f"Left column paragraph {i} text." for i in (1, 2, 3)] + \
+            [f"Right column paragraph {i} text." for i in (1, 2, 3)]
+        assert texts[7].startswith("Footer note")
+
+    def test_merge_overlapping_is_transitive(self):
+        """Test regions joined through a later region end up as one"""
+        regions = [('figure', (0, 0, 10, 10)), ('figure', (20, 0, 30, 10)), ('figure', (5, 5, 25, 8))]
+
+        assert LayoutAnalyzer._merge_overlapping(regions) == [('figure', (0, 0, 30, 10))]
+        assert LayoutAnalyzer._merge_overlapping(regions + [('table', (28, 9, 40, 20))]) == \
+            [('table', (0, 0, 40, 20))]
+
+    def test_scanned_page_is_sent_whole(self, tmp_path):
+        """Test pages without a text layer fall back to full-page conversion"""
+        with fitz.open(_make_scanned_pdf(tmp_path / "scan.pdf")) as doc:
+            plan = LayoutAnalyzer().analyze(doc[0])
+
+        assert plan.needs_full_page is True
+        assert plan.regions == []
+
+
+class TestHybridConversion:
+    """Test class for hybrid layout conversion"""
+
+    @pytest.fixture
+    def tool(self, tmp_path):
+        """Create a test instance of LLMPdf2MarkdownTool"""
+        return LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path / "storage"))
+
+    def test_only_visual_regions_reach_the_model(self, tool, tmp_path):
+        """Test local text and model output are merged in reading order"""
+        pdf_path = _make_mixed_pdf(tmp_path / "mixed.pdf")
+
+        def run_agent(prompt, image_obj, *args, **kwargs):
+            run = Mock()
+            run.content = "| A | B |\n|---|---|" if prompt == tool.TABLE_PROMPT else "Pie chart"
+            return run
+
+        with patch.object(tool, '_run_agent', side_effect=run_agent) as mock_run:
+            result = tool.convert_pdf_to_markdown_hybrid(pdf_path)
+
+        assert result['success'] is True
+        assert mock_run.call_count == 2
+        content = result['results'][0]['content']
+        assert content.index("## Quarterly Report") < content.index("| A | B |") < content.index("Pie chart")
+        assert content.endswith("Closing remarks follow the chart above.")
+        assert result['layout_stats']['vision_regions'] == 2
+        assert result['layout_stats']['full_pages'] == 0
+
+    def test_scanned_page_uses_full_page_prompt(self, tool, tmp_path):
+        """Test scanned pages go through the regular full-page path"""
+        pdf_path = _make_scanned_pdf(tmp_path / "scan.pdf")
+
+        with patch.object(tool, '_run_agent') as mock_run:
+            mock_run.return_value.content = "# Scanned"
+            result = tool.convert_pdf_to_markdown_hybrid(pdf_path)
+
+        assert result['results'][0]['content'] == "# Scanned"
+        assert mock_run.call_args[0][0] == tool.default_prompt
+        assert result['layout_stats']['full_pages'] == 1
+
+    def test_failed_region_marks_page_failed(self, tool, tmp_path):
+        """Test a failed region call is reported on the page"""
+        pdf_path = _make_mixed_pdf(tmp_path / "mixed.pdf")
+
+        with patch.object(tool, '_run_agent', side_effect=RuntimeError("timeout")):
+            result = tool.convert_pdf_to_markdown_hybrid(pdf_path)
+
+        assert result['failed_pages'] == 1
+        assert "table region: timeout" in result['results'][0]['error']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
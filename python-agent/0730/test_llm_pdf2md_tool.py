@@ -5,6 +5,9 @@ Pytest tests for LLM PDF to Markdown tool
 
 import os
 import sys
+import time
+import asyncio
+import threading
 import pytest
 import tempfile
 import shutil
@@ -17,6 +20,7 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
 from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool, retry_on_failure
+from utils.page_result import PageResult
 
 
 class TestLLMPdf2MarkdownTool:
@@ -50,6 +54,43 @@ class TestLLMPdf2MarkdownTool:
         assert tool.max_retries == 2
         assert tool.default_prompt is not None
     
+    def test_hedging_disabled_by_default(self, tool):
+        """Test hedging is opt-in"""
+        assert tool.hedger is None
+        assert tool.get_hedge_stats() is None
+    
+    def test_hedging_enabled(self):
+        """Test hedged tool exposes hedge metrics"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", hedge_percentile=95)
+        mock_run = Mock()
+        mock_run.content = "# Hedged"
+        tool.agent.run = Mock(return_value=mock_run)
+        
+        assert tool._run_agent("prompt", Mock()).content == "# Hedged"
+        assert tool.get_hedge_stats()['calls'] == 1
+    
+    def test_hedge_backup_goes_to_hedge_endpoint(self):
+        """Test backups of escalated and pooled calls use the hedge endpoint"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", hedge_percentile=95,
+                                   hedge_base_url="http://hedge/v1", escalation_model_id="qwen-vl-max",
+                                   endpoints=[{'base_url': 'http://a/v1'}])
+        invoked = []
+        tool._invoke_agent = lambda agent, *args: invoked.append(agent)
+        
+        tool._call_model("prompt", Mock(), hedge=True)
+        tool._call_model("prompt", Mock(), "qwen-vl-max", hedge=True)
+        
+        assert invoked[0] is tool.hedge_agent
+        assert invoked[1].model.base_url == "http://hedge/v1"
+        assert invoked[1].model.id == "qwen-vl-max"
+        assert tool.get_endpoint_health()[0]['requests'] == 0
+    
+    def test_pooled_hedging_requires_hedge_endpoint(self):
+        """Test hedging across an endpoint pool needs a hedge endpoint outside the pool"""
+        with pytest.raises(ValueError):
+            LLMPdf2MarkdownTool(api_key="test_api_key", hedge_percentile=95,
+                                endpoints=[{'base_url': 'http://a/v1'}])
+    
     def test_create_agent(self, tool):
         """Test agent creation"""
         agent = tool._create_agent()
@@ -102,6 +143,90 @@ class TestLLMPdf2MarkdownTool:
         assert result['status'] == 'error'
         assert 'Image creation failed' in result['content']
     
+    @patch('utils.llm_pdf2md_tool.Image')
+    def test_process_single_image_cascade(self, mock_image):
+        """Test low-confidence pages are escalated to the stronger model"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", escalation_model_id="qwen-vl-max")
+        cheap_run = Mock()
+        cheap_run.content = "抱歉，我无法识别图片中的内容。"
+        strong_run = Mock()
+        strong_run.content = "# Recovered Content"
+        tool.agent.run = Mock(return_value=cheap_run)
+        tool.escalation_agent.run = Mock(return_value=strong_run)
+        
+        result = tool._process_single_image("page_003.jpg")
+        
+        assert result['content'] == "# Recovered Content"
+        assert result['escalated'] is True
+        assert result['model_id'] == "qwen-vl-max"
+        assert 'refusal' in result['quality_issues']
+        assert tool._summarize_results([result])['escalated_pages'] == 1
+    
+    def test_endpoint_failover(self):
+        """Test a failing endpoint is skipped and reported as unhealthy"""
+        tool = LLMPdf2MarkdownTool(
+            api_key="test_api_key",
+            max_retries=2,
+            endpoints=[
+                {'base_url': 'http://primary/v1', 'weight': 1000},
+                {'base_url': 'http://secondary/v1', 'weight': 1}
+            ],
+            circuit_failure_threshold=1
+        )
+        mock_run = Mock()
+        mock_run.content = "# Secondary"
+        primary = tool._get_endpoint_agent('http://primary/v1', 'test_api_key', tool.model_id)
+        secondary = tool._get_endpoint_agent('http://secondary/v1', 'test_api_key', tool.model_id)
+        primary.run = Mock(side_effect=ConnectionError("primary down"))
+        secondary.run = Mock(return_value=mock_run)
+        
+        for _ in range(3):
+            assert tool._run_agent("prompt", Mock()).content == "# Secondary"
+        
+        health = tool.get_endpoint_health()
+        assert primary.run.call_count <= 1
+        assert health[0]['state'] == 'open'
+        assert health[1]['requests'] == 3
+    
+    @staticmethod
+    def _content_events(*chunks):
+        """Build streamed content events"""
+        for chunk in chunks:
+            event = Mock()
+            event.event = "RunResponseContent"
+            event.content = chunk
+            yield event
+    
+    @patch('utils.llm_pdf2md_tool.Image')
+    def test_process_single_image_streaming(self, mock_image, tool):
+        """Test streamed pages forward partial output and record TTFT"""
+        tool.agent.run = Mock(return_value=self._content_events("# Title", "\n\nBody"))
+        partials = []
+        
+        result = tool._process_single_image(
+            "page_002.jpg",
+            on_partial=lambda page_num, delta, text: partials.append((page_num, delta, text))
+        )
+        
+        assert result['content'] == "# Title\n\nBody"
+        assert result['ttft_seconds'] is not None
+        assert result['truncated'] is False
+        assert partials == [(2, "# Title", "# Title"), (2, "\n\nBody", "# Title\n\nBody")]
+        tool.agent.run.assert_called_once()
+        assert tool.agent.run.call_args.kwargs['stream'] is True
+    
+    @patch('utils.llm_pdf2md_tool.Image')
+    def test_streaming_token_cap(self, mock_image):
+        """Test runaway generations are aborted at the token cap"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", stream=True, max_output_tokens=5)
+        tool.agent.run = Mock(return_value=self._content_events(*["一二三"] * 10))
+        
+        result = tool._process_single_image("page_001.jpg")
+        
+        assert result['truncated'] is True
+        assert result['content'] == "一二三一二三"
+        assert result['output_tokens'] == 6
+    
     def test_combine_markdown_results(self, tool):
         """Test markdown results combination"""
         results = [
@@ -170,6 +295,26 @@ class TestLLMPdf2MarkdownTool:
             assert 'Page 1 Content' in result['combined_markdown']
             assert 'Page 2 Content' in result['combined_markdown']
     
+    def test_convert_pdf_to_markdown_lazy_combined(self, tool):
+        """Test combined markdown is produced on demand from typed page results"""
+        mock_tool_instance = Mock()
+        mock_tool_instance.convert_pdf_to_images.return_value = ["page_002.jpg", "page_001.jpg"]
+        tool.pdf2image_tool = mock_tool_instance
+        
+        with patch.object(tool, '_process_single_image') as mock_process:
+            mock_process.side_effect = lambda image_path, *args: PageResult(
+                page_num=tool._page_num_from_path(image_path),
+                content=f"# {image_path}",
+                status='success',
+                image_path=image_path
+            )
+            result = tool.convert_pdf_to_markdown("fake.pdf")
+        
+        assert all(isinstance(r, PageResult) for r in result['results'])
+        assert 'combined_markdown' not in dict(result)
+        assert "".join(result.iter_markdown()) == result['combined_markdown']
+        assert result['combined_markdown'].index("Page 1") < result['combined_markdown'].index("Page 2")
+    
     @patch('utils.llm_pdf2md_tool.pdf2imageTool')
     def test_convert_pdf_to_markdown_no_images(self, mock_pdf2image, tool, sample_pdf_path):
         """Test PDF to markdown conversion with no images generated"""
@@ -183,6 +328,99 @@ class TestLLMPdf2MarkdownTool:
         assert result['success'] is False
         assert 'No images generated' in result['error']
     
+    def test_convert_pdf_to_markdown_past_deadline(self, tool):
+        """Test pages are cancelled when the deadline cannot be met"""
+        mock_tool_instance = Mock()
+        mock_tool_instance.convert_pdf_to_images.return_value = [
+            "page_001.jpg",
+            "page_002.jpg"
+        ]
+        tool.pdf2image_tool = mock_tool_instance
+        
+        with patch.object(tool, '_process_single_image') as mock_process:
+            result = tool.convert_pdf_to_markdown("fake.pdf", deadline=time.time() - 1)
+        
+        assert result['success'] is True
+        assert result['cancelled_pages'] == 2
+        assert [r['page_num'] for r in result['results']] == [1, 2]
+        assert 'deadline exceeded' in result['combined_markdown']
+        mock_process.assert_not_called()
+    
+    def _mock_page_range_tool(self, tool, page_count):
+        """Replace the image tool with one that renders page ranges to fake paths"""
+        mock_tool_instance = Mock()
+        mock_tool_instance.get_page_count.return_value = page_count
+        mock_tool_instance.convert_pdf_to_images.side_effect = lambda path, start, end, **kwargs: [
+            f"page_{n:03d}.jpg" for n in range(start, end + 1)
+        ]
+        tool.pdf2image_tool = mock_tool_instance
+    
+    def test_convert_pdf_progressively(self, tool):
+        """Test the preview is returned before the remaining pages finish"""
+        self._mock_page_range_tool(tool, 5)
+        release = threading.Event()
+        
+        def process(image_path, *args):
+            page_num = tool._page_num_from_path(image_path)
+            if page_num > 2:
+                release.wait(5)
+            return PageResult(page_num=page_num, content=f"# Page {page_num}", status='success')
+        
+        with patch.object(tool, '_process_single_image', side_effect=process):
+            handle = tool.convert_pdf_progressively("fake.pdf", preview_pages=2)
+            
+            assert handle.preview['preview'] is True
+            assert [r['page_num'] for r in handle.preview['results']] == [1, 2]
+            assert handle.preview['total_pages'] == 5
+            assert not handle.done()
+            
+            release.set()
+            result = handle.result(timeout=5)
+        
+        assert result['successful_pages'] == 5
+        assert [r['page_num'] for r in result['results']] == [1, 2, 3, 4, 5]
+    
+    def test_convert_pdf_progressively_cancel(self, tool):
+        """Test cancelling a progressive conversion keeps the preview"""
+        self._mock_page_range_tool(tool, 4)
+        
+        with patch.object(tool, '_process_single_image') as mock_process:
+            mock_process.side_effect = lambda image_path, *args: PageResult(
+                page_num=tool._page_num_from_path(image_path), content="# ok", status='success'
+            )
+            # Stop the remainder from rendering until the handle is cancelled
+            started = threading.Event()
+            render = tool.pdf2image_tool.convert_pdf_to_images.side_effect
+            def slow_render(path, start, end, **kwargs):
+                if start > 1:
+                    started.wait(5)
+                return render(path, start, end, **kwargs)
+            tool.pdf2image_tool.convert_pdf_to_images.side_effect = slow_render
+            
+            handle = tool.convert_pdf_progressively("fake.pdf", preview_pages=1)
+            handle.cancel()
+            started.set()
+            result = handle.result(timeout=5)
+        
+        assert result['successful_pages'] == 1
+        assert result['cancelled_pages'] == 3
+        assert [r['page_num'] for r in result['results']] == [1, 2, 3, 4]
+    
+    def test_progressive_preview_can_be_awaited(self, tool):
+        """Test the progressive handle can be awaited from asyncio code"""
+        self._mock_page_range_tool(tool, 2)
+        
+        async def convert():
+            with patch.object(tool, '_process_single_image') as mock_process:
+                mock_process.side_effect = lambda image_path, *args: PageResult(
+                    page_num=tool._page_num_from_path(image_path), content="# ok", status='success'
+                )
+                handle = tool.convert_pdf_progressively("fake.pdf", preview_pages=1)
+                return await handle
+        
+        result = asyncio.run(convert())
+        assert result['successful_pages'] == 2
+    
     def test_retry_decorator(self):
         """Test retry decorator functionality"""
         call_count = 0
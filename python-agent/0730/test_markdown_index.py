@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the full-text index over converted markdown
+"""
+
+import os
+import sys
+import pytest
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.markdown_index import MarkdownSearchIndex
+from utils.page_result import PageResult
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+def _page(page_num, content, status='success'):
+    return PageResult(page_num=page_num, content=content, status=status)
+
+
+class TestMarkdownSearchIndex:
+    """Test class for MarkdownSearchIndex"""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        """Create an index in a temporary folder"""
+        index = MarkdownSearchIndex(str(tmp_path / "index" / "pages.db"))
+        yield index
+        index.close()
+
+    def test_search_returns_page_hits(self, index):
+        """Test hits name the document and page and are ranked by relevance"""
+        index.add_pages("contract-a", [_page(1, "# Terms\nPayment is due in 30 days."),
+                                       _page(2, "Termination requires written notice. Notice, notice.")])
+        index.add_page("contract-b", _page(7, "Notice periods are listed in the annex."))
+
+        hits = index.search("notice")
+
+        assert [(h.doc_id, h.page_num) for h in hits] == [("contract-a", 2), ("contract-b", 7)]
+        assert "[notice]" in hits[0].snippet.lower()
+        assert hits[0].score > hits[1].score
+        assert [h.page_num for h in index.search("notice", doc_id="contract-b")] == [7]
+        assert [h.page_num for h in index.search("payment due")] == [1]
+        assert index.search("payment termination") == []
+
+    def test_reindexing_replaces_page(self, index):
+        """Test converting a page again replaces its indexed content"""
+        index.add_page("doc", _page(1, "old wording"))
+        index.add_page("doc", _page(1, "new wording"))
+
+        assert index.search("old") == []
+        assert index.get_page("doc", 1) == "new wording"
+        assert index.get_stats() == {'documents': 1, 'pages': 1}
+
+    def test_failed_pages_are_not_indexed(self, index):
+        """Test only successful pages are indexed"""
+        assert index.add_page("doc", _page(1, "Error: timeout", status='error')) is False
+        assert index.get_stats() == {'documents': 0, 'pages': 0}
+
+    def test_query_syntax(self, index):
+        """Test plain queries are quoted and raw queries use FTS5 syntax"""
+        index.add_pages("doc", [_page(1, "indemnification clause"), _page(2, "liability cap")])
+
+        assert index.search('clause AND "') == []
+        assert sorted(h.page_num for h in index.search("indemn* OR liability", raw=True)) == [1, 2]
+
+    def test_delete_document(self, index):
+        """Test deleting a document removes its pages from search"""
+        index.add_pages("doc", [_page(1, "alpha"), _page(2, "beta")])
+
+        assert index.delete_document("doc") == 2
+        assert index.search("alpha") == []
+
+    def test_chinese_substring_search(self, index):
+        """Test Chinese text is searchable by any part of a sentence by default"""
+        index.add_pages("合同", [_page(3, "甲方应在三十日内支付全部货款。"), _page(4, "乙方负责运输及保险费用。")])
+
+        hits = index.search("支付全部")
+        assert [h.page_num for h in hits] == [3]
+        assert "[支付全部]" in hits[0].snippet
+        assert [h.page_num for h in index.search("运输 保险")] == [4]
+        assert index.search("全部货款 保险") == []
+
+    def test_short_chinese_terms(self, index):
+        """Test terms below the trigram length are matched by scanning"""
+        index.add_pages("合同", [_page(3, "甲方应在三十日内支付全部货款。"), _page(4, "乙方负责运输及保险费用。")])
+
+        hits = index.search("乙方")
+        assert [h.page_num for h in hits] == [4]
+        assert hits[0].snippet.startswith("[乙方]")
+        assert [h.page_num for h in index.search("甲方 全部货款")] == [3]
+        assert index.search("乙方 全部货款") == []
+        assert index.search("5%") == []
+
+    def test_unicode61_tokenizer(self, tmp_path):
+        """Test the word-based tokenizer can still be chosen and is kept on reopen"""
+        path = str(tmp_path / "en.db")
+        index = MarkdownSearchIndex(path, tokenizer="unicode61")
+        index.add_page("doc", _page(1, "Termination requires notice."))
+        index.close()
+
+        index = MarkdownSearchIndex(path)
+        assert index.trigram is False
+        assert [h.page_num for h in index.search("notice")] == [1]
+        assert index.search("otic") == []
+        index.close()
+
+
+class TestSearchIndexSink:
+    """Test class for writing conversion results to the search index"""
+
+    def test_pages_are_indexed_as_they_complete(self, tmp_path, make_pdf):
+        """Test a conversion writes each page to the index under its document ID"""
+        pdf_path = make_pdf(tmp_path / "doc.pdf")
+
+        index = MarkdownSearchIndex(str(tmp_path / "pages.db"))
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path), search_index=index)
+        indexed = []
+        index.add_page = Mock(side_effect=lambda doc_id, result: indexed.append((doc_id, result['page_num'])))
+
+        def run(prompt, images):
+            response = Mock()
+            response.content = f"Clause on {os.path.basename(str(images[0].filepath))}"
+            return response
+
+        tool.agent.run = Mock(side_effect=run)
+        result = tool.convert_pdf_to_markdown(pdf_path, doc_id="contract-42")
+
+        assert result['doc_id'] == "contract-42"
+        assert sorted(indexed) == [("contract-42", 1), ("contract-42", 2), ("contract-42", 3)]
+
+        del index.add_page
+        tool.convert_pdf_to_markdown(pdf_path, doc_id="contract-42")
+        hits = index.search("page_002")
+        assert [(h.doc_id, h.page_num) for h in hits] == [("contract-42", 2)]
+        index.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
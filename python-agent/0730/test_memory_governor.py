@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the memory governor
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.cancellation import CancellationToken
+from utils.memory_governor import MemoryGovernor, estimate_request_bytes
+from utils.pdf2image_tool import pdf2imageTool
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+class TestMemoryGovernor:
+    """Test class for MemoryGovernor"""
+
+    def test_reservations_block_when_budget_exhausted(self):
+        """Test a reservation waits until enough bytes are released"""
+        governor = MemoryGovernor(100)
+        governor.acquire(80)
+        acquired = threading.Event()
+
+        def reserve():
+            governor.acquire(50)
+            acquired.set()
+
+        thread = threading.Thread(target=reserve)
+        thread.start()
+        assert not acquired.wait(0.1)
+
+        governor.release(80)
+        assert acquired.wait(1)
+        thread.join()
+        usage = governor.get_usage()
+        assert usage['in_use_bytes'] == 50
+        assert usage['peak_bytes'] == 80
+        assert usage['waits'] == 1
+
+    def test_oversized_reservation_admitted_alone(self):
+        """Test a reservation above the budget runs once nothing else is reserved"""
+        governor = MemoryGovernor(100)
+        assert governor.acquire(500, timeout=0.1) is True
+        assert governor.acquire(1, timeout=0.05) is False
+        governor.release(500)
+        assert governor.acquire(1, timeout=0.05) is True
+
+    def test_raising_budget_wakes_waiters(self):
+        """Test a larger budget admits waiting reservations"""
+        governor = MemoryGovernor(100)
+        governor.acquire(100)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(governor.acquire(50, timeout=2)))
+        thread.start()
+        time.sleep(0.05)
+        governor.set_budget(200)
+        thread.join()
+        assert result == [True]
+
+    def test_cancellation_ends_wait(self):
+        """Test a waiting reservation returns as soon as its token is cancelled"""
+        governor = MemoryGovernor(100)
+        governor.acquire(100)
+        token = CancellationToken()
+        token.cancel_after(0.05)
+
+        start = time.time()
+        assert governor.acquire(50, timeout=5, cancel_token=token) is False
+        assert time.time() - start < 1
+        assert governor.acquire(50, cancel_token=token) is False
+        assert governor.get_usage()['in_use_bytes'] == 100
+        governor.release(100)
+        assert governor.acquire(50, cancel_token=token) is True
+
+    def test_rendering_stays_within_budget(self, tmp_path, make_pdf):
+        """Test pages are rendered one raster at a time under a tight budget"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf")
+        governor = MemoryGovernor(1)
+
+        images = pdf2imageTool(base_storage_path=str(tmp_path / "storage"),
+                               memory_governor=governor).convert_pdf_to_images(pdf_path)
+
+        assert len(images) == 3
+        usage = governor.get_usage()
+        assert usage['in_use_bytes'] == 0
+        assert usage['active_reservations'] == 0
+
+    def test_requests_limited_by_budget(self, tmp_path):
+        """Test in-flight model requests are capped by the budget"""
+        image_path = tmp_path / "page_001.jpg"
+        image_path.write_bytes(b"x" * 3000)
+        governor = MemoryGovernor(estimate_request_bytes(3000) + 1)
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", memory_governor=governor)
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def run(*args, **kwargs):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.pop()
+            result = Mock()
+            result.content = "# ok"
+            return result
+
+        tool.agent.run = Mock(side_effect=run)
+        threads = [threading.Thread(target=tool._process_single_image, args=(str(image_path),)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 1
+        assert tool.get_memory_usage()['in_use_bytes'] == 0
+
+    def test_cancelled_request_stops_waiting(self, tmp_path):
+        """Test a page waiting for budget is cancelled with its job instead of blocking"""
+        image_path = tmp_path / "page_001.jpg"
+        image_path.write_bytes(b"x" * 3000)
+        governor = MemoryGovernor(estimate_request_bytes(3000))
+        governor.acquire(governor.budget_bytes)
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", memory_governor=governor)
+        tool.agent.run = Mock()
+        token = CancellationToken()
+        token.cancel_after(0.05, reason="timeout exceeded")
+
+        result = token.wrap(tool._process_single_image)(str(image_path))
+
+        assert result['status'] == 'cancelled'
+        assert result['error'] == "timeout exceeded"
+        tool.agent.run.assert_not_called()
+        assert governor.get_usage()['active_reservations'] == 1
+
+    def test_cancelled_render_stops_waiting(self, tmp_path, make_pdf):
+        """Test rendering stops when the job is cancelled while waiting for budget"""
+        pdf_path = make_pdf(tmp_path / "sample.pdf", num_pages=1)
+        governor = MemoryGovernor(1)
+        governor.acquire(1)
+        token = CancellationToken()
+        token.cancel_after(0.05)
+
+        images = pdf2imageTool(base_storage_path=str(tmp_path / "storage"),
+                               memory_governor=governor).convert_pdf_to_images(pdf_path, cancel_token=token)
+
+        assert images == []
+        assert governor.get_usage()['in_use_bytes'] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for model call record/replay
+"""
+
+import os
+import sys
+import time
+import pytest
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.model_cassette import ModelCassette, CassetteMissError, InjectedFaultError, ReplayedError
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+class TestModelCassette:
+    """Test class for ModelCassette"""
+
+    @pytest.fixture
+    def image_path(self, tmp_path):
+        """Create a fake page image"""
+        path = tmp_path / "page_001.jpg"
+        path.write_bytes(b"fake image bytes")
+        return str(path)
+
+    @pytest.fixture
+    def cassette_path(self, tmp_path, image_path):
+        """Record one page conversion to a cassette"""
+        path = str(tmp_path / "cassette.jsonl")
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=ModelCassette(path, mode='record'))
+        live_run = Mock()
+        live_run.content = "# Line one\nLine two\n"
+        def slow_run(*args, **kwargs):
+            time.sleep(0.2)
+            return live_run
+        tool.agent.run = Mock(side_effect=slow_run)
+
+        result = tool._process_single_image(image_path)
+
+        assert result['status'] == 'success'
+        assert tool.cassette.get_stats()['recorded'] == 1
+        return path
+
+    def test_replay_without_model(self, cassette_path, image_path):
+        """Test replayed calls return the recorded content at the recorded latency"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=ModelCassette(cassette_path))
+        tool.agent.run = Mock(side_effect=AssertionError("model must not be called"))
+
+        start = time.time()
+        result = tool._process_single_image(image_path)
+
+        assert result['content'] == "# Line one\nLine two\n"
+        assert time.time() - start >= 0.2
+
+    def test_accelerated_replay(self, cassette_path, image_path):
+        """Test replay speed scales the recorded latency"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=ModelCassette(cassette_path, speed=0))
+
+        start = time.time()
+        tool._process_single_image(image_path)
+
+        assert time.time() - start < 0.1
+
+    def test_streamed_replay(self, cassette_path, image_path):
+        """Test streaming replays the recorded content chunk by chunk"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=ModelCassette(cassette_path, speed=0))
+        deltas = []
+
+        result = tool._process_single_image(image_path, on_partial=lambda page, delta, text: deltas.append(delta))
+
+        assert deltas == ["# Line one\n", "Line two\n"]
+        assert result['output_tokens'] > 0
+
+    def test_injected_faults(self, cassette_path, image_path):
+        """Test injected faults surface as page errors"""
+        cassette = ModelCassette(cassette_path, speed=0, fault_rate=1.0, seed=1)
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=cassette)
+
+        result = tool._process_single_image(image_path)
+
+        assert result['status'] == 'error'
+        assert "Injected fault" in result['error']
+        assert cassette.get_stats()['injected_faults'] == 1
+        fingerprint = next(iter(cassette._entries))
+        with pytest.raises(InjectedFaultError):
+            cassette.play(fingerprint)
+
+    def test_recorded_failure_is_replayed(self, tmp_path, image_path):
+        """Test a failure recorded from the live model replays as that failure, not an injected fault"""
+        path = str(tmp_path / "failure.jsonl")
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=ModelCassette(path, mode='record'))
+        tool.agent.run = Mock(side_effect=TimeoutError("read timed out"))
+        tool._process_single_image(image_path)
+
+        cassette = ModelCassette(path, speed=0)
+        fingerprint = next(iter(cassette._entries))
+        with pytest.raises(ReplayedError) as excinfo:
+            list(cassette.play_stream(fingerprint))
+
+        assert excinfo.value.error_type == "TimeoutError"
+        assert str(excinfo.value) == "read timed out"
+        assert cassette.get_stats()['injected_faults'] == 0
+
+    def test_unrecorded_request(self, cassette_path, tmp_path):
+        """Test requests missing from the cassette are reported"""
+        cassette = ModelCassette(cassette_path, speed=0)
+        other_image = tmp_path / "page_002.jpg"
+        other_image.write_bytes(b"different page")
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", cassette=cassette)
+
+        result = tool._process_single_image(str(other_image))
+
+        assert result['status'] == 'error'
+        assert cassette.get_stats()['misses'] == 1
+
+    def test_replay_cycles_recordings(self, tmp_path):
+        """Test repeated recordings of a request are replayed in turn"""
+        cassette = ModelCassette(str(tmp_path / "c.jsonl"), mode='record')
+        cassette.record("abc", "qwen-vl-plus", "first", 0.0)
+        cassette.record("abc", "qwen-vl-plus", None, 0.0, error="HTTP 500", error_type="ServerError")
+        replay = ModelCassette(str(tmp_path / "c.jsonl"), speed=0)
+
+        assert replay.play("abc").content == "first"
+        with pytest.raises(ReplayedError) as excinfo:
+            replay.play("abc")
+        assert str(excinfo.value) == "HTTP 500"
+        assert excinfo.value.error_type == "ServerError"
+        with pytest.raises(CassetteMissError):
+            replay.play("missing")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for per-page fingerprints and incremental re-conversion
+"""
+
+import os
+import sys
+import pytest
+import fitz
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.page_fingerprint import PageResultStore, page_fingerprint
+from utils.page_result import PageResult
+from utils.pdf2image_tool import pdf2imageTool
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+
+def _make_nested_form_pdf(path, pixel):
+    """Create a page whose image is drawn by a form nested behind a form shared by two others"""
+    doc = fitz.open()
+    page = doc.new_page()
+
+    def stream_object(source, data):
+        xref = doc.get_new_xref()
+        doc.update_object(xref, source)
+        doc.update_stream(xref, data, new=True)
+        return xref
+
+    image = stream_object("<</Type/XObject/Subtype/Image/Width 1/Height 1/ColorSpace/DeviceGray"
+                          "/BitsPerComponent 8>>", bytes([pixel]))
+    form = "<</Type/XObject/Subtype/Form/BBox[0 0 100 100]/Resources<<%s>>>>"
+    shared = stream_object(form % "", b"0 0 10 10 re f")
+    drawing = stream_object(form % f"/XObject<</J {image} 0 R>>", b"q 100 0 0 100 0 0 cm /J Do Q")
+    first = stream_object(form % f"/XObject<</C {shared} 0 R>>", b"/C Do")
+    second = stream_object(form % f"/XObject<</C {shared} 0 R/D {drawing} 0 R>>", b"/C Do /D Do")
+    doc.xref_set_key(page.xref, "Resources", f"<</XObject<</A {first} 0 R/B {second} 0 R>>>>")
+    page.set_contents(stream_object("<<>>", b"/A Do /B Do"))
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _fingerprints(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return [page_fingerprint(doc, page) for page in doc]
+
+
+class TestPageFingerprint:
+    """Test class for page fingerprints"""
+
+    def test_unchanged_pages_keep_fingerprint(self, tmp_path, make_pdf):
+        """Test only the edited page changes its fingerprint"""
+        v1 = _fingerprints(make_pdf(tmp_path / "v1.pdf", texts=["Clause 1", "Clause 2", "Clause 3"]))
+        v2 = _fingerprints(make_pdf(tmp_path / "v2.pdf", texts=["Clause 1", "Clause 2 (amended)", "Clause 3"]))
+
+        assert v1[0] == v2[0]
+        assert v1[1] != v2[1]
+        assert v1[2] == v2[2]
+
+    def test_fingerprint_survives_page_insertion(self, tmp_path, make_pdf):
+        """Test pages moved by an inserted page keep their fingerprint"""
+        v1 = _fingerprints(make_pdf(tmp_path / "v1.pdf", texts=["Clause 1", "Clause 2"]))
+        v2 = _fingerprints(make_pdf(tmp_path / "v2.pdf", texts=["Cover", "Clause 1", "Clause 2"]))
+
+        assert v2[1:] == v1
+
+    def test_geometry_changes_fingerprint(self, tmp_path, make_pdf):
+        """Test rotating a page changes its fingerprint"""
+        pdf_path = make_pdf(tmp_path / "doc.pdf", texts=["Clause 1"])
+        with fitz.open(pdf_path) as doc:
+            before = page_fingerprint(doc, doc[0])
+            doc[0].set_rotation(90)
+            assert page_fingerprint(doc, doc[0]) != before
+
+    def test_nested_form_image_changes_fingerprint(self, tmp_path):
+        """Test an image drawn inside nested form XObjects is part of the fingerprint"""
+        dark = _fingerprints(_make_nested_form_pdf(tmp_path / "dark.pdf", 0))
+        light = _fingerprints(_make_nested_form_pdf(tmp_path / "light.pdf", 255))
+
+        assert dark == _fingerprints(_make_nested_form_pdf(tmp_path / "dark2.pdf", 0))
+        assert dark != light
+
+
+class TestPageResultStore:
+    """Test class for PageResultStore"""
+
+    def test_round_trip_renumbers_page(self, tmp_path):
+        """Test stored pages come back under their new page number"""
+        store = PageResultStore(str(tmp_path))
+        store.put("key", "ab" * 32, PageResult(page_num=2, content="# Two", status='success',
+                                               image_path="old/page_002.jpg"))
+
+        result = store.get("key", "ab" * 32, page_num=5)
+
+        assert result.page_num == 5
+        assert result.content == "# Two"
+        assert 'image_path' not in result
+        assert store.get("other", "ab" * 32, page_num=5) is None
+        assert store.get_stats() == {'hits': 1, 'misses': 1, 'stored': 1}
+
+    def test_failed_pages_are_not_stored(self, tmp_path):
+        """Test only successful pages are stored"""
+        store = PageResultStore(str(tmp_path))
+        store.put("key", "cd" * 32, PageResult(page_num=1, content="Error", status='error', error="boom"))
+
+        assert store.get("key", "cd" * 32, page_num=1) is None
+
+    def test_truncated_pages_are_not_stored(self, tmp_path):
+        """Test pages cut off at the output limit are converted again next time"""
+        store = PageResultStore(str(tmp_path))
+        store.put("key", "ef" * 32, PageResult(page_num=1, content="# Cut", status='success', truncated=True))
+
+        assert store.get("key", "ef" * 32, page_num=1) is None
+        assert store.get_stats()['stored'] == 0
+
+
+class TestIncrementalConversion:
+    """Test class for incremental re-conversion of revised documents"""
+
+    def test_only_changed_pages_are_converted(self, tmp_path, make_pdf):
+        """Test a revision re-renders and re-converts only its changed page"""
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path),
+                                   page_store=PageResultStore(str(tmp_path / "page_results")))
+        calls = []
+
+        def run(prompt, images):
+            calls.append(images[0].filepath)
+            response = Mock()
+            response.content = f"# {os.path.basename(str(images[0].filepath))} of call {len(calls)}"
+            return response
+
+        tool.agent.run = Mock(side_effect=run)
+
+        first = tool.convert_pdf_to_markdown(
+            make_pdf(tmp_path / "v1.pdf", texts=["Clause 1", "Clause 2", "Clause 3"])
+        )
+        assert first['reused_pages'] == 0
+        assert len(calls) == 3
+
+        tool.pdf2image_tool._render_page = Mock(wraps=tool.pdf2image_tool._render_page)
+        second = tool.convert_pdf_to_markdown(
+            make_pdf(tmp_path / "v2.pdf", texts=["Cover", "Clause 1", "Clause 2 (amended)", "Clause 3"])
+        )
+
+        assert second['success'] is True
+        assert second['reused_pages'] == 2
+        assert len(calls) == 5
+        assert tool.pdf2image_tool._render_page.call_count == 2
+        assert [r['page_num'] for r in second['results']] == [1, 2, 3, 4]
+        assert second['results'][1]['content'] == first['results'][0]['content']
+        assert second['results'][3]['content'] == first['results'][2]['content']
+
+    def test_render_selected_pages(self, tmp_path, make_pdf):
+        """Test rendering can be limited to some pages of the range"""
+        image_tool = pdf2imageTool(base_storage_path=str(tmp_path))
+        pdf_path = make_pdf(tmp_path / "doc.pdf", texts=["A", "B", "C"])
+        images = image_tool.convert_pdf_to_images(pdf_path, pages={1, 3})
+
+        assert [os.path.basename(p) for p in images] == ["page_001.jpg", "page_003.jpg"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
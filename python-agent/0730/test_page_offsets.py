@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the page offset index of combined markdown files
+"""
+
+import os
+import sys
+import json
+import pytest
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.page_offsets import PagedMarkdownReader, build_page_index, index_path_for, write_paged_markdown
+from utils.page_result import PageResult
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+@pytest.fixture
+def result(tmp_path):
+    """Create a conversion result with a failed page and non-ASCII content"""
+    tool = LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path))
+    pages = [
+        PageResult(page_num=1, content="# 合同\n甲方与乙方", status='success'),
+        PageResult(page_num=2, content="", status='error', error="timeout"),
+        PageResult(page_num=3, content="| a | b |\n|---|---|", status='success'),
+        PageResult(page_num=4, content="附件 ✓", status='success'),
+    ]
+    return tool._build_conversion_result({'success': True, 'results': pages})
+
+
+class TestPageOffsets:
+    """Test class for the page offset index and reader"""
+
+    def test_write_matches_combined_markdown(self, tmp_path, result):
+        """Test the written file equals combined_markdown and the index covers every page"""
+        path = str(tmp_path / "out" / "doc.md")
+
+        index_path = result.write_markdown(path)
+
+        assert index_path == index_path_for(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            assert f.read() == result['combined_markdown']
+        with open(index_path, 'r', encoding='utf-8') as f:
+            assert [page for page, _, _ in json.load(f)['pages']] == [1, 2, 3, 4]
+
+    def test_read_single_pages(self, tmp_path, result):
+        """Test pages are read back exactly as formatted"""
+        path = str(tmp_path / "doc.md")
+        result.write_markdown(path)
+
+        with PagedMarkdownReader(path) as reader:
+            assert len(reader) == 4
+            for page in result['results']:
+                assert reader.get_page(page['page_num']) == result._format_page(page)
+            assert "## Page 2 - Error" in reader.get_page(2)
+            assert 5 not in reader
+            with pytest.raises(KeyError):
+                reader.get_page(5)
+
+    def test_read_page_range(self, tmp_path, result):
+        """Test a page range reads back like the combined markdown of those pages"""
+        path = str(tmp_path / "doc.md")
+        result.write_markdown(path)
+        expected = "\n".join(result._format_page(p) for p in result['results'][1:3])
+
+        with PagedMarkdownReader(path) as reader:
+            assert reader.get_pages(2, 3) == expected
+            assert reader.get_pages(10, 20) == ""
+            assert [page for page, _ in reader.iter_pages(start_page=3)] == [3, 4]
+
+    def test_unsorted_pages(self, tmp_path):
+        """Test ranges of pages stored out of order are joined in file order"""
+        path = str(tmp_path / "doc.md")
+        write_paged_markdown(path, [(2, "two"), (1, "one"), (3, "three")])
+
+        with PagedMarkdownReader(path) as reader:
+            assert reader.get_pages(2, 3) == "two\nthree"
+            assert reader.get_pages(1, 2) == "two\none"
+            assert reader.page_numbers == [2, 1, 3]
+
+    def test_stale_index_is_rejected(self, tmp_path, result):
+        """Test the reader refuses an index written for another version of the file"""
+        path = str(tmp_path / "doc.md")
+        result.write_markdown(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("appended")
+
+        with pytest.raises(ValueError):
+            PagedMarkdownReader(path)
+
+    def test_build_index_for_existing_file(self, tmp_path, result):
+        """Test indexing a file written without an index by scanning its page headers"""
+        path = str(tmp_path / "legacy.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(result['combined_markdown'])
+
+        build_page_index(path)
+
+        with PagedMarkdownReader(path) as reader:
+            assert reader.page_numbers == [1, 2, 3, 4]
+            assert reader.get_page(4) == result._format_page(result['results'][3])
+
+    def test_empty_result(self, tmp_path):
+        """Test a result without pages writes an empty file and index"""
+        path = str(tmp_path / "empty.md")
+        write_paged_markdown(path, [])
+
+        with PagedMarkdownReader(path) as reader:
+            assert len(reader) == 0
+            assert reader.get_pages(1, 10) == ""
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for page quality heuristics
+"""
+
+import os
+import sys
+import pytest
+from PIL import Image, ImageDraw
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.page_quality import PageQualityChecker, has_broken_table, estimate_ink_ratio
+
+
+class TestPageQualityChecker:
+    """Test class for PageQualityChecker"""
+
+    @pytest.fixture
+    def checker(self):
+        """Create a quality checker"""
+        return PageQualityChecker()
+
+    @pytest.fixture
+    def dense_image(self, tmp_path):
+        """Create a page image mostly covered with ink"""
+        path = tmp_path / "page_001.jpg"
+        img = Image.new("RGB", (200, 200), "white")
+        ImageDraw.Draw(img).rectangle([0, 0, 200, 100], fill="black")
+        img.save(path)
+        return str(path)
+
+    def test_good_output(self, checker):
+        """Test normal markdown has no issues"""
+        content = "# Title\n\n| a | b |\n|---|---|\n| 1 | 2 |\n"
+        assert checker.check(content) == []
+
+    def test_empty_output(self, checker):
+        """Test empty output is flagged"""
+        assert checker.check("  \n") == ['empty_output']
+        assert checker.check(None) == ['empty_output']
+
+    def test_refusal(self, checker):
+        """Test refusal text is flagged"""
+        assert 'refusal' in checker.check("I'm sorry, I cannot read this image.")
+        assert 'refusal' in checker.check("抱歉，我无法识别图片中的内容。")
+
+    def test_broken_table(self):
+        """Test malformed tables are detected"""
+        assert has_broken_table("| a | b |\n| 1 | 2 |\n")
+        assert has_broken_table("| a | b |\n|---|---|\n| 1 | 2 | 3 |\n")
+        assert not has_broken_table("| a | b |\n| --- | :---: |\n| 1 | 2 |\n")
+
+    def test_short_output_for_dense_page(self, checker, dense_image):
+        """Test short output for an ink-heavy page is flagged"""
+        assert estimate_ink_ratio(dense_image) > 0.4
+        assert 'too_short_for_page' in checker.check("# Title", dense_image)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for compact page results
+"""
+
+import os
+import sys
+import pytest
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.page_result import PageResult, ConversionResult
+
+
+class TestPageResult:
+    """Test class for PageResult"""
+
+    def test_dict_style_access(self):
+        """Test page results read like the former per-page dicts"""
+        result = PageResult(page_num=3, content="# Three", status='success', image_path="page_003.jpg")
+
+        assert result['page_num'] == 3
+        assert result['content'] == "# Three"
+        assert 'error' not in result
+        assert result.get('error', 'Unknown error') == 'Unknown error'
+        with pytest.raises(KeyError):
+            result['error']
+        assert result.to_dict() == {
+            'page_num': 3, 'content': "# Three", 'status': 'success', 'image_path': "page_003.jpg"
+        }
+
+    def test_slots(self):
+        """Test page results do not carry a per-instance dict"""
+        result = PageResult(page_num=1, content="", status='success')
+        assert not hasattr(result, '__dict__')
+
+    def test_from_dict(self):
+        """Test building from a dict ignores unknown keys"""
+        result = PageResult.from_dict({'page_num': 1, 'content': "x", 'status': 'error', 'error': "boom", 'extra': 1})
+        assert result.error == "boom"
+
+
+class TestConversionResult:
+    """Test class for ConversionResult"""
+
+    def test_combined_markdown_is_lazy(self):
+        """Test combined markdown is built on access and not stored"""
+        calls = []
+
+        def combine(results):
+            calls.append(1)
+            return "|".join(r['content'] for r in results)
+
+        pages = [PageResult(page_num=i, content=str(i), status='success') for i in (1, 2)]
+        result = ConversionResult({'success': True, 'results': pages}, combine=combine)
+
+        assert calls == []
+        assert 'combined_markdown' in result
+        assert result['combined_markdown'] == "1|2"
+        assert result.get('combined_markdown') == "1|2"
+        assert 'combined_markdown' not in dict(result)
+
+    def test_missing_key(self):
+        """Test other missing keys still raise"""
+        result = ConversionResult({'success': False})
+        assert result.get('combined_markdown', '') == ''
+        with pytest.raises(KeyError):
+            result['error']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
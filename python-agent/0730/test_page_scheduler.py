@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the page scheduler
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from unittest.mock import Mock
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.page_scheduler import PageScheduler
+from utils.tenant_quota import TenantQuota, TokenBucket
+from utils.llm_pdf2md_tool import LLMPdf2MarkdownTool
+
+
+class TestPageScheduler:
+    """Test class for PageScheduler"""
+
+    @pytest.fixture
+    def scheduler(self):
+        """Create a single-worker scheduler"""
+        scheduler = PageScheduler(max_workers=1)
+        yield scheduler
+        scheduler.shutdown(wait=False)
+
+    def _block(self, scheduler):
+        """Occupy the only worker until the returned event is set"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+
+        future = scheduler.submit(blocker)
+        started.wait(5)
+        return release, future
+
+    def test_higher_priority_runs_first(self, scheduler):
+        """Test a high-priority job overtakes queued low-priority pages"""
+        release, _ = self._block(scheduler)
+        order = []
+        low = [scheduler.submit(order.append, f"low-{i}", job_id="backfill", priority=0) for i in range(3)]
+        high = scheduler.submit(order.append, "high", job_id="interactive", priority=10)
+        release.set()
+
+        for future in low + [high]:
+            future.result(timeout=5)
+        assert order[0] == "high"
+        assert order[1:] == ["low-0", "low-1", "low-2"]
+
+    def test_earlier_deadline_runs_first(self, scheduler):
+        """Test earliest deadline first within a priority level"""
+        release, _ = self._block(scheduler)
+        order = []
+        now = time.time()
+        late = scheduler.submit(order.append, "late", deadline=now + 60)
+        soon = scheduler.submit(order.append, "soon", deadline=now + 30)
+        release.set()
+
+        late.result(timeout=5)
+        soon.result(timeout=5)
+        assert order == ["soon", "late"]
+
+    def test_unreachable_deadline_cancels_job(self, scheduler):
+        """Test remaining pages are cancelled once the deadline passed"""
+        release, _ = self._block(scheduler)
+        futures = [scheduler.submit(lambda: None, job_id="job", deadline=time.time() + 0.05) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+
+        for future in futures:
+            with pytest.raises(Exception):
+                future.result(timeout=5)
+        assert all(f.cancelled() for f in futures)
+        assert scheduler.get_cancel_reason("job") == "deadline exceeded"
+
+    def test_cancel_job(self, scheduler):
+        """Test cancelling queued tasks of one job only"""
+        release, _ = self._block(scheduler)
+        mine = [scheduler.submit(lambda: "mine", job_id="a") for _ in range(2)]
+        other = scheduler.submit(lambda: "other", job_id="b")
+
+        assert scheduler.cancel_job("a") == 2
+        release.set()
+        assert other.result(timeout=5) == "other"
+        assert all(f.cancelled() for f in mine)
+
+
+class TestTenantQuotas:
+    """Test class for per-tenant quotas and fair sharing"""
+
+    def test_weighted_fair_sharing(self):
+        """Test a tenant with twice the weight gets twice the pages while both are backlogged"""
+        scheduler = PageScheduler(max_workers=1, tenant_quotas={'bulk': TenantQuota(weight=1),
+                                                                'team': TenantQuota(weight=2)})
+        release, _ = TestPageScheduler()._block(scheduler)
+        order = []
+        futures = [scheduler.submit(order.append, 'bulk', tenant='bulk') for _ in range(6)]
+        futures += [scheduler.submit(order.append, 'team', tenant='team') for _ in range(6)]
+        release.set()
+
+        for future in futures:
+            future.result(timeout=5)
+        scheduler.shutdown(wait=False)
+        assert order[:6].count('team') == 4
+        assert order[:6].count('bulk') == 2
+
+    def test_urgent_priority_crosses_tenants(self):
+        """Test an urgent page overtakes other tenants' queues and is charged to its tenant"""
+        scheduler = PageScheduler(max_workers=1, urgent_priority=100,
+                                  tenant_quotas={'bulk': TenantQuota(), 'team': TenantQuota()})
+        release, _ = TestPageScheduler()._block(scheduler)
+        order = []
+        futures = [scheduler.submit(order.append, 'bulk', tenant='bulk') for _ in range(4)]
+        futures += [scheduler.submit(order.append, 'team', tenant='team') for _ in range(4)]
+        futures.append(scheduler.submit(order.append, 'urgent', tenant='team', priority=100))
+        release.set()
+
+        for future in futures:
+            future.result(timeout=5)
+        scheduler.shutdown(wait=False)
+        assert order[:3] == ['urgent', 'bulk', 'bulk']
+
+    def test_max_concurrent(self):
+        """Test a tenant never has more pages in flight than its cap"""
+        scheduler = PageScheduler(max_workers=3, tenant_quotas={'bulk': TenantQuota(max_concurrent=1)})
+        lock = threading.Lock()
+        running = {'now': 0, 'peak': 0}
+
+        def page():
+            with lock:
+                running['now'] += 1
+                running['peak'] = max(running['peak'], running['now'])
+            time.sleep(0.05)
+            with lock:
+                running['now'] -= 1
+
+        futures = [scheduler.submit(page, tenant='bulk') for _ in range(4)]
+        other = scheduler.submit(lambda: "other", tenant='team')
+
+        assert other.result(timeout=1) == "other"
+        assert not all(f.done() for f in futures)
+        for future in futures:
+            future.result(timeout=5)
+        scheduler.shutdown(wait=False)
+        assert running['peak'] == 1
+
+    def test_page_rate_limit(self):
+        """Test pages beyond the burst wait for the token bucket"""
+        scheduler = PageScheduler(max_workers=2, tenant_quotas={'bulk': TenantQuota(pages_per_minute=600, burst=1)})
+        start = time.monotonic()
+        futures = [scheduler.submit(lambda: None, tenant='bulk') for _ in range(3)]
+
+        for future in futures:
+            future.result(timeout=5)
+        scheduler.shutdown(wait=False)
+        # 10 pages per second: the second and third page wait ~0.1s each
+        assert time.monotonic() - start >= 0.15
+
+    def test_token_bucket(self):
+        """Test the bucket refills at its rate up to its capacity"""
+        bucket = TokenBucket(rate_per_second=2.0, capacity=2)
+        now = bucket.updated_at
+
+        assert bucket.take(now) and bucket.take(now)
+        assert not bucket.take(now)
+        assert bucket.delay(now) == pytest.approx(0.5)
+        assert bucket.take(now + 0.5)
+        bucket.delay(now + 100)
+        assert bucket.tokens == 2
+
+    def test_usage_counters(self):
+        """Test per-tenant usage counts outcomes"""
+        scheduler = PageScheduler(max_workers=1)
+
+        def fail():
+            raise RuntimeError("boom")
+
+        futures = [scheduler.submit(lambda: None, tenant='team') for _ in range(2)]
+        futures.append(scheduler.submit(fail, tenant='team'))
+        for future in futures:
+            future.exception(timeout=5)
+        scheduler.shutdown(wait=True)
+
+        usage = scheduler.get_tenant_usage('team')
+        assert usage['submitted'] == 3
+        assert usage['completed'] == 2
+        assert usage['failed'] == 1
+        assert usage['queued'] == 0 and usage['running'] == 0
+        assert set(scheduler.get_tenant_usage()) == {'team'}
+
+    def test_invalid_quota(self):
+        """Test quotas reject non-positive limits"""
+        with pytest.raises(ValueError):
+            TenantQuota(weight=0)
+        with pytest.raises(ValueError):
+            TenantQuota(max_concurrent=0)
+
+    def test_conversion_reports_tenant_usage(self, tmp_path, make_pdf):
+        """Test conversions submitted with a tenant report its usage"""
+        pdf_path = make_pdf(tmp_path / "doc.pdf", num_pages=2)
+
+        tool = LLMPdf2MarkdownTool(api_key="test_api_key", base_storage_path=str(tmp_path), max_workers=2,
+                                   tenant_quotas={'team-a': TenantQuota(weight=3, max_concurrent=1)})
+        tool.agent.run = Mock(return_value=Mock(content="# Page"))
+
+        result = tool.convert_pdf_to_markdown(pdf_path, tenant='team-a')
+        tool.scheduler.shutdown(wait=True)
+
+        assert result['success'] is True
+        assert result['tenant'] == 'team-a'
+        assert result['tenant_usage']['submitted'] == 2
+        assert result['tenant_usage']['weight'] == 3
+        assert tool.get_tenant_usage('team-a')['completed'] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
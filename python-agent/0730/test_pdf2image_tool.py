@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for PDF to image tool
+"""
+
+import os
+import sys
+import pytest
+import fitz
+from unittest.mock import Mock, patch
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.pdf2image_tool import pdf2imageTool
+
+
+
+class TestPdf2ImageTool:
+    """Test class for pdf2imageTool"""
+
+    @pytest.fixture
+    def pdf_path(self, tmp_path, make_pdf):
+        """Create a sample PDF"""
+        return make_pdf(tmp_path / "sample.pdf")
+
+    @pytest.fixture
+    def tool(self, tmp_path):
+        """Create a test instance of pdf2imageTool"""
+        return pdf2imageTool(base_storage_path=str(tmp_path / "storage"))
+
+    def test_convert_pdf_to_images(self, tool, pdf_path):
+        """Test rendering all pages"""
+        images = tool.convert_pdf_to_images(pdf_path)
+
+        assert [os.path.basename(p) for p in images] == ["page_001.jpg", "page_002.jpg", "page_003.jpg"]
+        assert all(os.path.getsize(p) > 0 for p in images)
+
+    def test_render_folder_independent_of_date(self, tool, pdf_path):
+        """Test render folder is addressed by digest and settings only"""
+        images = tool.convert_pdf_to_images(pdf_path, 1, 1)
+        folder = os.path.dirname(images[0])
+
+        assert os.path.basename(folder) == "dpi72_q80_jpeg"
+        assert len(os.path.basename(os.path.dirname(folder))) == 32
+
+    def test_cached_pages_are_not_rendered_again(self, tool, pdf_path):
+        """Test repeat conversions only render missing pages"""
+        first = tool.convert_pdf_to_images(pdf_path, 1, 2)
+
+        with patch.object(fitz.Page, 'get_pixmap', autospec=True, side_effect=fitz.Page.get_pixmap) as mock_pixmap:
+            second = tool.convert_pdf_to_images(pdf_path, 1, 3)
+
+        assert second[:2] == first
+        assert mock_pixmap.call_count == 1
+
+    def test_different_settings_use_separate_cache(self, tmp_path, pdf_path):
+        """Test render settings are part of the cache key"""
+        storage = str(tmp_path / "storage")
+        low = pdf2imageTool(base_storage_path=storage).convert_pdf_to_images(pdf_path, 1, 1)
+        high = pdf2imageTool(base_storage_path=storage, dpi=144, image_format='png').convert_pdf_to_images(pdf_path, 1, 1)
+
+        assert low[0] != high[0]
+        assert high[0].endswith("page_001.png")
+
+
+    def test_bytes_and_path_share_render_cache(self, tool, pdf_path):
+        """Test in-memory and file-based opening hash to the same render folder"""
+        with open(pdf_path, 'rb') as f:
+            from_bytes = tool.convert_pdf_bytes_to_images(f.read(), 1, 1)
+        large_file_tool = pdf2imageTool(base_storage_path=tool.base_path, in_memory_max_bytes=0)
+
+        with patch.object(fitz.Page, 'get_pixmap', autospec=True, side_effect=fitz.Page.get_pixmap) as mock_pixmap:
+            from_path = large_file_tool.convert_pdf_to_images(pdf_path, 1, 1)
+
+        assert from_path == from_bytes
+        assert mock_pixmap.call_count == 0
+
+    def test_small_url_download_stays_in_memory(self, tool, pdf_path):
+        """Test small downloads are rendered without writing the PDF to disk"""
+        with open(pdf_path, 'rb') as f:
+            data = f.read()
+        response = Mock(headers={'Content-Length': str(len(data))})
+        response.iter_content.return_value = [data[:100], data[100:]]
+
+        with patch('utils.file_downloader_tool.requests.get', return_value=response):
+            images = tool.convert_pdf_to_images_from_url("https://example.com/sample.pdf")
+
+        assert len(images) == 3
+        assert not os.path.exists(os.path.join(tool.base_path, 'downloads'))
+
+    def test_large_url_download_spills_to_disk(self, tmp_path, pdf_path):
+        """Test downloads above the threshold are written to the downloads folder"""
+        with open(pdf_path, 'rb') as f:
+            data = f.read()
+        tool = pdf2imageTool(base_storage_path=str(tmp_path / "storage"), in_memory_max_bytes=100)
+        response = Mock(headers={})
+        response.iter_content.return_value = [data[:60], data[60:]]
+
+        with patch('utils.file_downloader_tool.requests.get', return_value=response):
+            images = tool.convert_pdf_to_images_from_url("https://example.com/sample.pdf")
+
+        assert len(images) == 3
+        downloads = [os.path.join(root, name)
+                     for root, _, names in os.walk(os.path.join(tool.base_path, 'downloads')) for name in names]
+        assert len(downloads) == 1
+        with open(downloads[0], 'rb') as f:
+            assert f.read() == data
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
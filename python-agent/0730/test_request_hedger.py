@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for request hedging
+"""
+
+import os
+import sys
+import time
+import pytest
+
+# Add parent directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.request_hedger import LatencyTracker, RequestHedger
+
+
+class TestLatencyTracker:
+    """Test class for LatencyTracker"""
+
+    def test_percentile_requires_min_samples(self):
+        """Test no percentile is reported before enough samples"""
+        tracker = LatencyTracker(min_samples=3)
+        tracker.record(1.0)
+        assert tracker.percentile(95) is None
+
+    def test_percentile(self):
+        """Test percentile over recorded latencies"""
+        tracker = LatencyTracker(min_samples=1)
+        for latency in range(1, 101):
+            tracker.record(float(latency))
+        assert tracker.percentile(50) == 50.0
+        assert tracker.percentile(100) == 100.0
+
+
+class TestRequestHedger:
+    """Test class for RequestHedger"""
+
+    def _warm_up(self, hedger, count=5):
+        """Record fast calls so a threshold exists"""
+        for _ in range(count):
+            hedger.call(lambda: "fast")
+
+    def test_no_hedge_for_fast_calls(self):
+        """Test fast calls are never hedged"""
+        hedger = RequestHedger(percentile=90, min_samples=3, max_hedge_rate=1.0)
+        self._warm_up(hedger)
+
+        assert hedger.call(lambda: "ok") == "ok"
+        assert hedger.get_stats()['hedges_issued'] == 0
+
+    def test_hedge_wins_on_slow_primary(self):
+        """Test the backup result is used when the primary straggles"""
+        hedger = RequestHedger(percentile=90, min_samples=3, max_hedge_rate=1.0)
+        self._warm_up(hedger)
+
+        def slow():
+            time.sleep(0.5)
+            return "primary"
+
+        assert hedger.call(slow, lambda: "backup") == "backup"
+        stats = hedger.get_stats()
+        assert stats['hedges_issued'] == 1
+        assert stats['hedges_won'] == 1
+
+    def test_hedge_rate_cap(self):
+        """Test hedging stops once the hedge rate cap is reached"""
+        hedger = RequestHedger(percentile=90, min_samples=3, max_hedge_rate=0.0)
+        self._warm_up(hedger)
+
+        def slow():
+            time.sleep(0.05)
+            return "primary"
+
+        assert hedger.call(slow, lambda: "backup") == "primary"
+        assert hedger.get_stats()['hedges_issued'] == 0
+
+    def test_backup_used_when_primary_fails(self):
+        """Test a failed primary falls back to the hedge result"""
+        hedger = RequestHedger(percentile=90, min_samples=3, max_hedge_rate=1.0)
+        self._warm_up(hedger)
+
+        def slow_failure():
+            time.sleep(0.05)
+            raise ValueError("primary failed")
+
+        def slower_backup():
+            time.sleep(0.1)
+            return "backup"
+
+        assert hedger.call(slow_failure, slower_backup) == "backup"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Offline batch submission of page conversions in OpenAI batch format
+"""
+
+import os
+import json
+import time
+import uuid
+import base64
+import logging
+import mimetypes
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Batch states after which polling stops
+TERMINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+# Terminal states whose requests that did finish still have output
+RESULT_STATUSES = {'completed', 'expired', 'cancelled'}
+
+
+def page_custom_id(page_num: int) -> str:
+    """Build the batch custom_id for a page"""
+    return f"page-{page_num:05d}"
+
+
+def page_num_from_custom_id(custom_id: str) -> int:
+    """Get the page number back from a batch custom_id"""
+    return int(custom_id.rsplit('-', 1)[1])
+
+
+def build_batch_request(custom_id: str,
+                        model_id: str,
+                        prompt: str,
+                        image_path: str,
+                        temperature: Optional[float] = None,
+                        max_tokens: Optional[int] = None,
+                        url: str = "/v1/chat/completions") -> Dict[str, Any]:
+    """
+    Build one chat completion request line for a batch file
+
+    Args:
+        custom_id: Identifier used to map the response back to the page
+        model_id: Vision model ID
+        prompt: Conversion prompt
+        image_path: Path to the page image, embedded as a data URL
+        temperature: Sampling temperature
+        max_tokens: Cap on generated tokens
+        url: Endpoint the batch is executed against
+
+    Returns:
+        Request dict in OpenAI batch format
+    """
+    mime_type = mimetypes.guess_type(image_path)[0] or 'image/jpeg'
+    with open(image_path, 'rb') as f:
+        image_b64 = base64.b64encode(f.read()).decode('ascii')
+
+    body: Dict[str, Any] = {
+        'model': model_id,
+        'messages': [{
+            'role': 'user',
+            'content': [
+                {'type': 'text', 'text': prompt},
+                {'type': 'image_url', 'image_url': {'url': f"data:{mime_type};base64,{image_b64}"}}
+            ]
+        }]
+    }
+    if temperature is not None:
+        body['temperature'] = temperature
+    if max_tokens is not None:
+        body['max_tokens'] = max_tokens
+    return {'custom_id': custom_id, 'method': 'POST', 'url': url, 'body': body}
+
+
+def write_batch_file(requests: Iterable[Dict[str, Any]], path: str) -> str:
+    """
+    Write batch requests as JSONL
+
+    Args:
+        requests: Request dicts
+        path: Output file path
+
+    Returns:
+        Path to the written file
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+
+def parse_batch_output_line(line: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Extract the result of one batch output line
+
+    Args:
+        line: Parsed output line
+
+    Returns:
+        Tuple of (custom_id, content, error)
+    """
+    custom_id = line.get('custom_id')
+    if line.get('error'):
+        error = line['error']
+        return custom_id, None, error.get('message', str(error)) if isinstance(error, dict) else str(error)
+    response = line.get('response') or {}
+    if response.get('status_code', 200) >= 400:
+        return custom_id, None, f"HTTP {response.get('status_code')}: {response.get('body')}"
+    try:
+        content = response['body']['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return custom_id, None, "Malformed batch response"
+    return custom_id, content, None
+
+
+class BatchClient:
+    """Interface for submitting batch files and collecting their results"""
+
+    def submit(self, batch_file_path: str) -> str:
+        """Submit a JSONL batch file and return the batch ID"""
+        raise NotImplementedError
+
+    def get_status(self, batch_id: str) -> str:
+        """Get the batch status (e.g. 'in_progress', 'completed', 'failed')"""
+        raise NotImplementedError
+
+    def fetch_results(self, batch_id: str) -> List[Dict[str, Any]]:
+        """Get the parsed output lines of a finished batch (partial for expired or cancelled ones)"""
+        raise NotImplementedError
+
+    def cancel(self, batch_id: str) -> None:
+        """Cancel a batch; requests already finished keep their output"""
+        raise NotImplementedError
+
+
+class OpenAIBatchClient(BatchClient):
+    """Batch client for OpenAI-compatible batch APIs (OpenAI, DashScope)"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, completion_window: str = "24h"):
+        """
+        Initialize the batch client
+
+        Args:
+            api_key: API key for the service
+            base_url: Base URL of the OpenAI-compatible service
+            completion_window: Completion window requested for the batch
+        """
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.completion_window = completion_window
+
+    def submit(self, batch_file_path: str) -> str:
+        with open(batch_file_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def get_status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def fetch_results(self, batch_id: str) -> List[Dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                text = self.client.files.content(file_id).text
+                lines.extend(json.loads(line) for line in text.splitlines() if line.strip())
+        return lines
+
+    def cancel(self, batch_id: str) -> None:
+        self.client.batches.cancel(batch_id)
+
+
+class LocalBatchClient(BatchClient):
+    """
+    File-based stand-in for a batch API.
+
+    Requests are answered by a handler receiving the request body and
+    returning the message content (or raising). Output is written as a
+    JSONL file in OpenAI batch output format.
+    """
+
+    def __init__(self,
+                 handler: Callable[[Dict[str, Any]], str],
+                 storage_dir: str,
+                 polls_until_complete: int = 0):
+        """
+        Initialize the local batch client
+
+        Args:
+            handler: Callable producing the content for a request body
+            storage_dir: Directory for batch output files
+            polls_until_complete: Number of status polls reporting 'in_progress' first
+        """
+        self.handler = handler
+        self.storage_dir = storage_dir
+        self.polls_until_complete = polls_until_complete
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    def submit(self, batch_file_path: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        output_path = os.path.join(self.storage_dir, f"{batch_id}_output.jsonl")
+        output = []
+        with open(batch_file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    content = self.handler(request['body'])
+                    output.append({
+                        'custom_id': request['custom_id'],
+                        'response': {'status_code': 200, 'body': {'choices': [{'message': {'content': content}}]}},
+                        'error': None
+                    })
+                except Exception as e:
+                    output.append({'custom_id': request['custom_id'], 'response': None, 'error': {'message': str(e)}})
+        write_batch_file(output, output_path)
+        self._batches[batch_id] = {'polls': 0, 'output_path': output_path}
+        return batch_id
+
+    def get_status(self, batch_id: str) -> str:
+        batch = self._batches[batch_id]
+        if batch.get('cancelled'):
+            return 'cancelled'
+        batch['polls'] += 1
+        return 'completed' if batch['polls'] > self.polls_until_complete else 'in_progress'
+
+    def fetch_results(self, batch_id: str) -> List[Dict[str, Any]]:
+        with open(self._batches[batch_id]['output_path'], 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def cancel(self, batch_id: str) -> None:
+        self._batches[batch_id]['cancelled'] = True
+
+
+def wait_for_batch(client: BatchClient,
+                   batch_id: str,
+                   poll_interval: float = 30.0,
+                   timeout: float = 24 * 3600,
+                   cancel_token: Optional[CancellationToken] = None) -> str:
+    """
+    Poll a batch until it reaches a terminal status
+
+    Args:
+        client: Batch client
+        batch_id: Batch ID
+        poll_interval: Seconds between status polls
+        timeout: Maximum seconds to wait
+        cancel_token: Token that stops waiting when cancelled
+
+    Returns:
+        Terminal status
+
+    Raises:
+        TimeoutError: If the batch does not finish in time
+        ConversionCancelled: If the token is cancelled while waiting
+    """
+    deadline = time.time() + timeout
+    while True:
+        status = client.get_status(batch_id)
+        if status in TERMINAL_STATUSES:
+            return status
+        if time.time() + poll_interval > deadline:
+            raise TimeoutError(f"Batch {batch_id} still {status} after {timeout} seconds")
+        logger.info(f"Batch {batch_id} is {status}, polling again in {poll_interval}s")
+        if cancel_token is None:
+            time.sleep(poll_interval)
+        elif cancel_token.wait(poll_interval):
+            cancel_token.raise_if_cancelled()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Cooperative cancellation tokens for conversion jobs
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class ConversionCancelled(Exception):
+    """Raised inside a page task when its job has been cancelled"""
+
+
+class CancellationToken:
+    """
+    Signal shared by a caller and the conversion jobs it starts.
+
+    Cancelling a token is sticky and idempotent; the first reason wins.
+    Jobs poll `cancelled` between steps (page rendering, stream chunks) and
+    register callbacks to wake up blocked waits. A token can cancel itself
+    after a timeout, and a linked token is cancelled with its parent, which
+    lets a job add its own timeout without touching the caller's token.
+    Worker threads pick up the job's token through wrap().
+    """
+
+    def __init__(self):
+        """Initialize an uncancelled token"""
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self._callbacks: List[Callable[[str], None]] = []
+        self._timers: List[threading.Timer] = []
+        self._unlink: Optional[Callable[[], None]] = None
+
+    @classmethod
+    def linked(cls, parent: Optional["CancellationToken"]) -> "CancellationToken":
+        """Create a token that is cancelled (with the same reason) when parent is"""
+        token = cls()
+        if parent is not None:
+            token._unlink = parent.add_callback(token.cancel)
+        return token
+
+    @staticmethod
+    def current() -> Optional["CancellationToken"]:
+        """Get the token of the job running on this thread"""
+        return getattr(_local, 'token', None)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token has been cancelled"""
+        return self._event.is_set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Reason given by the first cancel() call"""
+        return self._reason
+
+    def cancel(self, reason: str = "cancelled by caller") -> bool:
+        """
+        Cancel the token and run its callbacks
+
+        Args:
+            reason: Reason reported for pages that were not processed
+
+        Returns:
+            True if this call cancelled the token, False if it already was
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        logger.info(f"Cancellation requested: {reason}")
+        for callback in callbacks:
+            try:
+                callback(reason)
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+        return True
+
+    def cancel_after(self, seconds: float, reason: str = "timeout exceeded") -> None:
+        """Cancel the token once the given number of seconds has passed"""
+        timer = threading.Timer(max(0.0, seconds), self.cancel, args=(reason,))
+        timer.daemon = True
+        with self._lock:
+            self._timers.append(timer)
+        timer.start()
+
+    def add_callback(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """
+        Call callback(reason) on cancellation (immediately if already cancelled)
+
+        Returns:
+            Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback(self._reason)
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the token is cancelled; returns whether it was"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        """Raise ConversionCancelled if the token has been cancelled"""
+        if self._event.is_set():
+            raise ConversionCancelled(self._reason)
+
+    def dispose(self) -> None:
+        """Stop pending timeouts and detach from the parent token"""
+        with self._lock:
+            timers, self._timers = self._timers, []
+            unlink, self._unlink = self._unlink, None
+        for timer in timers:
+            timer.cancel()
+        if unlink is not None:
+            unlink()
+
+    @contextmanager
+    def activate(self) -> Iterator["CancellationToken"]:
+        """Make this the token of the current thread"""
+        previous = getattr(_local, 'token', None)
+        _local.token = self
+        try:
+            yield self
+        finally:
+            _local.token = previous
+
+    def wrap(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a task so it runs with this token active on its worker thread"""
+        def run(*args, **kwargs):
+            with self.activate():
+                return fn(*args, **kwargs)
+        return run
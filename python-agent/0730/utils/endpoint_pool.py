@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Weighted load balancing with per-endpoint circuit breakers
+"""
+
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class NoHealthyEndpointError(Exception):
+    """Raised when every endpoint's circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stop sending traffic to a failing endpoint and probe it for recovery"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        Initialize the circuit breaker
+
+        Args:
+            failure_threshold: Consecutive failures before the circuit opens
+            recovery_timeout: Seconds to wait before probing an open circuit
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+
+    def try_probe(self, now: float) -> bool:
+        """Move an open circuit to half-open once the recovery timeout elapsed"""
+        if self.state == self.OPEN and now - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Give back a probe that ended without a verdict; the circuit reopens with its original cooldown"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self, now: float) -> None:
+        """Count a failure, opening the circuit when the threshold is reached"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = now
+
+
+class Endpoint:
+    """An OpenAI-compatible backend with its breaker and health counters"""
+
+    def __init__(self, base_url: str, api_key: str, weight: float = 1.0,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.weight = weight
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+
+
+class EndpointPool:
+    """Pick endpoints by weight, skipping those whose circuit is open"""
+
+    def __init__(self,
+                 endpoints: List[Dict[str, Any]],
+                 default_api_key: Optional[str] = None,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0):
+        """
+        Initialize the endpoint pool
+
+        Args:
+            endpoints: List of dicts with 'base_url', optional 'api_key' and 'weight'
+            default_api_key: API key for endpoints that do not specify one
+            failure_threshold: Consecutive failures before an endpoint is taken out
+            recovery_timeout: Seconds before a failed endpoint is probed again
+        """
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = [
+            Endpoint(
+                base_url=config['base_url'],
+                api_key=config.get('api_key') or default_api_key,
+                weight=config.get('weight', 1.0),
+                failure_threshold=failure_threshold,
+                recovery_timeout=recovery_timeout
+            )
+            for config in endpoints
+        ]
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Endpoint:
+        """
+        Choose an endpoint for the next request
+
+        Returns:
+            An endpoint to probe if one is due for recovery, otherwise a
+            weighted random choice among endpoints with a closed circuit
+
+        Raises:
+            NoHealthyEndpointError: If no endpoint can take traffic
+        """
+        now = time.time()
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.breaker.try_probe(now):
+                    logger.info(f"Probing endpoint {endpoint.base_url} for recovery")
+                    return endpoint
+            healthy = [e for e in self.endpoints if e.breaker.state == CircuitBreaker.CLOSED]
+            if not healthy:
+                raise NoHealthyEndpointError("All endpoints are unavailable (circuit open)")
+            return random.choices(healthy, weights=[e.weight for e in healthy])[0]
+
+    def record_success(self, endpoint: Endpoint, latency: float) -> None:
+        """Record a successful request"""
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.total_latency += latency
+            endpoint.breaker.record_success()
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        """Record a failed request"""
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.failures += 1
+            was_open = endpoint.breaker.state == CircuitBreaker.OPEN
+            endpoint.breaker.record_failure(time.time())
+            if not was_open and endpoint.breaker.state == CircuitBreaker.OPEN:
+                logger.warning(f"Circuit opened for endpoint {endpoint.base_url}")
+
+    def release(self, endpoint: Endpoint) -> None:
+        """
+        Return an endpoint whose request ended without a result (e.g. it was cancelled)
+
+        Counts nothing against the endpoint. If the request was a recovery
+        probe, the circuit goes back to open so the next acquire() probes again.
+        """
+        with self._lock:
+            endpoint.breaker.release_probe()
+
+    def get_health_stats(self) -> List[Dict[str, Any]]:
+        """Get per-endpoint health statistics"""
+        with self._lock:
+            return [
+                {
+                    'base_url': e.base_url,
+                    'weight': e.weight,
+                    'state': e.breaker.state,
+                    'requests': e.requests,
+                    'failures': e.failures,
+                    'consecutive_failures': e.breaker.consecutive_failures,
+                    'avg_latency_seconds': e.total_latency / (e.requests - e.failures)
+                    if e.requests > e.failures else None,
+                }
+                for e in self.endpoints
+            ]
@@ -8,7 +8,7 @@ import hashlib
 import requests
 import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class FileDownloaderTool:
@@ -62,6 +62,75 @@ class FileDownloaderTool:
         except Exception as e:
             raise Exception(f"Error downloading PDF: {e}")
     
+    def fetch_pdf(self, pdf_url: str, max_in_memory_bytes: int,
+                  filename: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Download PDF file from URL, keeping it in memory when it is small
+        
+        The body is buffered in memory until it grows past max_in_memory_bytes;
+        only then is it written to the download directory.
+        
+        Args:
+            pdf_url: URL of the PDF file
+            max_in_memory_bytes: Largest file kept in memory (0 always writes to disk)
+            filename: Optional filename used if the file is written to disk
+            
+        Returns:
+            Tuple of (pdf_bytes, None) for in-memory files or (None, pdf_path)
+            
+        Raises:
+            Exception: If download fails
+        """
+        try:
+            response = requests.get(pdf_url, stream=True)
+            response.raise_for_status()
+            
+            content_length = int(response.headers.get('Content-Length') or 0)
+            buffer = bytearray()
+            file = None
+            pdf_path = None
+            try:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if file is None and (content_length > max_in_memory_bytes
+                                         or len(buffer) + len(chunk) > max_in_memory_bytes):
+                        # Too large for memory: spill what was buffered to disk
+                        os.makedirs(self.download_dir, exist_ok=True)
+                        if filename is None:
+                            filename = f"downloaded_pdf_{hashlib.md5(pdf_url.encode()).hexdigest()[:8]}.pdf"
+                        pdf_path = os.path.join(self.download_dir, filename)
+                        file = open(pdf_path, 'wb')
+                        file.write(buffer)
+                        buffer = bytearray()
+                    if file is not None:
+                        file.write(chunk)
+                    else:
+                        buffer.extend(chunk)
+            finally:
+                if file is not None:
+                    file.close()
+            
+            if pdf_path is not None:
+                return None, pdf_path
+            return bytes(buffer), None
+            
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to download PDF from {pdf_url}: {e}")
+        except Exception as e:
+            raise Exception(f"Error downloading PDF: {e}")
+    
+    @staticmethod
+    def calculate_bytes_md5(data: bytes) -> str:
+        """
+        Calculate MD5 hash of an in-memory buffer
+        
+        Args:
+            data: Bytes-like object (bytes, bytearray, memoryview)
+            
+        Returns:
+            MD5 hash string
+        """
+        return hashlib.md5(data).hexdigest()
+    
     def calculate_file_md5(self, file_path: str) -> str:
         """
         Calculate MD5 hash of a file
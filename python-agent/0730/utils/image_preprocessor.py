@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Page image preprocessing: margin cropping and grayscale/bitonal encoding
+"""
+
+import io
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+class ImagePreprocessor:
+    """
+    Shrink rendered pages before they are uploaded to the vision model.
+
+    Whitespace margins are cropped and pages without color content are
+    stored as grayscale, or bitonal when they contain almost no mid-tones.
+    Fewer pixels and channels mean smaller uploads and fewer vision tokens.
+    """
+
+    COLOR_MODES = ('auto', 'color', 'grayscale', 'bitonal')
+
+    def __init__(self,
+                 crop_margins: bool = True,
+                 margin_threshold: int = 240,
+                 padding: int = 12,
+                 color_mode: str = 'auto',
+                 chroma_threshold: int = 40,
+                 color_pixel_ratio: float = 0.005,
+                 bitonal_midtone_ratio: float = 0.02,
+                 bitonal_threshold: int = 160,
+                 report_savings: bool = True):
+        """
+        Initialize the preprocessor
+
+        Args:
+            crop_margins: Crop whitespace around the page content
+            margin_threshold: Gray level above which a pixel counts as background
+            padding: Pixels of background kept around the content
+            color_mode: 'auto' picks per page; 'color', 'grayscale' or 'bitonal' force a mode
+            chroma_threshold: Channel spread above which a pixel counts as colored
+            color_pixel_ratio: Fraction of colored pixels above which a page keeps its color
+            bitonal_midtone_ratio: Fraction of mid-tone pixels below which 'auto' goes bitonal
+            bitonal_threshold: Gray level separating black from white in bitonal pages
+            report_savings: Encode the unprocessed page too, to report bytes saved
+        """
+        if color_mode not in self.COLOR_MODES:
+            raise ValueError(f"Unsupported color mode: {color_mode}")
+        self.crop_margins = crop_margins
+        self.margin_threshold = margin_threshold
+        self.padding = padding
+        self.color_mode = color_mode
+        self.chroma_threshold = chroma_threshold
+        self.color_pixel_ratio = color_pixel_ratio
+        self.bitonal_midtone_ratio = bitonal_midtone_ratio
+        self.bitonal_threshold = bitonal_threshold
+        self.report_savings = report_savings
+
+    def settings_key(self) -> str:
+        """Key identifying every setting that affects the output, part of the render cache folder"""
+        crop = f"crop{self.margin_threshold}p{self.padding}" if self.crop_margins else "nocrop"
+        return (f"{crop}_{self.color_mode}_c{self.chroma_threshold}r{self.color_pixel_ratio:g}"
+                f"_b{self.bitonal_midtone_ratio:g}t{self.bitonal_threshold}")
+
+    def content_box(self, gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Find the bounding box of non-background pixels
+
+        Args:
+            gray: 2D uint8 array of the page
+
+        Returns:
+            (left, top, right, bottom) including padding, or None for a blank page
+        """
+        mask = gray < self.margin_threshold
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if rows.size == 0:
+            return None
+        height, width = gray.shape
+        return (
+            max(0, int(cols[0]) - self.padding),
+            max(0, int(rows[0]) - self.padding),
+            min(width, int(cols[-1]) + 1 + self.padding),
+            min(height, int(rows[-1]) + 1 + self.padding),
+        )
+
+    def classify(self, rgb: np.ndarray, gray: np.ndarray) -> str:
+        """
+        Choose the color mode for a page
+
+        Args:
+            rgb: HxWx3 uint8 array of the page
+            gray: HxW uint8 luminance of the page
+
+        Returns:
+            'color', 'grayscale' or 'bitonal'
+        """
+        if self.color_mode != 'auto':
+            return self.color_mode
+        chroma = rgb.max(axis=2).astype(np.int16) - rgb.min(axis=2)
+        if np.count_nonzero(chroma > self.chroma_threshold) > self.color_pixel_ratio * chroma.size:
+            return 'color'
+        midtones = np.count_nonzero((gray > 64) & (gray < 192))
+        if midtones < self.bitonal_midtone_ratio * gray.size:
+            return 'bitonal'
+        return 'grayscale'
+
+    def process(self, img: Image.Image, image_format: str = 'jpeg') -> Tuple[Image.Image, Dict[str, Any]]:
+        """
+        Crop and re-encode the colors of a rendered page
+
+        Args:
+            img: Rendered page
+            image_format: Output format ('jpeg' or 'png'); bitonal pages are kept
+                8-bit for JPEG, which has no 1-bit mode
+
+        Returns:
+            Tuple of (processed image, info with 'color_mode', 'cropped' and sizes)
+        """
+        rgb_img = img.convert("RGB")
+        gray_img = rgb_img.convert("L")
+        gray = np.asarray(gray_img)
+        info = {'original_size': rgb_img.size, 'cropped': False}
+
+        if self.crop_margins:
+            box = self.content_box(gray)
+            if box is not None and box != (0, 0, gray.shape[1], gray.shape[0]):
+                rgb_img = rgb_img.crop(box)
+                gray_img = gray_img.crop(box)
+                gray = np.asarray(gray_img)
+                info['cropped'] = True
+
+        mode = self.classify(np.asarray(rgb_img), gray)
+        if mode == 'color':
+            out = rgb_img
+        elif mode == 'grayscale':
+            out = gray_img
+        else:
+            out = Image.fromarray(np.where(gray < self.bitonal_threshold, 0, 255).astype(np.uint8))
+            if image_format == 'png':
+                out = out.convert("1", dither=Image.Dither.NONE)
+        info['color_mode'] = mode
+        info['size'] = out.size
+        return out, info
+
+    @staticmethod
+    def encoded_size(img: Image.Image, image_format: str = 'jpeg', quality: int = 80) -> int:
+        """Get the encoded size of an image in bytes"""
+        buffer = io.BytesIO()
+        if image_format == 'jpeg':
+            img.save(buffer, "JPEG", quality=quality)
+        else:
+            img.save(buffer, "PNG")
+        return buffer.tell()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Per-job stage timing and cProfile collection for conversion jobs
+"""
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, Optional
+
+_local = threading.local()
+
+
+class JobProfiler:
+    """
+    Collect a stage-level breakdown and cProfile data for one conversion job.
+
+    Stages are timed (wall and thread CPU time) wherever they run; the
+    outermost stage on each thread is also run under cProfile, and profiles
+    are merged per stage. Worker threads pick up the job's profiler through
+    wrap() (as a stage) or bind(). On Python 3.12+ only one cProfile can be active at a time, so
+    concurrent stages fall back to timing only.
+    """
+
+    def __init__(self, output_dir: str, job_id: str, use_cprofile: bool = True, top_functions: int = 15):
+        """
+        Initialize the profiler
+
+        Args:
+            output_dir: Directory for the profile artifacts
+            job_id: Identifier used in the artifact file names
+            use_cprofile: Run outermost stages under cProfile
+            top_functions: Number of functions listed per stage in the breakdown
+        """
+        self.output_dir = output_dir
+        self.job_id = job_id
+        self.use_cprofile = use_cprofile
+        self.top_functions = top_functions
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._profiles: Dict[str, pstats.Stats] = {}
+
+    @staticmethod
+    def current() -> Optional["JobProfiler"]:
+        """Get the profiler active on this thread"""
+        return getattr(_local, 'profiler', None)
+
+    @contextmanager
+    def activate(self) -> Iterator["JobProfiler"]:
+        """Make this the active profiler of the current thread"""
+        previous = getattr(_local, 'profiler', None)
+        _local.profiler = self
+        try:
+            yield self
+        finally:
+            _local.profiler = previous
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage, profiling it with cProfile if it is the outermost one on this thread"""
+        depth = getattr(_local, 'depth', 0)
+        profile = None
+        if self.use_cprofile and depth == 0:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active (one at a time on Python 3.12+)
+                profile = None
+        _local.depth = depth + 1
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            _local.depth = depth
+            self.record(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+            if profile is not None:
+                with self._lock:
+                    if name in self._profiles:
+                        self._profiles[name].add(profile)
+                    else:
+                        self._profiles[name] = pstats.Stats(profile)
+
+    def record(self, name: str, wall_seconds: float, cpu_seconds: float = 0.0) -> None:
+        """Add a measurement to a stage"""
+        with self._lock:
+            stage = self._stages.setdefault(
+                name, {'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'max_seconds': 0.0}
+            )
+            stage['count'] += 1
+            stage['wall_seconds'] += wall_seconds
+            stage['cpu_seconds'] += cpu_seconds
+            stage['max_seconds'] = max(stage['max_seconds'], wall_seconds)
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a task so it runs as a stage of this job, recording its queue wait"""
+        submitted = time.perf_counter()
+
+        def run(*args, **kwargs):
+            self.record('queue_wait', time.perf_counter() - submitted)
+            with self.activate(), self.stage(name):
+                return fn(*args, **kwargs)
+        return run
+
+    def bind(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a task so it runs with this profiler active, without a stage of its own"""
+        def run(*args, **kwargs):
+            with self.activate():
+                return fn(*args, **kwargs)
+        return run
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Write the merged cProfile dump and the stage breakdown
+
+        Returns:
+            Dict with 'profile_path' (None without cProfile data), 'stages_path'
+            and the 'stages' breakdown
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            profiles = dict(self._profiles)
+
+        for name, stats in profiles.items():
+            stages[name]['top_functions'] = self._top_functions(stats)
+
+        profile_path = None
+        if profiles:
+            profile_path = os.path.join(self.output_dir, f"{self.job_id}.prof")
+            merged = pstats.Stats()
+            for stats in profiles.values():
+                merged.add(stats)
+            merged.dump_stats(profile_path)
+
+        stages_path = os.path.join(self.output_dir, f"{self.job_id}_stages.json")
+        breakdown = {
+            'job_id': self.job_id,
+            'wall_seconds': time.perf_counter() - self.started_at,
+            'stages': stages,
+        }
+        with open(stages_path, 'w', encoding='utf-8') as f:
+            json.dump(breakdown, f, ensure_ascii=False, indent=2)
+        return {'profile_path': profile_path, 'stages_path': stages_path, 'stages': stages}
+
+    def _top_functions(self, stats: pstats.Stats):
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                'function': f"{os.path.basename(filename)}:{line}({func})",
+                'calls': calls,
+                'tottime': tottime,
+                'cumtime': cumtime,
+            }
+            for (filename, line, func), (_, calls, tottime, cumtime, _) in entries[:self.top_functions]
+        ]
+
+
+def profile_stage(name: str):
+    """Time a stage for the active job profiler, or do nothing when profiling is off"""
+    profiler = JobProfiler.current()
+    return profiler.stage(name) if profiler is not None else nullcontext()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Page layout analysis for hybrid local/vision conversion
+"""
+
+import statistics
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import fitz
+
+BBox = Tuple[float, float, float, float]
+
+
+@dataclass(slots=True)
+class Region:
+    """A part of a page: locally extracted text, or a table/figure for the vision model"""
+
+    kind: str
+    bbox: BBox
+    text: Optional[str] = None
+    image_path: Optional[str] = None
+
+
+@dataclass(slots=True)
+class PagePlan:
+    """Regions of a page in reading order, or a request to send the whole page"""
+
+    page_num: int
+    regions: List[Region] = field(default_factory=list)
+    needs_full_page: bool = False
+    vision_area_ratio: float = 0.0
+    full_page_image: Optional[str] = None
+
+
+def _area(bbox: BBox) -> float:
+    return max(0.0, bbox[2] - bbox[0]) * max(0.0, bbox[3] - bbox[1])
+
+
+def _intersection_area(a: BBox, b: BBox) -> float:
+    return _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+def _union(a: BBox, b: BBox) -> BBox:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+class LayoutAnalyzer:
+    """
+    Split pages into text, table and figure regions using the PDF structure.
+
+    Tables come from fitz table detection, figures from image blocks and
+    clusters of vector drawings. Text blocks outside those regions are
+    converted to markdown locally. Pages without a text layer (scans) or
+    mostly covered by tables and figures are sent whole instead.
+    Regions are returned in reading order: column by column, top to bottom
+    within a column. Regions spanning the columns (titles, wide tables)
+    split the page into bands that are read in turn.
+    """
+
+    def __init__(self,
+                 min_text_chars: int = 20,
+                 min_figure_size: float = 24.0,
+                 region_margin: float = 4.0,
+                 max_vision_coverage: float = 0.6,
+                 heading_ratio: float = 1.25,
+                 detect_tables: bool = True,
+                 detect_drawings: bool = True,
+                 spanning_ratio: float = 0.5):
+        """
+        Initialize the layout analyzer
+
+        Args:
+            min_text_chars: Pages with less extractable text are sent whole (scans)
+            min_figure_size: Minimum width and height (points) of a figure region
+            region_margin: Points added around table and figure regions
+            max_vision_coverage: Fraction of the page covered by tables/figures above
+                which the whole page is sent instead of separate regions
+            heading_ratio: Font size relative to body text at which a short block
+                becomes a heading
+            detect_tables: Detect tables with fitz table finder
+            detect_drawings: Treat clusters of vector drawings as figures
+            spanning_ratio: Fraction of the page width above which a region spans
+                all columns rather than belonging to one
+        """
+        self.min_text_chars = min_text_chars
+        self.min_figure_size = min_figure_size
+        self.region_margin = region_margin
+        self.max_vision_coverage = max_vision_coverage
+        self.heading_ratio = heading_ratio
+        self.detect_tables = detect_tables
+        self.detect_drawings = detect_drawings
+        self.spanning_ratio = spanning_ratio
+
+    def settings_key(self) -> str:
+        """Key identifying the settings, part of the region cache folder"""
+        flags = ('t' if self.detect_tables else '') + ('d' if self.detect_drawings else '')
+        return f"f{self.min_figure_size:g}_m{self.region_margin:g}_{flags or 'none'}"
+
+    def analyze(self, page: fitz.Page) -> PagePlan:
+        """
+        Analyze a page
+
+        Args:
+            page: Page of an open fitz document
+
+        Returns:
+            PagePlan with regions in reading order
+        """
+        page_rect = page.rect
+        page_bbox = (page_rect.x0, page_rect.y0, page_rect.x1, page_rect.y1)
+        plan = PagePlan(page_num=page.number + 1)
+
+        blocks = page.get_text("dict")["blocks"]
+        text_blocks = [b for b in blocks if b.get('type') == 0]
+        char_count = sum(len(span['text'].strip()) for b in text_blocks
+                         for line in b['lines'] for span in line['spans'])
+        if char_count < self.min_text_chars:
+            plan.needs_full_page = True
+            plan.vision_area_ratio = 1.0
+            return plan
+
+        visual = self._table_regions(page) + self._figure_regions(page, blocks)
+        visual = self._merge_overlapping(visual)
+        visual = [Region(kind, self._clip(self._expand(bbox), page_bbox)) for kind, bbox in visual]
+
+        page_area = _area(page_bbox)
+        vision_area = sum(_area(r.bbox) for r in visual)
+        plan.vision_area_ratio = min(1.0, vision_area / page_area) if page_area else 0.0
+        if plan.vision_area_ratio > self.max_vision_coverage:
+            plan.needs_full_page = True
+            plan.vision_area_ratio = 1.0
+            return plan
+
+        body_size = self._body_font_size(text_blocks)
+        text_regions = []
+        for block in text_blocks:
+            bbox = tuple(block['bbox'])
+            block_area = _area(bbox)
+            # Text inside a table or figure is transcribed with that region
+            if any(_intersection_area(bbox, r.bbox) > 0.5 * block_area for r in visual):
+                continue
+            text = self._block_markdown(block, body_size)
+            if text:
+                text_regions.append(Region('text', bbox, text=text))
+
+        plan.regions = self._reading_order(text_regions + visual, page_rect.width)
+        return plan
+
+    def _reading_order(self, regions: List[Region], page_width: float) -> List[Region]:
+        """Order regions band by band, and within a band column by column, top to bottom"""
+        by_top = sorted(regions, key=lambda r: (r.bbox[1], r.bbox[0]))
+        spanning, narrow = [], []
+        for region in by_top:
+            wide = region.bbox[2] - region.bbox[0] > self.spanning_ratio * page_width
+            (spanning if wide else narrow).append(region)
+        bands: List[List[Region]] = [[] for _ in range(len(spanning) + 1)]
+        for region in narrow:
+            # The band below the last spanning region starting above this one
+            bands[sum(1 for s in spanning if s.bbox[1] <= region.bbox[1])].append(region)
+
+        ordered = []
+        for index, band in enumerate(bands):
+            ordered.extend(self._column_order(band))
+            if index < len(spanning):
+                ordered.append(spanning[index])
+        return ordered
+
+    @staticmethod
+    def _column_order(regions: List[Region]) -> List[Region]:
+        """Group regions into columns by horizontal overlap; read columns left to right"""
+        keyed = []
+        right_edge = None
+        column = -1
+        for region in sorted(regions, key=lambda r: r.bbox[0]):
+            if right_edge is not None and region.bbox[0] < right_edge:
+                right_edge = max(right_edge, region.bbox[2])
+            else:
+                column += 1
+                right_edge = region.bbox[2]
+            keyed.append(((column, region.bbox[1], region.bbox[0]), region))
+        keyed.sort(key=lambda item: item[0])
+        return [region for _, region in keyed]
+
+    def _table_regions(self, page: fitz.Page) -> List[Tuple[str, BBox]]:
+        if not self.detect_tables:
+            return []
+        return [('table', tuple(table.bbox)) for table in page.find_tables().tables]
+
+    def _figure_regions(self, page: fitz.Page, blocks: List[dict]) -> List[Tuple[str, BBox]]:
+        figures = [tuple(b['bbox']) for b in blocks if b.get('type') == 1]
+        if self.detect_drawings:
+            figures.extend(tuple(rect) for rect in page.cluster_drawings())
+        return [('figure', bbox) for bbox in figures
+                if bbox[2] - bbox[0] >= self.min_figure_size and bbox[3] - bbox[1] >= self.min_figure_size]
+
+    @staticmethod
+    def _merge_overlapping(regions: List[Tuple[str, BBox]]) -> List[Tuple[str, BBox]]:
+        """Merge intersecting regions until none intersect; a merge involving a table stays a table"""
+        merged = sorted(regions, key=lambda r: r[0] != 'table')
+        changed = True
+        while changed:
+            # A union can reach regions it was checked against before; repeat until stable
+            changed = False
+            remaining = []
+            for kind, bbox in merged:
+                for index, (other_kind, other_bbox) in enumerate(remaining):
+                    if _intersection_area(bbox, other_bbox) > 0:
+                        merged_kind = 'table' if 'table' in (kind, other_kind) else other_kind
+                        remaining[index] = (merged_kind, _union(bbox, other_bbox))
+                        changed = True
+                        break
+                else:
+                    remaining.append((kind, bbox))
+            merged = remaining
+        return merged
+
+    def _expand(self, bbox: BBox) -> BBox:
+        m = self.region_margin
+        return (bbox[0] - m, bbox[1] - m, bbox[2] + m, bbox[3] + m)
+
+    @staticmethod
+    def _clip(bbox: BBox, page_bbox: BBox) -> BBox:
+        return (max(bbox[0], page_bbox[0]), max(bbox[1], page_bbox[1]),
+                min(bbox[2], page_bbox[2]), min(bbox[3], page_bbox[3]))
+
+    @staticmethod
+    def _body_font_size(text_blocks: List[dict]) -> float:
+        """Most common font size, weighted by characters"""
+        sizes = [round(span['size'], 1) for b in text_blocks for line in b['lines']
+                 for span in line['spans'] for _ in span['text'].strip()]
+        return statistics.mode(sizes) if sizes else 0.0
+
+    def _block_markdown(self, block: dict, body_size: float) -> str:
+        lines = []
+        max_size = 0.0
+        for line in block['lines']:
+            text = "".join(span['text'] for span in line['spans']).strip()
+            if text:
+                lines.append(text)
+                max_size = max([max_size] + [span['size'] for span in line['spans']])
+        if not lines:
+            return ""
+        if body_size and len(lines) <= 2 and max_size >= self.heading_ratio * body_size:
+            return "## " + " ".join(lines)
+        return "\n".join(lines)
@@ -5,14 +5,19 @@ PDF to Markdown conversion tool using LLM
 
 import os
 import sys
+import asyncio
 import time
 import json
+import uuid
+import hashlib
 import logging
+import threading
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Dict, Any, Callable, Iterator
+from concurrent.futures import Future, wait, FIRST_COMPLETED
 import getpass
 from functools import wraps
+from contextlib import contextmanager, nullcontext
 
 # Add parent directory to path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,8 +27,28 @@ sys.path.insert(0, parent_dir)
 from agno.agent import Agent
 from agno.media import Image
 from agno.models.openai.like import OpenAILike
+from agno.run.response import RunEvent
 
 from utils.pdf2image_tool import pdf2imageTool
+from utils.request_hedger import RequestHedger
+from utils.page_scheduler import PageScheduler
+from utils.tenant_quota import TenantQuota
+from utils.markdown_index import MarkdownSearchIndex
+from utils.page_quality import PageQualityChecker
+from utils.endpoint_pool import EndpointPool
+from utils.token_utils import estimate_tokens
+from utils.page_result import PageResult, ConversionResult
+from utils.model_cassette import ModelCassette, request_fingerprint
+from utils.image_preprocessor import ImagePreprocessor
+from utils.layout_analyzer import LayoutAnalyzer, PagePlan
+from utils.memory_governor import MemoryGovernor, get_memory_governor, estimate_request_bytes
+from utils.job_profiler import JobProfiler, profile_stage
+from utils.cancellation import CancellationToken, ConversionCancelled
+from utils.page_fingerprint import PageResultStore, conversion_key
+from utils.batch_tool import (
+    RESULT_STATUSES, BatchClient, OpenAIBatchClient, build_batch_request, write_batch_file,
+    parse_batch_output_line, page_custom_id, page_num_from_custom_id, wait_for_batch
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -51,9 +76,61 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
     return decorator
 
 
+class StreamedRun:
+    """Content and timings collected from a streamed model response"""
+    
+    __slots__ = ('content', 'ttft_seconds', 'output_tokens', 'truncated')
+    
+    def __init__(self, content: str, ttft_seconds: Optional[float], output_tokens: int, truncated: bool):
+        self.content = content
+        self.ttft_seconds = ttft_seconds
+        self.output_tokens = output_tokens
+        self.truncated = truncated
+
+
+class ProgressiveConversion:
+    """
+    Handle to a conversion whose preview pages are already converted.
+    
+    The remaining pages continue in the background; poll with done(),
+    block with result(), or await the handle from asyncio code.
+    """
+    
+    def __init__(self, preview: Dict[str, Any], future: Future, cancel: Callable[[], None]):
+        self.preview = preview
+        self._future = future
+        self._cancel = cancel
+    
+    def done(self) -> bool:
+        """Check whether the full conversion has finished"""
+        return self._future.done()
+    
+    def result(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wait for and return the full conversion result"""
+        return self._future.result(timeout)
+    
+    def add_done_callback(self, fn: Callable[["ProgressiveConversion"], None]) -> None:
+        """Call fn with this handle once the full conversion has finished"""
+        self._future.add_done_callback(lambda _: fn(self))
+    
+    def cancel(self) -> None:
+        """Cancel the pages that have not started yet"""
+        self._cancel()
+    
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+
 class LLMPdf2MarkdownTool:
     """PDF to Markdown conversion tool using LLM with concurrent processing"""
     
+    # Priority added to preview pages of progressive conversions
+    PREVIEW_PRIORITY_BOOST = 100
+    
+    # Prompts for table and figure regions in hybrid layout conversion
+    TABLE_PROMPT = "请将图片中的表格转换为markdown表格，只输出表格，不要包含任何其他内容"
+    FIGURE_PROMPT = "请用markdown简要描述图片中的图表，并转写其中的文字，不要包含任何其他内容"
+    
     def __init__(self, 
                  model_id: str = "qwen-vl-plus",
                  api_key: Optional[str] = None,
@@ -61,7 +138,27 @@ class LLMPdf2MarkdownTool:
                  temperature: float = 0.3,
                  max_workers: int = 10,
                  max_retries: int = 3,
-                 base_storage_path: Optional[str] = None):
+                 base_storage_path: Optional[str] = None,
+                 hedge_percentile: Optional[float] = None,
+                 hedge_max_rate: float = 0.1,
+                 hedge_base_url: Optional[str] = None,
+                 hedge_api_key: Optional[str] = None,
+                 scheduler: Optional[PageScheduler] = None,
+                 escalation_model_id: Optional[str] = None,
+                 quality_checker: Optional[PageQualityChecker] = None,
+                 endpoints: Optional[List[Dict[str, Any]]] = None,
+                 circuit_failure_threshold: int = 5,
+                 circuit_recovery_timeout: float = 30.0,
+                 stream: bool = False,
+                 max_output_tokens: Optional[int] = None,
+                 cassette: Optional[ModelCassette] = None,
+                 preprocessor: Optional[ImagePreprocessor] = None,
+                 memory_governor: Optional[MemoryGovernor] = None,
+                 profile: bool = False,
+                 profile_dir: Optional[str] = None,
+                 page_store: Optional[PageResultStore] = None,
+                 tenant_quotas: Optional[Dict[str, TenantQuota]] = None,
+                 search_index: Optional[MarkdownSearchIndex] = None):
         """
         Initialize the PDF to Markdown tool
         
@@ -73,14 +170,51 @@ class LLMPdf2MarkdownTool:
             max_workers: Maximum number of concurrent workers
             max_retries: Maximum number of retries for failed requests
             base_storage_path: Base path for storing temporary files
+            hedge_percentile: Latency percentile after which a slow page request is
+                duplicated (None disables hedging)
+            hedge_max_rate: Maximum fraction of page requests that may be hedged
+            hedge_base_url: Optional secondary endpoint for hedge requests (required
+                with endpoints; hedge requests never go through the pool)
+            hedge_api_key: API key for the secondary endpoint
+            scheduler: Page scheduler shared with other tools (a private one with
+                max_workers threads is created if not provided)
+            escalation_model_id: Stronger model for cascade mode; pages whose output from
+                model_id fails the quality heuristics are re-run on it (None disables)
+            quality_checker: Heuristics used to decide escalation in cascade mode
+            endpoints: List of backends ({'base_url', 'api_key', 'weight'}) to load balance
+                across; when set, base_url is only used for agents outside the pool
+            circuit_failure_threshold: Consecutive failures before an endpoint is taken out
+            circuit_recovery_timeout: Seconds before a failed endpoint is probed again
+            stream: Consume the model output incrementally (records time to first token)
+            max_output_tokens: Cap on generated tokens per page; streamed generations
+                past the cap are aborted
+            cassette: Record model calls to, or replay them from, a cassette file
+            preprocessor: Crop margins and drop color from rendered pages before upload
+            memory_governor: Byte budget for rendering and in-flight requests (defaults
+                to the process-wide governor)
+            profile: Profile each conversion job (stage timings plus cProfile)
+            profile_dir: Directory for profile artifacts (defaults to <storage>/profiles)
+            page_store: Store of converted pages by content fingerprint; unchanged pages
+                of revised documents are reused instead of rendered and converted
+            tenant_quotas: Weight, page rate and concurrency limit by tenant for
+                jobs submitted with a tenant (applied to a shared scheduler too)
+            search_index: Full-text index that successful pages are written to as
+                they complete
         """
         self.model_id = model_id
         self.base_url = base_url
         self.temperature = temperature
         self.max_workers = max_workers
         self.max_retries = max_retries
+        self.stream = stream
+        self.max_output_tokens = max_output_tokens
+        self.cassette = cassette
+        self.page_store = page_store
+        self.search_index = search_index
         
         # Initialize API key
+        if api_key is None and endpoints:
+            api_key = endpoints[0].get('api_key')
         if api_key is None:
             api_key = os.getenv("DASHSCOPE_API_KEY")
         if not api_key:
@@ -89,38 +223,314 @@ class LLMPdf2MarkdownTool:
         self.api_key = api_key
         
         # Initialize PDF to image tool
-        self.pdf2image_tool = pdf2imageTool(base_storage_path=base_storage_path)
+        self.memory_governor = memory_governor or get_memory_governor()
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.pdf2image_tool = pdf2imageTool(base_storage_path=base_storage_path, preprocessor=preprocessor,
+                                            memory_governor=self.memory_governor)
+        if self.profile_dir is None:
+            self.profile_dir = os.path.join(self.pdf2image_tool.base_path, 'profiles')
         
         # Initialize LLM agent
         self.agent = self._create_agent()
         
+        # Initialize the page scheduler shared by all jobs of this tool; previews
+        # overtake other tenants' queued pages
+        self.scheduler = scheduler or PageScheduler(max_workers=max_workers,
+                                                    urgent_priority=self.PREVIEW_PRIORITY_BOOST)
+        for tenant, quota in (tenant_quotas or {}).items():
+            self.scheduler.set_tenant_quota(tenant, quota)
+        
+        # Initialize request hedging for slow pages
+        self.hedger = None
+        self.hedge_agent = None
+        if hedge_percentile is not None:
+            if endpoints and hedge_base_url is None:
+                raise ValueError("hedge_base_url is required to hedge requests across an endpoint pool")
+            self.hedger = RequestHedger(
+                percentile=hedge_percentile,
+                max_hedge_rate=hedge_max_rate,
+                max_workers=max_workers * 2
+            )
+            self.hedge_base_url = hedge_base_url or self.base_url
+            self.hedge_api_key = hedge_api_key or self.api_key
+            self.hedge_agent = self._create_agent(base_url=self.hedge_base_url, api_key=self.hedge_api_key)
+        
+        # Initialize model cascade: cheap model first, escalate low-confidence pages
+        self.escalation_model_id = escalation_model_id
+        self.escalation_agent = None
+        self.quality_checker = None
+        if escalation_model_id is not None:
+            self.escalation_agent = self._create_agent(model_id=escalation_model_id)
+            self.quality_checker = quality_checker or PageQualityChecker()
+        
+        # Initialize multi-endpoint load balancing
+        self.endpoint_pool = None
+        self._endpoint_agents: Dict[tuple, Agent] = {}
+        self._endpoint_agents_lock = threading.Lock()
+        if endpoints:
+            self.endpoint_pool = EndpointPool(
+                endpoints,
+                default_api_key=self.api_key,
+                failure_threshold=circuit_failure_threshold,
+                recovery_timeout=circuit_recovery_timeout
+            )
+        
         # Default prompt for image to markdown conversion
         self.default_prompt = "请将图片中的内容以markdown格式输出，不要包含任何其他内容"
     
-    def _create_agent(self) -> Agent:
-        """Create and return an LLM agent"""
+    def _create_agent(self,
+                      base_url: Optional[str] = None,
+                      api_key: Optional[str] = None,
+                      model_id: Optional[str] = None) -> Agent:
+        """Create and return an LLM agent, optionally for a different endpoint or model"""
         model_provider = OpenAILike(
-            id=self.model_id,
-            base_url=self.base_url,
-            api_key=self.api_key,
+            id=model_id or self.model_id,
+            base_url=base_url or self.base_url,
+            api_key=api_key or self.api_key,
             temperature=self.temperature,
+            max_tokens=self.max_output_tokens,
         )
         return Agent(model=model_provider, markdown=True)
     
+    def _run_agent(self,
+                   prompt: str,
+                   image_obj: Image,
+                   model_id: Optional[str] = None,
+                   on_partial: Optional[Callable[[str, str], None]] = None):
+        """Run the LLM on a single image, hedging the request if it is slow"""
+        if self.hedger is None:
+            return self._call_model(prompt, image_obj, model_id, on_partial=on_partial)
+        primary = lambda: self._call_model(prompt, image_obj, model_id, on_partial=on_partial)
+        backup = lambda: self._call_model(prompt, image_obj, model_id, hedge=True)
+        # Hedged calls run on the hedger's threads; keep them cancellable and profiled
+        token = CancellationToken.current()
+        if token is not None:
+            primary, backup = token.wrap(primary), token.wrap(backup)
+        profiler = JobProfiler.current()
+        if profiler is not None:
+            primary, backup = profiler.bind(primary), profiler.bind(backup)
+        return self.hedger.call(primary, backup)
+    
+    def _call_model(self,
+                    prompt: str,
+                    image_obj: Image,
+                    model_id: Optional[str] = None,
+                    hedge: bool = False,
+                    on_partial: Optional[Callable[[str, str], None]] = None):
+        """Make one model call on the configured endpoint(s); hedge calls go to the hedge endpoint"""
+        escalated = model_id is not None and model_id != self.model_id
+        if hedge:
+            if escalated:
+                agent = self._get_endpoint_agent(self.hedge_base_url, self.hedge_api_key, model_id)
+            else:
+                agent = self.hedge_agent
+        elif self.endpoint_pool is not None:
+            return self._call_endpoint_pool(prompt, image_obj, model_id or self.model_id, on_partial)
+        elif escalated:
+            agent = self.escalation_agent
+        else:
+            agent = self.agent
+        return self._invoke_agent(agent, prompt, image_obj, on_partial)
+    
+    def _invoke_agent(self,
+                      agent: Agent,
+                      prompt: str,
+                      image_obj: Image,
+                      on_partial: Optional[Callable[[str, str], None]] = None):
+        """Run an agent within the memory budget, streaming its output when streaming is enabled"""
+        request_bytes = self._request_bytes(image_obj)
+        cancel_token = CancellationToken.current()
+        with profile_stage('memory_wait'):
+            # Without a timeout, a refused reservation means the job was cancelled
+            if not self.memory_governor.acquire(request_bytes, cancel_token=cancel_token):
+                raise ConversionCancelled(cancel_token.reason)
+        try:
+            with profile_stage('model_call'):
+                return self._invoke_agent_unbudgeted(agent, prompt, image_obj, on_partial)
+        finally:
+            self.memory_governor.release(request_bytes)
+    
+    def _request_bytes(self, image_obj: Image) -> int:
+        """Estimate the memory a request for this image holds while in flight"""
+        content = getattr(image_obj, 'content', None)
+        filepath = getattr(image_obj, 'filepath', None)
+        if isinstance(content, (bytes, bytearray)):
+            image_bytes = len(content)
+        elif isinstance(filepath, (str, os.PathLike)) and os.path.exists(filepath):
+            image_bytes = os.path.getsize(filepath)
+        else:
+            image_bytes = 0
+        return estimate_request_bytes(image_bytes, self.max_output_tokens)
+    
+    def _invoke_agent_unbudgeted(self,
+                                 agent: Agent,
+                                 prompt: str,
+                                 image_obj: Image,
+                                 on_partial: Optional[Callable[[str, str], None]] = None):
+        """Run an agent, streaming its output when streaming is enabled"""
+        if self.cassette is not None:
+            return self._invoke_cassette(agent, prompt, image_obj, on_partial)
+        if not self.stream and on_partial is None:
+            return agent.run(prompt, images=[image_obj])
+        events = agent.run(prompt, images=[image_obj], stream=True)
+        return self._consume_stream(events, on_partial)
+    
+    def _invoke_cassette(self,
+                         agent: Agent,
+                         prompt: str,
+                         image_obj: Image,
+                         on_partial: Optional[Callable[[str, str], None]] = None):
+        """Record a live agent call to the cassette, or replay it from the cassette"""
+        model_id = agent.model.id
+        fingerprint = request_fingerprint(model_id, prompt, image_obj)
+        streaming = self.stream or on_partial is not None
+        if self.cassette.mode == ModelCassette.REPLAY:
+            if streaming:
+                return self._consume_stream(self.cassette.play_stream(fingerprint), on_partial)
+            return self.cassette.play(fingerprint)
+        
+        start = time.time()
+        try:
+            if streaming:
+                run = self._consume_stream(agent.run(prompt, images=[image_obj], stream=True), on_partial)
+            else:
+                run = agent.run(prompt, images=[image_obj])
+        except ConversionCancelled:
+            raise
+        except Exception as e:
+            self.cassette.record(fingerprint, model_id, None, time.time() - start, error=str(e),
+                                 error_type=type(e).__name__)
+            raise
+        self.cassette.record(fingerprint, model_id, run.content, time.time() - start,
+                             ttft=run.ttft_seconds if isinstance(run, StreamedRun) else None)
+        return run
+    
+    def _consume_stream(self,
+                        events: Iterator[Any],
+                        on_partial: Optional[Callable[[str, str], None]] = None) -> StreamedRun:
+        """
+        Collect streamed content, forwarding partial output and enforcing the token cap
+        
+        Args:
+            events: Run events yielded by a streaming agent run
+            on_partial: Callback receiving (delta, accumulated_content)
+            
+        Returns:
+            StreamedRun with the accumulated content and timings
+            
+        Raises:
+            ConversionCancelled: If the job is cancelled while the page is streamed
+        """
+        cancel_token = CancellationToken.current()
+        start = time.time()
+        ttft = None
+        chunks = []
+        output_tokens = 0
+        truncated = False
+        try:
+            for event in events:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                if getattr(event, 'event', None) != RunEvent.run_response_content.value:
+                    continue
+                delta = event.content
+                if not isinstance(delta, str) or not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.time() - start
+                chunks.append(delta)
+                output_tokens += estimate_tokens(delta)
+                if on_partial is not None:
+                    on_partial(delta, "".join(chunks))
+                if self.max_output_tokens is not None and output_tokens >= self.max_output_tokens:
+                    logger.warning(f"Aborting generation after {output_tokens} tokens (cap {self.max_output_tokens})")
+                    truncated = True
+                    break
+        finally:
+            # Closing the generator stops reading the response stream
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
+        return StreamedRun("".join(chunks), ttft, output_tokens, truncated)
+    
+    def _call_endpoint_pool(self,
+                            prompt: str,
+                            image_obj: Image,
+                            model_id: str,
+                            on_partial: Optional[Callable[[str, str], None]] = None):
+        """Call the model on pooled endpoints, failing over to another endpoint on errors"""
+        last_error = None
+        for attempt in range(self.max_retries):
+            endpoint = self.endpoint_pool.acquire()
+            agent = self._get_endpoint_agent(endpoint.base_url, endpoint.api_key, model_id)
+            start = time.time()
+            try:
+                run = self._invoke_agent(agent, prompt, image_obj, on_partial)
+            except ConversionCancelled:
+                # Not the endpoint's fault, and there is no point failing over;
+                # hand back a recovery probe so the endpoint is probed again
+                self.endpoint_pool.release(endpoint)
+                raise
+            except Exception as e:
+                last_error = e
+                self.endpoint_pool.record_failure(endpoint)
+                logger.warning(f"Attempt {attempt + 1} on {endpoint.base_url} failed: {e}")
+                continue
+            self.endpoint_pool.record_success(endpoint, time.time() - start)
+            return run
+        raise last_error
+    
+    def _get_endpoint_agent(self, base_url: str, api_key: str, model_id: str) -> Agent:
+        """Get (or create) the agent for an endpoint and model"""
+        key = (base_url, api_key, model_id)
+        with self._endpoint_agents_lock:
+            if key not in self._endpoint_agents:
+                self._endpoint_agents[key] = self._create_agent(
+                    base_url=base_url, api_key=api_key, model_id=model_id
+                )
+            return self._endpoint_agents[key]
+    
+    def get_endpoint_health(self) -> Optional[List[Dict[str, Any]]]:
+        """Get per-endpoint health statistics (None if no endpoint pool is configured)"""
+        return self.endpoint_pool.get_health_stats() if self.endpoint_pool else None
+    
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """Get reserved bytes of the memory governor"""
+        return self.memory_governor.get_usage()
+    
+    def get_tenant_usage(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Get page usage counters by tenant (or of one tenant) from the scheduler"""
+        return self.scheduler.get_tenant_usage(tenant)
+    
+    def get_hedge_stats(self) -> Optional[Dict[str, Any]]:
+        """Get hedge request metrics (None if hedging is disabled)"""
+        return self.hedger.get_stats() if self.hedger else None
+    
     @retry_on_failure(max_retries=3, delay=1.0)
-    def _process_single_image(self, image_path: str, prompt: str = None) -> Dict[str, Any]:
+    def _process_single_image(self,
+                              image_path: str,
+                              prompt: str = None,
+                              on_partial: Optional[Callable[[int, str, str], None]] = None) -> PageResult:
         """
         Process a single image to markdown with retry mechanism
         
         Args:
             image_path: Path to the image file
             prompt: Custom prompt for conversion
+            on_partial: Callback receiving (page_num, delta, accumulated_content) as the
+                page is streamed
             
         Returns:
-            Dictionary containing page number and markdown content
+            PageResult containing page number and markdown content
         """
         if prompt is None:
             prompt = self.default_prompt
+        
+        # Skip pages whose job was cancelled while they were queued
+        cancel_token = CancellationToken.current()
+        if cancel_token is not None and cancel_token.cancelled:
+            return self._cancelled_result(image_path, cancel_token.reason)
             
         try:
             # Create Image object from image path using filepath parameter
@@ -130,34 +540,70 @@ class LLMPdf2MarkdownTool:
             page_num = int(Path(image_path).stem.split('_')[1])
             
             # Process with LLM using images parameter
-            run = self.agent.run(prompt, images=[image_obj])
+            page_partial = None
+            if on_partial is not None:
+                page_partial = lambda delta, text: on_partial(page_num, delta, text)
+            run = self._run_agent(prompt, image_obj, on_partial=page_partial)
+            content = run.content
+            model_id = self.model_id
             
-            if run.content:
-                return {
-                    'page_num': page_num,
-                    'content': run.content,
-                    'status': 'success',
-                    'image_path': image_path
-                }
+            # Cascade mode: re-run low-confidence pages on the stronger model
+            escalated = False
+            quality_issues = []
+            if self.escalation_agent is not None:
+                quality_issues = self.quality_checker.check(content, image_path)
+                if quality_issues:
+                    logger.info(f"Escalating page {page_num} to {self.escalation_model_id}: {quality_issues}")
+                    escalated_run = self._run_agent(prompt, image_obj, model_id=self.escalation_model_id)
+                    escalated = True
+                    if escalated_run.content:
+                        content = escalated_run.content
+                        model_id = self.escalation_model_id
+            
+            if content:
+                result = PageResult(
+                    page_num=page_num,
+                    content=content,
+                    status='success',
+                    image_path=image_path
+                )
+                if isinstance(run, StreamedRun):
+                    result.ttft_seconds = run.ttft_seconds
+                    result.output_tokens = run.output_tokens
+                    result.truncated = run.truncated
+                if self.escalation_agent is not None:
+                    result.model_id = model_id
+                    result.escalated = escalated
+                    result.quality_issues = quality_issues
+                return result
             else:
                 raise ValueError("LLM response is empty")
-                
+        
+        except ConversionCancelled as e:
+            return self._cancelled_result(image_path, str(e))
         except Exception as e:
             logger.error(f"Error processing image {image_path}: {e}")
-            return {
-                'page_num': int(Path(image_path).stem.split('_')[1]) if '_' in Path(image_path).stem else 0,
-                'content': f"Error processing page: {str(e)}",
-                'status': 'error',
-                'image_path': image_path,
-                'error': str(e)
-            }
+            return PageResult(
+                page_num=self._page_num_from_path(image_path),
+                content=f"Error processing page: {str(e)}",
+                status='error',
+                image_path=image_path,
+                error=str(e)
+            )
     
     def convert_pdf_to_markdown(self, 
                                pdf_path: str, 
                                start_page: int = 1, 
                                end_page: Optional[int] = None,
                                prompt: str = None,
-                               sort_by_page: bool = True) -> Dict[str, Any]:
+                               sort_by_page: bool = True,
+                               priority: int = 0,
+                               deadline: Optional[float] = None,
+                               on_partial: Optional[Callable[[int, str, str], None]] = None,
+                               cancel_token: Optional[CancellationToken] = None,
+                               timeout: Optional[float] = None,
+                               tenant: Optional[str] = None,
+                               doc_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Convert PDF to markdown using concurrent processing
         
@@ -167,84 +613,558 @@ class LLMPdf2MarkdownTool:
             end_page: Ending page number (1-based, None for all pages)
             prompt: Custom prompt for LLM conversion
             sort_by_page: Whether to sort results by page number
+            priority: Job priority, higher values are scheduled first
+            deadline: Absolute time (time.time()) by which the job must finish;
+                pages that cannot finish in time are cancelled
+            on_partial: Callback receiving (page_num, delta, accumulated_content) while
+                pages are streamed; called from worker threads
+            cancel_token: Token the caller can cancel to stop the job
+            timeout: Seconds after which the job is cancelled
+            tenant: Tenant the pages are accounted to and fair-shared by
+            doc_id: Document ID in the search index (defaults to pdf_path)
+            
+            Cancelling (or timing out) stops rendering, drops queued pages and
+            abandons pages in flight; the result lists them in 'unprocessed_pages'.
             
         Returns:
             Dictionary containing conversion results and metadata
         """
         start_time = time.time()
+        doc_id = doc_id or pdf_path
+        index_page = self._index_sink(doc_id)
         
-        try:
-            # Step 1: Convert PDF to images
-            logger.info(f"Converting PDF to images: {pdf_path}")
-            image_paths = self.pdf2image_tool.convert_pdf_to_images(
-                pdf_path, start_page, end_page
-            )
+        with self._start_profiler() as profiler, self._job_token(cancel_token, timeout) as token:
+            try:
+                # Step 0: Reuse stored results of pages unchanged since a previous version
+                reused, fingerprints, pages = [], {}, None
+                if self.page_store is not None:
+                    with profile_stage('fingerprint'):
+                        reused, fingerprints = self._lookup_stored_pages(pdf_path, start_page, end_page, prompt)
+                    pages = set(fingerprints)
+                    logger.info(f"Reusing {len(reused)} unchanged pages, converting {len(pages)}")
+                
+                # Step 1: Convert PDF to images
+                logger.info(f"Converting PDF to images: {pdf_path}")
+                with profile_stage('render'):
+                    image_paths = self.pdf2image_tool.convert_pdf_to_images(
+                        pdf_path, start_page, end_page, cancel_token=token, pages=pages
+                    )
+                
+                if not image_paths and not reused and not token.cancelled:
+                    raise ValueError("No images generated from PDF")
+                
+                logger.info(f"Generated {len(image_paths)} images from PDF")
+                
+                # Step 2: Process images concurrently with LLM
+                logger.info(f"Processing {len(image_paths)} images with {self.max_workers} workers")
+                results = self._process_images(image_paths, prompt, priority, deadline, on_partial,
+                                               cancel_token=token, tenant=tenant, on_page=index_page)
+                if self.page_store is not None:
+                    self._store_page_results(results, fingerprints, prompt)
+                    results.extend(reused)
+                    if index_page is not None:
+                        for result in reused:
+                            index_page(result)
+                if token.cancelled:
+                    page_count = self.pdf2image_tool.get_page_count(pdf_path)
+                    self._add_unprocessed_pages(results, start_page, end_page, page_count, token.reason)
+                
+                # Step 3: Sort results by page number if requested
+                if sort_by_page:
+                    results.sort(key=lambda x: x['page_num'])
+                
+                # Step 4: Combined markdown is built lazily from the page results
+                # Calculate processing time
+                processing_time = time.time() - start_time
+                
+                return self._build_conversion_result({
+                    'success': True,
+                    'pdf_path': pdf_path,
+                    'total_pages': max(len(image_paths), len(results)),
+                    'processed_pages': len(results),
+                    'processing_time_seconds': processing_time,
+                    'results': results,
+                    **({'reused_pages': len(reused)} if self.page_store is not None else {}),
+                    **self._index_info(doc_id),
+                    **self._summarize_results(results),
+                    **self._cancellation_info(token),
+                    **self._tenant_info(tenant),
+                    **self._finish_profiler(profiler)
+                })
+                
+            except Exception as e:
+                logger.error(f"Error in PDF to markdown conversion: {e}")
+                return {
+                    'success': False,
+                    'pdf_path': pdf_path,
+                    'error': str(e),
+                    'processing_time_seconds': time.time() - start_time
+                }
+    
+    def _page_conversion_key(self, prompt: Optional[str]) -> str:
+        """Key of the settings a stored page result depends on"""
+        return conversion_key(self.model_id, self.escalation_model_id, prompt or self.default_prompt,
+                              self.max_output_tokens, self.pdf2image_tool.render_settings_key())
+    
+    def _lookup_stored_pages(self,
+                             pdf_path: str,
+                             start_page: int,
+                             end_page: Optional[int],
+                             prompt: Optional[str]):
+        """
+        Fingerprint the pages of a PDF and look them up in the page store
+        
+        Returns:
+            Tuple of (reused page results, {page_num: fingerprint} of pages to convert)
+        """
+        key = self._page_conversion_key(prompt)
+        reused = []
+        changed = {}
+        for page_num, fingerprint in self.pdf2image_tool.get_page_fingerprints(pdf_path, start_page, end_page).items():
+            stored = self.page_store.get(key, fingerprint, page_num)
+            if stored is None:
+                changed[page_num] = fingerprint
+            else:
+                reused.append(stored)
+        return reused, changed
+    
+    def _store_page_results(self,
+                            results: List[PageResult],
+                            fingerprints: Dict[int, str],
+                            prompt: Optional[str]) -> None:
+        """Store converted pages by fingerprint for later versions of the document"""
+        key = self._page_conversion_key(prompt)
+        for result in results:
+            fingerprint = fingerprints.get(result['page_num'])
+            if fingerprint is not None:
+                self.page_store.put(key, fingerprint, result)
+    
+    def convert_pdf_progressively(self,
+                                  pdf_path: str,
+                                  preview_pages: int = 3,
+                                  start_page: int = 1,
+                                  end_page: Optional[int] = None,
+                                  prompt: str = None,
+                                  priority: int = 0,
+                                  deadline: Optional[float] = None,
+                                  on_partial: Optional[Callable[[int, str, str], None]] = None,
+                                  cancel_token: Optional[CancellationToken] = None,
+                                  timeout: Optional[float] = None,
+                                  tenant: Optional[str] = None,
+                                  doc_id: Optional[str] = None) -> ProgressiveConversion:
+        """
+        Convert the first pages of a PDF first and the rest in the background
+        
+        The first preview_pages pages are rendered and converted at boosted
+        priority, and the call returns as soon as they are done. Rendering
+        and conversion of the remaining pages overlap with the preview and
+        continue after the call returns.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            preview_pages: Number of leading pages in the preview
+            start_page: Starting page number (1-based)
+            end_page: Ending page number (1-based, None for all pages)
+            prompt: Custom prompt for LLM conversion
+            priority: Priority of the remaining pages (preview pages get
+                PREVIEW_PRIORITY_BOOST on top)
+            deadline: Absolute time (time.time()) by which the job must finish
+            on_partial: Callback receiving (page_num, delta, accumulated_content) while
+                pages are streamed
+            cancel_token: Token the caller can cancel to stop the job
+            timeout: Seconds after which the job (preview and remainder) is cancelled
+            tenant: Tenant the pages are accounted to and fair-shared by
+            doc_id: Document ID in the search index (defaults to pdf_path)
             
-            if not image_paths:
-                raise ValueError("No images generated from PDF")
+            Cancelling (the token, the timeout or the handle's cancel()) stops
+            rendering, drops queued pages and abandons pages in flight, during
+            the preview as well as afterwards.
             
-            logger.info(f"Generated {len(image_paths)} images from PDF")
+        Returns:
+            Handle with the preview result and the pending full result
+        """
+        with self._start_profiler() as profiler:
+            start_time = time.time()
+            final_future: Future = Future()
+            preview_future: Future = Future()
+            # The job outlives this call, so its token is disposed by the remainder
+            token = CancellationToken.linked(cancel_token)
+            if timeout is not None:
+                token.cancel_after(timeout, reason="timeout exceeded")
+            remainder_job_id = uuid.uuid4().hex
+            doc_id = doc_id or pdf_path
+            index_page = self._index_sink(doc_id)
             
-            # Step 2: Process images concurrently with LLM
-            logger.info(f"Processing {len(image_paths)} images with {self.max_workers} workers")
+            def cancel() -> None:
+                token.cancel("cancelled by caller")
             
-            results = []
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit all tasks
-                future_to_image = {
-                    executor.submit(self._process_single_image, image_path, prompt): image_path
-                    for image_path in image_paths
-                }
+            try:
+                page_count = self.pdf2image_tool.get_page_count(pdf_path)
+                if page_count == 0:
+                    raise ValueError("No images generated from PDF")
+                if end_page is None or end_page < 1 or end_page > page_count:
+                    end_page = page_count
+                start_page = max(1, min(start_page or 1, end_page))
+                preview_end = min(end_page, start_page + max(1, preview_pages) - 1)
                 
-                # Collect results as they complete
-                for future in as_completed(future_to_image):
-                    image_path = future_to_image[future]
-                    try:
-                        result = future.result()
-                        results.append(result)
-                        logger.info(f"Completed processing: {image_path}")
-                    except Exception as e:
-                        logger.error(f"Error processing {image_path}: {e}")
-                        results.append({
-                            'page_num': int(Path(image_path).stem.split('_')[1]) if '_' in Path(image_path).stem else 0,
-                            'content': f"Error: {str(e)}",
-                            'status': 'error',
-                            'image_path': image_path,
-                            'error': str(e)
-                        })
+                # Step 1: Render and queue the preview pages ahead of everything else
+                with profile_stage('render'):
+                    preview_images = self.pdf2image_tool.convert_pdf_to_images(
+                        pdf_path, start_page, preview_end, cancel_token=token
+                    )
+                if not preview_images and not token.cancelled:
+                    raise ValueError("No images generated from PDF")
+                preview_job_id = uuid.uuid4().hex
+                preview_submitted = self._submit_images(
+                    preview_images, prompt, priority + self.PREVIEW_PRIORITY_BOOST, deadline, on_partial,
+                    preview_job_id, cancel_token=token, tenant=tenant
+                )
+            except Exception as e:
+                logger.error(f"Error in progressive PDF to markdown conversion: {e}")
+                failed = {
+                    'success': False,
+                    'pdf_path': pdf_path,
+                    'error': str(e),
+                    'processing_time_seconds': time.time() - start_time
+                }
+                final_future.set_result(failed)
+                token.dispose()
+                return ProgressiveConversion(failed, final_future, cancel)
             
-            # Step 3: Sort results by page number if requested
-            if sort_by_page:
-                results.sort(key=lambda x: x['page_num'])
+            # Step 2: Render and convert the remainder in the background
+            def convert_remainder() -> None:
+                try:
+                    remainder_results = []
+                    if preview_end < end_page and not token.cancelled:
+                        with profile_stage('render'):
+                            remainder_images = self.pdf2image_tool.convert_pdf_to_images(
+                                pdf_path, preview_end + 1, end_page, cancel_token=token
+                            )
+                        if not token.cancelled:
+                            submitted = self._submit_images(
+                                remainder_images, prompt, priority, deadline, on_partial, remainder_job_id,
+                                cancel_token=token, tenant=tenant
+                            )
+                            # Pages queued after a cancellation are dropped as soon as the wait starts
+                            remainder_results = self._wait_for_images(submitted, remainder_job_id, deadline,
+                                                                      token, on_page=index_page)
+                    
+                    results = preview_future.result() + remainder_results
+                    self._add_unprocessed_pages(results, start_page, end_page, end_page,
+                                                token.reason or "cancelled by caller")
+                    results.sort(key=lambda x: x['page_num'])
+                    final_future.set_result(self._build_conversion_result({
+                        'success': True,
+                        'pdf_path': pdf_path,
+                        'total_pages': end_page - start_page + 1,
+                        'processed_pages': len(results),
+                        'processing_time_seconds': time.time() - start_time,
+                        'results': results,
+                        **self._summarize_results(results),
+                        **self._cancellation_info(token),
+                        **self._tenant_info(tenant),
+                        **self._index_info(doc_id),
+                        **self._finish_profiler(profiler)
+                    }))
+                except Exception as e:
+                    logger.error(f"Error converting remaining pages of {pdf_path}: {e}")
+                    final_future.set_result({
+                        'success': False,
+                        'pdf_path': pdf_path,
+                        'error': str(e),
+                        'processing_time_seconds': time.time() - start_time
+                    })
+                finally:
+                    self.scheduler.forget_job(remainder_job_id)
+                    token.dispose()
             
-            # Step 4: Combine all markdown content
-            combined_markdown = self._combine_markdown_results(results)
+            # The remainder outlives this call; it carries the profiler and writes the profile
+            if profiler is not None:
+                convert_remainder = profiler.bind(convert_remainder)
+            threading.Thread(target=convert_remainder, name="progressive-remainder", daemon=True).start()
             
-            # Calculate processing time
-            processing_time = time.time() - start_time
+            # Step 3: Wait for the preview pages only
+            preview_results = self._wait_for_images(preview_submitted, preview_job_id, deadline, token,
+                                                    on_page=index_page)
+            preview_results.sort(key=lambda x: x['page_num'])
+            preview_future.set_result(preview_results)
             
-            return {
+            preview = self._build_conversion_result({
                 'success': True,
                 'pdf_path': pdf_path,
-                'total_pages': len(image_paths),
-                'processed_pages': len(results),
-                'processing_time_seconds': processing_time,
-                'results': results,
-                'combined_markdown': combined_markdown,
-                'successful_pages': len([r for r in results if r['status'] == 'success']),
-                'failed_pages': len([r for r in results if r['status'] == 'error'])
-            }
+                'preview': True,
+                'total_pages': end_page - start_page + 1,
+                'processed_pages': len(preview_results),
+                'processing_time_seconds': time.time() - start_time,
+                'results': preview_results,
+                **self._summarize_results(preview_results),
+                **self._cancellation_info(token),
+                **self._tenant_info(tenant),
+                **self._index_info(doc_id)
+            })
+            return ProgressiveConversion(preview, final_future, cancel)
+    
+    def _process_images(self,
+                        image_paths: List[str],
+                        prompt: str = None,
+                        priority: int = 0,
+                        deadline: Optional[float] = None,
+                        on_partial: Optional[Callable[[int, str, str], None]] = None,
+                        job_id: Optional[str] = None,
+                        cancel_token: Optional[CancellationToken] = None,
+                        tenant: Optional[str] = None,
+                        on_page: Optional[Callable[[PageResult], None]] = None) -> List[PageResult]:
+        """
+        Process page images through the shared page scheduler
+        
+        Args:
+            image_paths: Paths of the page images
+            prompt: Custom prompt for LLM conversion
+            priority: Job priority, higher values are scheduled first
+            deadline: Absolute time by which the job must finish
+            on_partial: Callback receiving streamed partial page output
+            job_id: Scheduler job ID (generated if not given)
+            cancel_token: Token that cancels the job
+            tenant: Tenant the pages are accounted to
+            on_page: Callback receiving each page result as it completes
             
+        Returns:
+            List of page results in completion order
+        """
+        job_id = job_id or uuid.uuid4().hex
+        future_to_image = self._submit_images(image_paths, prompt, priority, deadline, on_partial, job_id,
+                                              cancel_token, tenant)
+        return self._wait_for_images(future_to_image, job_id, deadline, cancel_token, on_page)
+    
+    def _submit_images(self,
+                       image_paths: List[str],
+                       prompt: Optional[str],
+                       priority: int,
+                       deadline: Optional[float],
+                       on_partial: Optional[Callable[[int, str, str], None]],
+                       job_id: str,
+                       cancel_token: Optional[CancellationToken] = None,
+                       tenant: Optional[str] = None) -> Dict[Future, str]:
+        """Submit page images to the scheduler as one job"""
+        process = self._job_task('page', self._process_single_image, cancel_token)
+        return {
+            self.scheduler.submit(
+                process, image_path, prompt, on_partial,
+                job_id=job_id, priority=priority, deadline=deadline, tenant=tenant
+            ): image_path
+            for image_path in image_paths
+        }
+    
+    @staticmethod
+    def _job_task(stage: str,
+                  fn: Callable[..., Any],
+                  cancel_token: Optional[CancellationToken] = None) -> Callable[..., Any]:
+        """Wrap a page task for the job's cancellation token and the active job profiler, if any"""
+        if cancel_token is not None:
+            fn = cancel_token.wrap(fn)
+        profiler = JobProfiler.current()
+        return fn if profiler is None else profiler.wrap(stage, fn)
+    
+    @contextmanager
+    def _job_token(self, cancel_token: Optional[CancellationToken], timeout: Optional[float]):
+        """Create the token of one job, cancelled with the caller's token or after the timeout"""
+        token = CancellationToken.linked(cancel_token)
+        if timeout is not None:
+            token.cancel_after(timeout, reason="timeout exceeded")
+        try:
+            yield token
+        finally:
+            token.dispose()
+    
+    @staticmethod
+    def _cancellation_info(token: CancellationToken) -> Dict[str, Any]:
+        """Describe a cancelled job for the result"""
+        return {'cancelled': True, 'cancel_reason': token.reason} if token.cancelled else {}
+    
+    def _index_sink(self, doc_id: str) -> Optional[Callable[[PageResult], None]]:
+        """Callback writing completed pages of a document to the search index, if any"""
+        if self.search_index is None:
+            return None
+        
+        def index_page(result: PageResult) -> None:
+            try:
+                self.search_index.add_page(doc_id, result)
+            except Exception as e:
+                # The index is secondary output; never fail the conversion over it
+                logger.warning(f"Failed to index page {result['page_num']} of {doc_id}: {e}")
+        
+        return index_page
+    
+    def _index_info(self, doc_id: str) -> Dict[str, Any]:
+        """Document ID of a job, when pages are written to the search index"""
+        return {'doc_id': doc_id} if self.search_index is not None else {}
+    
+    def _tenant_info(self, tenant: Optional[str]) -> Dict[str, Any]:
+        """Tenant of a job and its usage so far, for jobs submitted with a tenant"""
+        if tenant is None:
+            return {}
+        return {'tenant': tenant, 'tenant_usage': self.get_tenant_usage(tenant)}
+    
+    @staticmethod
+    def _finish_profiler(profiler: Optional[JobProfiler]) -> Dict[str, Any]:
+        """Write the job's profile artifacts and describe them for the result"""
+        return {'profile': profiler.finish()} if profiler is not None else {}
+    
+    def _start_profiler(self):
+        """Create the job profiler when profiling is enabled (a no-op context otherwise)"""
+        if not self.profile:
+            return nullcontext()
+        job_id = f"job_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        return JobProfiler(self.profile_dir, job_id).activate()
+    
+    def _wait_for_images(self,
+                         future_to_image: Dict[Future, str],
+                         job_id: str,
+                         deadline: Optional[float] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         on_page: Optional[Callable[[PageResult], None]] = None) -> List[PageResult]:
+        """
+        Collect the results of a submitted job
+        
+        When the deadline passes, queued pages are cancelled and pages in
+        flight are still awaited. When the cancellation token fires, queued
+        pages are cancelled and pages in flight are abandoned. on_page, if
+        given, receives each result as soon as it is collected.
+        """
+        results = []
+        pending = set(future_to_image)
+        stop: Future = Future()
+        unregister = cancel_token.add_callback(stop.set_result) if cancel_token is not None else None
+        deadline_passed = False
+        try:
+            while pending:
+                timeout = None if deadline is None or deadline_passed else max(0.0, deadline - time.time())
+                done, _ = wait(pending | {stop}, timeout=timeout, return_when=FIRST_COMPLETED)
+                if stop.done():
+                    abandoned = self._abandon_pages(pending, future_to_image, job_id, stop.result())
+                    results.extend(abandoned)
+                    if on_page is not None:
+                        for result in abandoned:
+                            on_page(result)
+                    break
+                if not done:
+                    # Deadline passed: drop queued pages, keep whatever is already in flight
+                    self.scheduler.cancel_job(job_id, reason="deadline exceeded")
+                    deadline_passed = True
+                    continue
+                for future in done:
+                    pending.discard(future)
+                    result = self._collect_result(future, future_to_image[future], job_id)
+                    results.append(result)
+                    if on_page is not None:
+                        on_page(result)
+        finally:
+            if unregister is not None:
+                unregister()
+            self.scheduler.forget_job(job_id)
+        
+        return results
+    
+    def _abandon_pages(self,
+                       pending: set,
+                       future_to_image: Dict[Future, str],
+                       job_id: str,
+                       reason: str) -> List[PageResult]:
+        """Cancel the queued pages of a job and stop waiting for the ones in flight"""
+        self.scheduler.cancel_job(job_id, reason=reason)
+        results = []
+        for future in pending:
+            if future.done():
+                results.append(self._collect_result(future, future_to_image[future], job_id))
+            else:
+                # Still running: the worker finishes (or notices the token) on its own
+                results.append(self._cancelled_result(future_to_image[future], reason))
+        return results
+    
+    def _collect_result(self, future: Future, image_path: str, job_id: str) -> PageResult:
+        """Turn a finished page future into a page result"""
+        if future.cancelled():
+            return self._cancelled_result(image_path, self.scheduler.get_cancel_reason(job_id) or "cancelled")
+        try:
+            result = future.result()
+            logger.info(f"Completed processing: {image_path}")
+            if isinstance(result, dict):
+                result = PageResult.from_dict(result)
+            return result
         except Exception as e:
-            logger.error(f"Error in PDF to markdown conversion: {e}")
-            return {
-                'success': False,
-                'pdf_path': pdf_path,
-                'error': str(e),
-                'processing_time_seconds': time.time() - start_time
-            }
+            logger.error(f"Error processing {image_path}: {e}")
+            return PageResult(
+                page_num=self._page_num_from_path(image_path),
+                content=f"Error: {str(e)}",
+                status='error',
+                image_path=image_path,
+                error=str(e)
+            )
     
-    def _combine_markdown_results(self, results: List[Dict[str, Any]]) -> str:
+    def _cancelled_result(self, image_path: str, reason: str) -> PageResult:
+        """Result for a page that was not processed"""
+        return PageResult(
+            page_num=self._page_num_from_path(image_path),
+            content=f"Page not processed: {reason}",
+            status='cancelled',
+            image_path=image_path,
+            error=reason
+        )
+    
+    @staticmethod
+    def _add_unprocessed_pages(results: List[PageResult],
+                               start_page: int,
+                               end_page: Optional[int],
+                               page_count: int,
+                               reason: str) -> None:
+        """Add cancelled results for pages of the requested range that have no result (never rendered)"""
+        if end_page is None or end_page < 1 or end_page > page_count:
+            end_page = page_count
+        converted = {r['page_num'] for r in results}
+        results.extend(
+            PageResult(page_num=page_num, content=f"Page not processed: {reason}",
+                       status='cancelled', error=reason)
+            for page_num in range(max(1, start_page or 1), end_page + 1) if page_num not in converted
+        )
+    
+    def _build_conversion_result(self, data: Dict[str, Any]) -> ConversionResult:
+        """Wrap result metadata so 'combined_markdown' is produced on demand"""
+        return ConversionResult(
+            data,
+            combine=self._combine_markdown_results,
+            format_page=self._format_page_section
+        )
+    
+    def _summarize_results(self, results: List[PageResult]) -> Dict[str, Any]:
+        """Count page outcomes and collect job-level metrics"""
+        summary = {
+            'successful_pages': len([r for r in results if r['status'] == 'success']),
+            'failed_pages': len([r for r in results if r['status'] == 'error']),
+            'cancelled_pages': len([r for r in results if r['status'] == 'cancelled']),
+            'unprocessed_pages': sorted(r['page_num'] for r in results if r['status'] == 'cancelled'),
+            'hedge_stats': self.get_hedge_stats(),
+            'memory_usage': self.get_memory_usage()
+        }
+        ttfts = [r['ttft_seconds'] for r in results if r.get('ttft_seconds') is not None]
+        if ttfts:
+            summary['avg_ttft_seconds'] = sum(ttfts) / len(ttfts)
+            summary['truncated_pages'] = len([r for r in results if r.get('truncated')])
+        if self.endpoint_pool is not None:
+            summary['endpoint_health'] = self.get_endpoint_health()
+        if self.escalation_agent is not None:
+            summary['escalated_pages'] = len([r for r in results if r.get('escalated')])
+        if self.pdf2image_tool.preprocessor is not None:
+            summary['preprocess_stats'] = self.pdf2image_tool.get_preprocess_summary(
+                [r['image_path'] for r in results if r.get('image_path')]
+            )
+        return summary
+    
+    @staticmethod
+    def _page_num_from_path(image_path: str) -> int:
+        """Get page number from an image filename (format: page_XXX.jpg)"""
+        return int(Path(image_path).stem.split('_')[1]) if '_' in Path(image_path).stem else 0
+    
+    def _combine_markdown_results(self, results: List[PageResult]) -> str:
         """
         Combine individual page results into a single markdown document
         
@@ -254,91 +1174,506 @@ class LLMPdf2MarkdownTool:
         Returns:
             Combined markdown content
         """
-        combined_content = []
-        
-        for result in results:
-            if result['status'] == 'success':
-                # Add page header
-                combined_content.append(f"\n## Page {result['page_num']}\n")
-                combined_content.append(result['content'])
-                combined_content.append("\n---\n")
-            else:
-                # Add error information
-                combined_content.append(f"\n## Page {result['page_num']} - Error\n")
-                combined_content.append(f"*Error processing this page: {result.get('error', 'Unknown error')}*\n")
-                combined_content.append("\n---\n")
+        return "\n".join(self._format_page_section(result) for result in results)
+    
+    def _format_page_section(self, result: PageResult) -> str:
+        """
+        Format one page result as a section of the combined document
         
-        return "\n".join(combined_content)
+        Args:
+            result: Page result
+            
+        Returns:
+            Markdown section with page header and separator
+        """
+        if result['status'] == 'success':
+            # Add page header
+            return "\n".join([f"\n## Page {result['page_num']}\n", result['content'], "\n---\n"])
+        # Add error information
+        return "\n".join([
+            f"\n## Page {result['page_num']} - Error\n",
+            f"*Error processing this page: {result.get('error', 'Unknown error')}*\n",
+            "\n---\n"
+        ])
     
-    def convert_pdf_url_to_markdown(self, 
-                                   pdf_url: str, 
-                                   start_page: int = 1, 
-                                   end_page: Optional[int] = None,
-                                   prompt: str = None) -> Dict[str, Any]:
+    def convert_pdf_to_markdown_batch(self,
+                                      pdf_path: str,
+                                      start_page: int = 1,
+                                      end_page: Optional[int] = None,
+                                      prompt: str = None,
+                                      batch_client: Optional[BatchClient] = None,
+                                      poll_interval: float = 30.0,
+                                      timeout: float = 24 * 3600,
+                                      doc_id: Optional[str] = None,
+                                      batch_id: Optional[str] = None,
+                                      cancel_on_timeout: bool = True,
+                                      cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
-        Convert PDF from URL to markdown
+        Convert PDF to markdown through an offline batch API
+        
+        Page requests are written to a JSONL file in OpenAI batch format,
+        submitted in one batch and mapped back to pages once it completes.
+        Suited to backfills that do not need interactive latency.
+        
+        Expired and cancelled batches still yield the pages they finished.
+        If the batch does not finish within the timeout, the result has
+        success False and the batch_id; pass it back as batch_id (with
+        cancel_on_timeout=False) to collect the batch later.
+        
+        Cancelling the token stops rendering and writing page requests;
+        once the batch has been submitted, it is cancelled and the result
+        has success False, the batch_id and the cancel reason.
         
         Args:
-            pdf_url: URL of the PDF file
+            pdf_path: Path to the PDF file
             start_page: Starting page number (1-based)
             end_page: Ending page number (1-based, None for all pages)
             prompt: Custom prompt for LLM conversion
+            batch_client: Batch client (defaults to the OpenAI-compatible batch API at base_url)
+            poll_interval: Seconds between batch status polls
+            timeout: Maximum seconds to wait for the batch
+            doc_id: Document ID in the search index (defaults to pdf_path)
+            batch_id: Collect this previously submitted batch instead of submitting a new one
+            cancel_on_timeout: Cancel the batch when the timeout passes
+            cancel_token: Token the caller can cancel to stop the job
             
         Returns:
             Dictionary containing conversion results and metadata
         """
+        start_time = time.time()
+        if prompt is None:
+            prompt = self.default_prompt
+        if batch_client is None:
+            batch_client = OpenAIBatchClient(api_key=self.api_key, base_url=self.base_url)
+        
+        with self._start_profiler() as profiler, self._job_token(cancel_token, None) as token:
+            try:
+                # Step 1: Convert PDF to images
+                with profile_stage('render'):
+                    image_paths = self.pdf2image_tool.convert_pdf_to_images(
+                        pdf_path, start_page, end_page, cancel_token=token
+                    )
+                if not image_paths and not token.cancelled:
+                    raise ValueError("No images generated from PDF")
+                
+                # Step 2: Serialize page requests to a batch file and submit it
+                image_by_page = {self._page_num_from_path(p): p for p in image_paths}
+                if batch_id is None:
+                    try:
+                        batch_id = self._submit_batch(batch_client, image_by_page, prompt, token)
+                    except ConversionCancelled:
+                        # Nothing was submitted; every page of the range is unprocessed
+                        results = []
+                        page_count = self.pdf2image_tool.get_page_count(pdf_path)
+                        self._add_unprocessed_pages(results, start_page, end_page, page_count, token.reason)
+                        return self._build_conversion_result({
+                            'success': True,
+                            'pdf_path': pdf_path,
+                            'total_pages': len(results),
+                            'processed_pages': len(results),
+                            'processing_time_seconds': time.time() - start_time,
+                            'results': results,
+                            **self._summarize_results(results),
+                            **self._cancellation_info(token),
+                            **self._finish_profiler(profiler)
+                        })
+                    logger.info(f"Submitted batch {batch_id} with {len(image_by_page)} pages")
+                
+                # Step 3: Wait for the batch and map results back to pages
+                try:
+                    with profile_stage('batch_wait'):
+                        status = wait_for_batch(batch_client, batch_id, poll_interval, timeout, token)
+                except ConversionCancelled:
+                    batch_client.cancel(batch_id)
+                    return {
+                        'success': False,
+                        'pdf_path': pdf_path,
+                        'batch_id': batch_id,
+                        'batch_status': 'cancelling',
+                        'error': f"Cancelled: {token.reason}",
+                        'processing_time_seconds': time.time() - start_time,
+                        **self._cancellation_info(token),
+                        **self._finish_profiler(profiler)
+                    }
+                except TimeoutError as e:
+                    logger.warning(str(e))
+                    if cancel_on_timeout:
+                        batch_client.cancel(batch_id)
+                    return {
+                        'success': False,
+                        'pdf_path': pdf_path,
+                        'batch_id': batch_id,
+                        'batch_status': 'cancelling' if cancel_on_timeout else 'timeout',
+                        'error': str(e),
+                        'processing_time_seconds': time.time() - start_time,
+                        **self._finish_profiler(profiler)
+                    }
+                outputs = {}
+                if status in RESULT_STATUSES:
+                    for line in batch_client.fetch_results(batch_id):
+                        custom_id, content, error = parse_batch_output_line(line)
+                        outputs[page_num_from_custom_id(custom_id)] = (content, error)
+                
+                results = []
+                for page_num, image_path in sorted(image_by_page.items()):
+                    content, error = outputs.get(page_num, (None, f"Batch {status}: no result for page"))
+                    if content:
+                        results.append(PageResult(page_num=page_num, content=content, status='success',
+                                                  image_path=image_path))
+                    else:
+                        error = error or "LLM response is empty"
+                        results.append(PageResult(page_num=page_num, content=f"Error: {error}", status='error',
+                                                  image_path=image_path, error=error))
+                
+                # Step 4: Batch results arrive together; index them now
+                index_page = self._index_sink(doc_id or pdf_path)
+                if index_page is not None:
+                    for result in results:
+                        index_page(result)
+                
+                return self._build_conversion_result({
+                    'success': True,
+                    'pdf_path': pdf_path,
+                    'batch_id': batch_id,
+                    'batch_status': status,
+                    'total_pages': len(image_paths),
+                    'processed_pages': len(results),
+                    'processing_time_seconds': time.time() - start_time,
+                    'results': results,
+                    **self._summarize_results(results),
+                    **self._index_info(doc_id or pdf_path),
+                    **self._finish_profiler(profiler)
+                })
+                
+            except Exception as e:
+                logger.error(f"Error in batch PDF to markdown conversion: {e}")
+                return {
+                    'success': False,
+                    'pdf_path': pdf_path,
+                    **({'batch_id': batch_id} if batch_id is not None else {}),
+                    'error': str(e),
+                    'processing_time_seconds': time.time() - start_time
+                }
+    
+    def _submit_batch(self,
+                      batch_client: BatchClient,
+                      image_by_page: Dict[int, str],
+                      prompt: str,
+                      cancel_token: Optional[CancellationToken] = None) -> str:
+        """
+        Write the page requests to a JSONL file, submit it and remove the file
+        
+        Raises:
+            ConversionCancelled: If the token is cancelled before the batch is submitted
+        """
+        batch_file_path = os.path.join(
+            self.pdf2image_tool.base_path, 'batches', f"{uuid.uuid4().hex}.jsonl"
+        )
+        
+        def requests() -> Iterator[Dict[str, Any]]:
+            for page_num, image_path in image_by_page.items():
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                yield build_batch_request(page_custom_id(page_num), self.model_id, prompt, image_path,
+                                          temperature=self.temperature, max_tokens=self.max_output_tokens)
+        
         try:
-            # Convert PDF URL to images
-            image_paths = self.pdf2image_tool.convert_pdf_to_images_from_url(
-                pdf_url, start_page, end_page
-            )
+            write_batch_file(requests(), batch_file_path)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            return batch_client.submit(batch_file_path)
+        finally:
+            # The file holds every page image; the batch service has its own copy
+            if os.path.exists(batch_file_path):
+                os.remove(batch_file_path)
+    
+    def convert_pdf_bytes_to_markdown(self,
+                                      pdf_bytes: bytes,
+                                      start_page: int = 1,
+                                      end_page: Optional[int] = None,
+                                      prompt: str = None,
+                                      priority: int = 0,
+                                      deadline: Optional[float] = None,
+                                      on_partial: Optional[Callable[[int, str, str], None]] = None,
+                                      cancel_token: Optional[CancellationToken] = None,
+                                      timeout: Optional[float] = None,
+                                      tenant: Optional[str] = None,
+                                      doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Convert an in-memory PDF (e.g. an uploaded file) to markdown without writing it to disk
+        
+        Args:
+            pdf_bytes: PDF file content
+            start_page: Starting page number (1-based)
+            end_page: Ending page number (1-based, None for all pages)
+            prompt: Custom prompt for LLM conversion
+            priority: Job priority, higher values are scheduled first
+            deadline: Absolute time (time.time()) by which the job must finish
+            on_partial: Callback receiving (page_num, delta, accumulated_content) while
+                pages are streamed
+            cancel_token: Token the caller can cancel to stop the job
+            timeout: Seconds after which the job is cancelled
+            tenant: Tenant the pages are accounted to and fair-shared by
+            doc_id: Document ID in the search index (defaults to the MD5 of pdf_bytes)
             
-            if not image_paths:
-                raise ValueError("No images generated from PDF URL")
+        Returns:
+            Dictionary containing conversion results and metadata
+        """
+        start_time = time.time()
+        doc_id = doc_id or hashlib.md5(pdf_bytes).hexdigest()
+        
+        with self._start_profiler() as profiler, self._job_token(cancel_token, timeout) as token:
+            try:
+                # Convert PDF buffer to images
+                with profile_stage('render'):
+                    image_paths = self.pdf2image_tool.convert_pdf_bytes_to_images(
+                        pdf_bytes, start_page, end_page, cancel_token=token
+                    )
+                
+                if not image_paths and not token.cancelled:
+                    raise ValueError("No images generated from PDF")
+                
+                # Process images concurrently
+                results = self._process_images(image_paths, prompt, priority, deadline, on_partial,
+                                               cancel_token=token, tenant=tenant,
+                                               on_page=self._index_sink(doc_id))
+                if token.cancelled:
+                    page_count = self.pdf2image_tool.get_page_count(pdf_bytes)
+                    self._add_unprocessed_pages(results, start_page, end_page, page_count, token.reason)
+                
+                # Sort results; combined markdown is built lazily
+                results.sort(key=lambda x: x['page_num'])
+                
+                return self._build_conversion_result({
+                    'success': True,
+                    'total_pages': max(len(image_paths), len(results)),
+                    'processed_pages': len(results),
+                    'processing_time_seconds': time.time() - start_time,
+                    'results': results,
+                    **self._summarize_results(results),
+                    **self._cancellation_info(token),
+                    **self._tenant_info(tenant),
+                    **self._index_info(doc_id),
+                    **self._finish_profiler(profiler)
+                })
+                
+            except Exception as e:
+                logger.error(f"Error in PDF bytes to markdown conversion: {e}")
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'processing_time_seconds': time.time() - start_time
+                }
+    
+    def convert_pdf_to_markdown_hybrid(self,
+                                       pdf_path: str,
+                                       start_page: int = 1,
+                                       end_page: Optional[int] = None,
+                                       prompt: str = None,
+                                       priority: int = 0,
+                                       deadline: Optional[float] = None,
+                                       layout_analyzer: Optional[LayoutAnalyzer] = None,
+                                       cancel_token: Optional[CancellationToken] = None,
+                                       timeout: Optional[float] = None,
+                                       tenant: Optional[str] = None,
+                                       doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Convert PDF to markdown, sending only tables and figures to the vision model
+        
+        Text regions are extracted from the PDF text layer; table and figure
+        regions are cropped and converted by the model, and the outputs are
+        merged in reading order. Scanned pages and pages dominated by tables
+        or figures are converted whole as usual.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            start_page: Starting page number (1-based)
+            end_page: Ending page number (1-based, None for all pages)
+            prompt: Custom prompt for pages converted whole
+            priority: Job priority, higher values are scheduled first
+            deadline: Absolute time (time.time()) by which the job must finish
+            layout_analyzer: Layout analyzer (defaults to LayoutAnalyzer())
+            cancel_token: Token the caller can cancel to stop the job
+            timeout: Seconds after which the job is cancelled
+            tenant: Tenant the pages are accounted to and fair-shared by
+            doc_id: Document ID in the search index (defaults to pdf_path)
             
-            # Process images concurrently
-            results = []
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                future_to_image = {
-                    executor.submit(self._process_single_image, image_path, prompt): image_path
-                    for image_path in image_paths
+        Returns:
+            Dictionary containing conversion results and metadata
+        """
+        start_time = time.time()
+        layout_analyzer = layout_analyzer or LayoutAnalyzer()
+        
+        with self._start_profiler() as profiler, self._job_token(cancel_token, timeout) as token:
+            try:
+                # Step 1: Analyze layouts and render table/figure regions
+                with profile_stage('render'):
+                    plans = self.pdf2image_tool.render_layout_plans(pdf_path, layout_analyzer, start_page, end_page,
+                                                                    cancel_token=token)
+                if not plans and not token.cancelled:
+                    raise ValueError("No pages found in PDF")
+                
+                # Step 2: Convert pages through the shared scheduler
+                job_id = uuid.uuid4().hex
+                process = self._job_task('page', self._process_page_plan, token)
+                future_to_page = {
+                    self.scheduler.submit(
+                        process, plan, prompt,
+                        job_id=job_id, priority=priority, deadline=deadline, tenant=tenant
+                    ): plan.full_page_image or f"page_{plan.page_num:03d}"
+                    for plan in plans
                 }
+                results = self._wait_for_images(future_to_page, job_id, deadline, token,
+                                                self._index_sink(doc_id or pdf_path))
+                if token.cancelled:
+                    page_count = self.pdf2image_tool.get_page_count(pdf_path)
+                    self._add_unprocessed_pages(results, start_page, end_page, page_count, token.reason)
+                results.sort(key=lambda x: x['page_num'])
                 
-                for future in as_completed(future_to_image):
-                    image_path = future_to_image[future]
-                    try:
-                        result = future.result()
-                        results.append(result)
-                    except Exception as e:
-                        logger.error(f"Error processing {image_path}: {e}")
-                        results.append({
-                            'page_num': int(Path(image_path).stem.split('_')[1]) if '_' in Path(image_path).stem else 0,
-                            'content': f"Error: {str(e)}",
-                            'status': 'error',
-                            'image_path': image_path,
-                            'error': str(e)
-                        })
+                vision_regions = sum(1 for p in plans for r in p.regions if r.kind != 'text')
+                return self._build_conversion_result({
+                    'success': True,
+                    'pdf_path': pdf_path,
+                    'total_pages': max(len(plans), len(results)),
+                    'processed_pages': len(results),
+                    'processing_time_seconds': time.time() - start_time,
+                    'results': results,
+                    'layout_stats': {
+                        'full_pages': sum(1 for p in plans if p.needs_full_page),
+                        'text_regions': sum(1 for p in plans for r in p.regions if r.kind == 'text'),
+                        'vision_regions': vision_regions,
+                        'avg_vision_area_ratio': sum(p.vision_area_ratio for p in plans) / max(1, len(plans)),
+                    },
+                    **self._summarize_results(results),
+                    **self._cancellation_info(token),
+                    **self._tenant_info(tenant),
+                    **self._index_info(doc_id or pdf_path),
+                    **self._finish_profiler(profiler)
+                })
+                
+            except Exception as e:
+                logger.error(f"Error in hybrid PDF to markdown conversion: {e}")
+                return {
+                    'success': False,
+                    'pdf_path': pdf_path,
+                    'error': str(e),
+                    'processing_time_seconds': time.time() - start_time
+                }
+    
+    def _process_page_plan(self, plan: PagePlan, prompt: str = None) -> PageResult:
+        """
+        Convert one analyzed page, merging local text with model output for visual regions
+        
+        Args:
+            plan: Page layout plan with rendered region images
+            prompt: Custom prompt for pages converted whole
             
-            # Sort and combine results
-            results.sort(key=lambda x: x['page_num'])
-            combined_markdown = self._combine_markdown_results(results)
+        Returns:
+            PageResult for the page
+        """
+        if plan.full_page_image is not None:
+            return self._process_single_image(plan.full_page_image, prompt)
+        
+        parts = []
+        errors = []
+        cancel_token = CancellationToken.current()
+        for region in plan.regions:
+            if cancel_token is not None and cancel_token.cancelled:
+                return self._cancelled_result(f"page_{plan.page_num:03d}", cancel_token.reason)
+            if region.kind == 'text':
+                parts.append(region.text)
+                continue
+            region_prompt = self.TABLE_PROMPT if region.kind == 'table' else self.FIGURE_PROMPT
+            try:
+                run = self._run_agent(region_prompt, Image(filepath=Path(region.image_path)))
+                if not run.content:
+                    raise ValueError("LLM response is empty")
+                parts.append(run.content.strip())
+            except ConversionCancelled as e:
+                return self._cancelled_result(f"page_{plan.page_num:03d}", str(e))
+            except Exception as e:
+                logger.error(f"Error converting {region.kind} region {region.image_path}: {e}")
+                errors.append(f"{region.kind} region: {e}")
+        
+        content = "\n\n".join(parts)
+        if errors:
+            return PageResult(page_num=plan.page_num, content=content, status='error',
+                              error="; ".join(errors))
+        return PageResult(page_num=plan.page_num, content=content, status='success')
+    
+    def convert_pdf_url_to_markdown(self, 
+                                   pdf_url: str, 
+                                   start_page: int = 1, 
+                                   end_page: Optional[int] = None,
+                                   prompt: str = None,
+                                   priority: int = 0,
+                                   deadline: Optional[float] = None,
+                                   on_partial: Optional[Callable[[int, str, str], None]] = None,
+                                   cancel_token: Optional[CancellationToken] = None,
+                                   timeout: Optional[float] = None,
+                                   tenant: Optional[str] = None,
+                                   doc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Convert PDF from URL to markdown
+        
+        Args:
+            pdf_url: URL of the PDF file
+            start_page: Starting page number (1-based)
+            end_page: Ending page number (1-based, None for all pages)
+            prompt: Custom prompt for LLM conversion
+            priority: Job priority, higher values are scheduled first
+            deadline: Absolute time (time.time()) by which the job must finish
+            on_partial: Callback receiving (page_num, delta, accumulated_content) while
+                pages are streamed
+            cancel_token: Token the caller can cancel to stop the job
+            timeout: Seconds after which the job is cancelled
+            tenant: Tenant the pages are accounted to and fair-shared by
+            doc_id: Document ID in the search index (defaults to pdf_url)
             
-            return {
-                'success': True,
-                'pdf_url': pdf_url,
-                'total_pages': len(image_paths),
-                'processed_pages': len(results),
-                'results': results,
-                'combined_markdown': combined_markdown,
-                'successful_pages': len([r for r in results if r['status'] == 'success']),
-                'failed_pages': len([r for r in results if r['status'] == 'error'])
-            }
+            The page count of a URL is not known before it is rendered, so pages
+            never rendered are only listed as unprocessed when end_page is given.
             
-        except Exception as e:
-            logger.error(f"Error in PDF URL to markdown conversion: {e}")
-            return {
-                'success': False,
-                'pdf_url': pdf_url,
-                'error': str(e)
-            }
-
+        Returns:
+            Dictionary containing conversion results and metadata
+        """
+        with self._start_profiler() as profiler, self._job_token(cancel_token, timeout) as token:
+            try:
+                # Convert PDF URL to images
+                with profile_stage('render'):
+                    image_paths = self.pdf2image_tool.convert_pdf_to_images_from_url(
+                        pdf_url, start_page, end_page, cancel_token=token
+                    )
+                
+                if not image_paths and not token.cancelled:
+                    raise ValueError("No images generated from PDF URL")
+                
+                # Process images concurrently
+                results = self._process_images(image_paths, prompt, priority, deadline, on_partial,
+                                               cancel_token=token, tenant=tenant,
+                                               on_page=self._index_sink(doc_id or pdf_url))
+                if token.cancelled and end_page is not None:
+                    self._add_unprocessed_pages(results, start_page, end_page, end_page, token.reason)
+                
+                # Sort results; combined markdown is built lazily
+                results.sort(key=lambda x: x['page_num'])
+                
+                return self._build_conversion_result({
+                    'success': True,
+                    'pdf_url': pdf_url,
+                    'total_pages': max(len(image_paths), len(results)),
+                    'processed_pages': len(results),
+                    'results': results,
+                    **self._summarize_results(results),
+                    **self._cancellation_info(token),
+                    **self._tenant_info(tenant),
+                    **self._index_info(doc_id or pdf_url),
+                    **self._finish_profiler(profiler)
+                })
+                
+            except Exception as e:
+                logger.error(f"Error in PDF URL to markdown conversion: {e}")
+                return {
+                    'success': False,
+                    'pdf_url': pdf_url,
+                    'error': str(e)
+                }
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite FTS5 full-text index over converted markdown pages
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.page_result import PageResult
+
+logger = logging.getLogger(__name__)
+
+# Page content lives once in `pages`; the FTS table only holds the index
+# (external content), kept in sync by triggers
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    page_num INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    UNIQUE (doc_id, page_num)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    content, content='pages', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO pages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+
+@dataclass(slots=True)
+class SearchHit:
+    """A page matching a search query"""
+
+    doc_id: str
+    page_num: int
+    snippet: str
+    score: float
+
+
+# The trigram tokenizer cannot match shorter terms from the index
+TRIGRAM_MIN_CHARS = 3
+
+
+def _plain_query(terms: List[str]) -> str:
+    """Quote each term so user input is never parsed as FTS5 syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term: str) -> str:
+    """LIKE pattern matching a term anywhere, with the LIKE wildcards escaped"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _excerpt(content: str, term: str, width: int = 32) -> str:
+    """Text around the first occurrence of a term, marked like the FTS5 snippets"""
+    position = content.lower().find(term.lower())
+    if position < 0:
+        return content[:width]
+    end = position + len(term)
+    start, stop = max(0, position - width // 2), min(len(content), end + width // 2)
+    return (("..." if start else "") + content[start:position] + "[" + content[position:end] + "]"
+            + content[end:stop] + ("..." if stop < len(content) else ""))
+
+
+class MarkdownSearchIndex:
+    """
+    Page-level full-text index of converted documents.
+
+    Pages are upserted by (doc_id, page_num), so re-converting a document
+    replaces its pages; pages a shorter revision no longer has stay until
+    delete_document() is called. One connection is shared behind a lock,
+    so the index can be written from conversion threads and queried at the
+    same time.
+
+    The default trigram tokenizer matches any substring, so Chinese text,
+    which has no spaces between words, can be searched by any part of a
+    sentence. Terms shorter than three characters cannot use the trigram
+    index and are matched by scanning the pages. tokenizer='unicode61'
+    gives a smaller, word-based index for text in Latin scripts.
+    """
+
+    def __init__(self, db_path: str, tokenizer: str = "trigram"):
+        """
+        Open (or create) an index
+
+        Args:
+            db_path: SQLite database file (":memory:" for a temporary index)
+            tokenizer: FTS5 tokenizer, used when the index is created (an
+                existing index keeps its tokenizer)
+        """
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA.format(tokenizer=tokenizer.replace("'", "''")))
+            table_sql = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'pages_fts'").fetchone()[0]
+        self.trigram = "trigram" in table_sql.lower()
+
+    def add_page(self, doc_id: str, result: PageResult) -> bool:
+        """
+        Index one converted page, replacing a previous version of it
+
+        Args:
+            doc_id: Document the page belongs to
+            result: Page result (only successful pages are indexed)
+
+        Returns:
+            True if the page was indexed
+        """
+        return self.add_pages(doc_id, [result]) == 1
+
+    def add_pages(self, doc_id: str, results: Iterable[PageResult]) -> int:
+        """
+        Index converted pages in one transaction
+
+        Args:
+            doc_id: Document the pages belong to
+            results: Page results (only successful pages are indexed)
+
+        Returns:
+            Number of pages indexed
+        """
+        now = time.time()
+        rows = [(doc_id, r['page_num'], r['content'], now) for r in results if r['status'] == 'success']
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO pages (doc_id, page_num, content, indexed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (doc_id, page_num) DO UPDATE SET content = excluded.content,"
+                " indexed_at = excluded.indexed_at",
+                rows,
+            )
+        return len(rows)
+
+    def search(self,
+               query: str,
+               limit: int = 10,
+               doc_id: Optional[str] = None,
+               raw: bool = False) -> List[SearchHit]:
+        """
+        Find the pages best matching a query
+
+        Args:
+            query: Search terms; a page must contain all of them
+            limit: Maximum number of hits
+            doc_id: Only search this document
+            raw: Pass the query as FTS5 syntax (OR, NEAR, prefix*, "phrases")
+
+        Returns:
+            Hits ordered by relevance (BM25), with a snippet around the match
+        """
+        if raw:
+            match, scanned = query.strip(), []
+        else:
+            terms = query.split()
+            scanned = [t for t in terms if self.trigram and len(t) < TRIGRAM_MIN_CHARS]
+            match = _plain_query([t for t in terms if t not in scanned])
+        if not match:
+            return self._scan(scanned, limit, doc_id) if scanned else []
+
+        sql = ("SELECT p.doc_id, p.page_num, snippet(pages_fts, 0, '[', ']', '...', 16), bm25(pages_fts)"
+               " FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid WHERE pages_fts MATCH ?")
+        params: List[Any] = [match]
+        for term in scanned:
+            sql += " AND p.content LIKE ? ESCAPE '\\'"
+            params.append(_like_pattern(term))
+        if doc_id is not None:
+            sql += " AND p.doc_id = ?"
+            params.append(doc_id)
+        sql += " ORDER BY bm25(pages_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        # bm25() is lower for better matches; report higher-is-better scores
+        return [SearchHit(doc, page_num, snippet, -score) for doc, page_num, snippet, score in rows]
+
+    def _scan(self, terms: List[str], limit: int, doc_id: Optional[str]) -> List[SearchHit]:
+        """Find pages containing all terms without the index (unranked, in page order)"""
+        sql = "SELECT doc_id, page_num, content FROM pages WHERE " + " AND ".join(
+            "content LIKE ? ESCAPE '\\'" for _ in terms)
+        params: List[Any] = [_like_pattern(term) for term in terms]
+        if doc_id is not None:
+            sql += " AND doc_id = ?"
+            params.append(doc_id)
+        sql += " ORDER BY doc_id, page_num LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [SearchHit(doc, page_num, _excerpt(content, terms[0]), 0.0) for doc, page_num, content in rows]
+
+    def get_page(self, doc_id: str, page_num: int) -> Optional[str]:
+        """Get the indexed content of a page"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM pages WHERE doc_id = ? AND page_num = ?", (doc_id, page_num)
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete_document(self, doc_id: str) -> int:
+        """
+        Remove all pages of a document
+
+        Returns:
+            Number of pages removed
+        """
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM pages WHERE doc_id = ?", (doc_id,)).rowcount
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get the number of indexed documents and pages"""
+        with self._lock:
+            documents, pages = self._conn.execute(
+                "SELECT COUNT(DISTINCT doc_id), COUNT(*) FROM pages"
+            ).fetchone()
+        return {'documents': documents, 'pages': pages}
+
+    def optimize(self) -> None:
+        """Merge the index segments (worth running after large backfills)"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO pages_fts (pages_fts) VALUES ('optimize')")
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
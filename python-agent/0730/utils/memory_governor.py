@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide byte budget for page rasters and in-flight model requests
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from utils.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Default budget, overridable with PDF2MD_MEMORY_BUDGET_MB
+DEFAULT_BUDGET_BYTES = 1024 * 1024 * 1024
+
+# Bytes reserved for a model response when no output cap is set
+DEFAULT_RESPONSE_RESERVE_BYTES = 64 * 1024
+
+
+def estimate_raster_bytes(width_px: int, height_px: int, channels: int = 3) -> int:
+    """
+    Estimate the peak memory of rendering one page
+
+    The pixmap, its PPM encoding and the decoded PIL image are alive at the
+    same time while a page is saved, so the raster size is counted three times.
+    """
+    return width_px * height_px * channels * 3
+
+
+def estimate_request_bytes(image_bytes: int, max_output_tokens: Optional[int] = None) -> int:
+    """
+    Estimate the memory held by one model request
+
+    The image is read and base64 encoded (4/3 larger) into the request body,
+    which the HTTP client copies once more; the response is bounded by the
+    output token cap (about 4 bytes per token).
+    """
+    response = max_output_tokens * 4 if max_output_tokens else DEFAULT_RESPONSE_RESERVE_BYTES
+    return image_bytes + image_bytes * 8 // 3 + response
+
+
+class MemoryGovernor:
+    """
+    Byte budget shared by everything that holds page data in memory.
+
+    Callers reserve an estimate before allocating and release it when done;
+    reservations block while the budget is exhausted. A single reservation
+    larger than the whole budget is admitted once nothing else is reserved,
+    so oversized pages are processed one at a time instead of deadlocking.
+    A waiting reservation gives up as soon as its job is cancelled.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        """
+        Initialize the governor
+
+        Args:
+            budget_bytes: Maximum bytes reserved at once
+        """
+        if budget_bytes <= 0:
+            raise ValueError("budget_bytes must be positive")
+        self.budget_bytes = budget_bytes
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._peak = 0
+        self._reservations = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+
+    def acquire(self,
+                nbytes: int,
+                timeout: Optional[float] = None,
+                cancel_token: Optional[CancellationToken] = None) -> bool:
+        """
+        Reserve bytes, waiting until they fit in the budget
+
+        Args:
+            nbytes: Bytes to reserve
+            timeout: Maximum seconds to wait (None waits indefinitely)
+            cancel_token: Token that ends the wait when cancelled
+
+        Returns:
+            True if reserved, False if the timeout expired or the token was cancelled
+        """
+        nbytes = max(0, int(nbytes))
+        with self._cond:
+            if not self._fits(nbytes):
+                if cancel_token is not None and cancel_token.cancelled:
+                    return False
+                self._waits += 1
+                start = time.time()
+                logger.debug(f"Waiting for {nbytes} bytes ({self._in_use}/{self.budget_bytes} in use)")
+                unregister = cancel_token.add_callback(self._wake) if cancel_token is not None else None
+                try:
+                    admitted = self._cond.wait_for(
+                        lambda: self._fits(nbytes) or (cancel_token is not None and cancel_token.cancelled),
+                        timeout,
+                    )
+                finally:
+                    if unregister is not None:
+                        unregister()
+                self._wait_seconds += time.time() - start
+                if not admitted or not self._fits(nbytes):
+                    return False
+            self._in_use += nbytes
+            self._reservations += 1
+            self._peak = max(self._peak, self._in_use)
+            return True
+
+    def release(self, nbytes: int) -> None:
+        """Return reserved bytes to the budget"""
+        nbytes = max(0, int(nbytes))
+        with self._cond:
+            self._in_use = max(0, self._in_use - nbytes)
+            self._reservations = max(0, self._reservations - 1)
+            self._cond.notify_all()
+
+    def _wake(self, _reason: Optional[str] = None) -> None:
+        """Wake waiting reservations so they see a cancellation"""
+        with self._cond:
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int) -> Iterator[None]:
+        """Hold a reservation for the duration of a with-block"""
+        self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def set_budget(self, budget_bytes: int) -> None:
+        """Change the budget, waking reservations that now fit"""
+        if budget_bytes <= 0:
+            raise ValueError("budget_bytes must be positive")
+        with self._cond:
+            self.budget_bytes = budget_bytes
+            self._cond.notify_all()
+
+    def _fits(self, nbytes: int) -> bool:
+        return self._in_use + nbytes <= self.budget_bytes or self._reservations == 0
+
+    def get_usage(self) -> Dict[str, Any]:
+        """Get current and peak reserved bytes and time spent waiting"""
+        with self._cond:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'in_use_bytes': self._in_use,
+                'peak_bytes': self._peak,
+                'active_reservations': self._reservations,
+                'waits': self._waits,
+                'wait_seconds': self._wait_seconds,
+            }
+
+
+_global_governor: Optional[MemoryGovernor] = None
+_global_lock = threading.Lock()
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Get the process-wide governor, created on first use"""
+    global _global_governor
+    with _global_lock:
+        if _global_governor is None:
+            budget_mb = os.getenv("PDF2MD_MEMORY_BUDGET_MB")
+            budget = int(float(budget_mb) * 1024 * 1024) if budget_mb else DEFAULT_BUDGET_BYTES
+            _global_governor = MemoryGovernor(budget)
+        return _global_governor
+
+
+def set_memory_budget(budget_bytes: int) -> MemoryGovernor:
+    """Set the budget of the process-wide governor"""
+    governor = get_memory_governor()
+    governor.set_budget(budget_bytes)
+    return governor
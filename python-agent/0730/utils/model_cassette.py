@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Record and replay model calls with their original latencies
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from agno.media import Image
+from agno.run.response import RunEvent, RunResponse
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMissError(Exception):
+    """Raised when a replayed request was never recorded"""
+
+
+class InjectedFaultError(Exception):
+    """Raised by a replaying cassette to simulate a failed model call"""
+
+
+class ReplayedError(Exception):
+    """Raised by a replaying cassette for a model call that failed when recorded"""
+
+    def __init__(self, message: str, error_type: Optional[str] = None):
+        super().__init__(message)
+        # Class name of the original exception (None for older recordings)
+        self.error_type = error_type
+
+
+def request_fingerprint(model_id: str, prompt: str, image: Image) -> str:
+    """
+    Fingerprint a model request by model, prompt and image content
+
+    Args:
+        model_id: Model ID the request is sent to
+        prompt: Prompt text
+        image: Image sent with the prompt
+
+    Returns:
+        SHA-256 hex digest identifying the request
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{model_id}\x1f{prompt}\x1f".encode('utf-8'))
+    if image.content is not None:
+        digest.update(image.content)
+    elif image.filepath is not None:
+        with open(image.filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+    else:
+        digest.update(str(image.url).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ModelCassette:
+    """
+    Store of recorded model responses for deterministic offline runs.
+
+    In record mode every call made through the tool is appended to a JSONL
+    file with its content (or error) and latency. In replay mode calls are
+    answered from the file without network access, waiting for the recorded
+    latency scaled by `speed`, optionally with injected errors and latency
+    spikes. Recorded failures are raised again as ReplayedError, injected
+    ones as InjectedFaultError. Repeated recordings of the same request are
+    replayed in turn.
+    """
+
+    RECORD = 'record'
+    REPLAY = 'replay'
+
+    def __init__(self,
+                 path: str,
+                 mode: str = REPLAY,
+                 speed: float = 1.0,
+                 fault_rate: float = 0.0,
+                 slow_rate: float = 0.0,
+                 slow_factor: float = 5.0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the cassette
+
+        Args:
+            path: JSONL file holding the recordings
+            mode: 'record' to call the model and store responses, 'replay' to serve them
+            speed: Replay speed multiplier (2.0 replays twice as fast, 0 skips waiting)
+            fault_rate: Fraction of replayed calls that raise InjectedFaultError
+            slow_rate: Fraction of replayed calls whose latency is multiplied by slow_factor
+            slow_factor: Latency multiplier for slowed calls
+            seed: Random seed for reproducible fault injection
+        """
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"Unsupported cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.fault_rate = fault_rate
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._stats = {'recorded': 0, 'replayed': 0, 'misses': 0, 'injected_faults': 0, 'injected_slowdowns': 0}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry['fingerprint'], []).append(entry)
+
+    def record(self,
+               fingerprint: str,
+               model_id: str,
+               content: Optional[str],
+               latency: float,
+               ttft: Optional[float] = None,
+               error: Optional[str] = None,
+               error_type: Optional[str] = None) -> None:
+        """Append a recorded call (or failure, with its exception class name) to the cassette file"""
+        entry = {
+            'fingerprint': fingerprint,
+            'model_id': model_id,
+            'content': content,
+            'latency': latency,
+            'ttft': ttft,
+            'error': error,
+            'error_type': error_type,
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries.setdefault(fingerprint, []).append(entry)
+            self._stats['recorded'] += 1
+
+    def play(self, fingerprint: str) -> RunResponse:
+        """
+        Replay a recorded call, waiting for its (scaled) latency
+
+        Raises:
+            CassetteMissError: If the request was not recorded
+            InjectedFaultError: If a fault is injected
+            ReplayedError: If the recorded call failed
+        """
+        entry, latency = self._next_entry(fingerprint)
+        self._wait(latency)
+        if entry['error'] is not None:
+            self._raise_error(entry)
+        return RunResponse(content=entry['content'], model=entry['model_id'])
+
+    def play_stream(self, fingerprint: str) -> Iterator[Any]:
+        """
+        Replay a recorded call as content events, spreading its latency over the chunks
+
+        Raises:
+            CassetteMissError: If the request was not recorded
+            InjectedFaultError: If a fault is injected
+            ReplayedError: If the recorded call failed
+        """
+        entry, latency = self._next_entry(fingerprint)
+        ttft = entry['ttft'] if entry['ttft'] is not None else latency
+        ttft = min(ttft * latency / entry['latency'], latency) if entry['latency'] else 0.0
+        self._wait(ttft)
+        if entry['error'] is not None:
+            self._raise_error(entry)
+        chunks = (entry['content'] or "").splitlines(keepends=True)
+        for index, chunk in enumerate(chunks):
+            if index:
+                self._wait((latency - ttft) / len(chunks))
+            yield SimpleNamespace(event=RunEvent.run_response_content.value, content=chunk)
+
+    def _next_entry(self, fingerprint: str):
+        """Pick the next recording of a request and decide on injected faults"""
+        with self._lock:
+            entries = self._entries.get(fingerprint)
+            if not entries:
+                self._stats['misses'] += 1
+                raise CassetteMissError(f"No recorded response for request {fingerprint[:12]}")
+            cursor = self._cursors.get(fingerprint, 0)
+            self._cursors[fingerprint] = cursor + 1
+            entry = entries[cursor % len(entries)]
+            latency = entry['latency']
+            self._stats['replayed'] += 1
+            if self._random.random() < self.fault_rate:
+                self._stats['injected_faults'] += 1
+                entry = dict(entry, error="Injected fault", injected=True)
+            elif self._random.random() < self.slow_rate:
+                self._stats['injected_slowdowns'] += 1
+                latency *= self.slow_factor
+        return entry, latency
+
+    @staticmethod
+    def _raise_error(entry: Dict[str, Any]) -> None:
+        """Raise the failure of a replayed entry"""
+        if entry.get('injected'):
+            raise InjectedFaultError(entry['error'])
+        raise ReplayedError(entry['error'], entry.get('error_type'))
+
+    def _wait(self, seconds: float) -> None:
+        if self.speed > 0 and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get record/replay counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['requests'] = len(self._entries)
+        return stats
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Per-page content fingerprints and a page result store for incremental re-conversion
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import fitz
+
+from utils.page_result import PageResult
+
+logger = logging.getLogger(__name__)
+
+
+# Indirect reference ("12 0 R") in PDF object source
+_REF = re.compile(r"(\d+) \d+ R")
+# Resource dict entry: /Name 12 0 R
+_NAMED_REF = re.compile(r"/([^\s/<>\[\]()]+)\s*(\d+) \d+ R")
+
+
+def _update(digest, *parts: Any) -> None:
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b"\x1f")
+
+
+def _key_source(doc: fitz.Document, xref: int, key: str) -> str:
+    """Source of a dict value, following an indirect value once, with object numbers left out"""
+    kind, value = doc.xref_get_key(xref, key)
+    if kind == 'xref':
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    return _REF.sub("R", value)
+
+
+def _resources(doc: fitz.Document, xref: int, category: str) -> List[Tuple[str, int]]:
+    """(name, xref) of the XObjects or fonts in the resources of a form XObject"""
+    kind, value = doc.xref_get_key(xref, f"Resources/{category}")
+    if kind == 'xref':
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    elif kind != 'dict':
+        return []
+    return [(name, int(ref)) for name, ref in _NAMED_REF.findall(value)]
+
+
+def _update_form(digest, doc: fitz.Document, xref: int, visited: Set[int]) -> None:
+    """Hash the images, fonts and nested forms a form XObject draws with, depth first"""
+    for name, ref in _resources(doc, xref, "XObject"):
+        subtype = doc.xref_get_key(ref, "Subtype")[1]
+        _update(digest, 'xobject', name, subtype, doc.xref_stream_raw(ref) or b"")
+        smask_kind, smask = doc.xref_get_key(ref, "SMask")
+        if smask_kind == 'xref':
+            _update(digest, 'smask', doc.xref_stream_raw(int(smask.split()[0])) or b"")
+        # A form reached again (shared, or a cycle) hashes the same; its name and stream above suffice
+        if subtype == '/Form' and ref not in visited:
+            visited.add(ref)
+            _update_form(digest, doc, ref, visited)
+            _update(digest, 'end', name)
+    for name, ref in _resources(doc, xref, "Font"):
+        _update(digest, 'font', name, *(_key_source(doc, ref, key) for key in ('Subtype', 'BaseFont', 'Encoding')))
+
+
+def page_fingerprint(doc: fitz.Document, page: fitz.Page) -> str:
+    """
+    Fingerprint what a page renders to, without rasterizing it
+
+    Covers the page geometry, the decompressed content streams, the raw
+    streams of images and form XObjects, the fonts used and annotations.
+    Form XObjects are followed into their own resources, however deeply
+    nested. Object numbers are left out, so a page keeps its fingerprint
+    when other pages are edited, inserted or removed and the file is
+    rewritten. A re-embedded font subset may change the fingerprint (a
+    harmless miss).
+
+    Args:
+        doc: Open document the page belongs to
+        page: Page to fingerprint
+
+    Returns:
+        SHA-256 hex digest of the page content
+    """
+    digest = hashlib.sha256()
+    _update(digest, tuple(page.mediabox), tuple(page.cropbox), page.rotation)
+    _update(digest, page.read_contents())
+
+    # PyMuPDF lists the page's own resources (including inherited ones);
+    # nested resources are walked here, since its scan stops at shared forms
+    for xref, smask, *_, name, _filter, referencer in page.get_images(full=True):
+        if referencer:
+            continue
+        _update(digest, 'image', name, doc.xref_stream_raw(xref) or b"")
+        if smask:
+            _update(digest, 'smask', doc.xref_stream_raw(smask) or b"")
+    visited: Set[int] = set()
+    for xref, name, invoker, bbox in page.get_xobjects():
+        if invoker:
+            continue
+        _update(digest, 'xobject', name, tuple(bbox), doc.xref_stream_raw(xref) or b"")
+        if xref not in visited:
+            visited.add(xref)
+            _update_form(digest, doc, xref, visited)
+            _update(digest, 'end', name)
+    for _xref, _ext, font_type, basefont, name, encoding, referencer in page.get_fonts(full=True):
+        if referencer:
+            continue
+        _update(digest, 'font', name, font_type, basefont, encoding)
+    for annot in page.annots():
+        _update(digest, 'annot', annot.type[1], tuple(annot.rect), annot.info.get('content', ''))
+
+    return digest.hexdigest()
+
+
+def conversion_key(*settings: Any) -> str:
+    """Short key identifying conversion settings (model, prompt, render settings)"""
+    digest = hashlib.sha256()
+    _update(digest, *settings)
+    return digest.hexdigest()[:16]
+
+
+class PageResultStore:
+    """
+    Converted pages stored by page fingerprint, shared by all versions of a document.
+
+    Results live in one JSON file per page under a folder per conversion key,
+    so a page converted with other settings (model, prompt, render settings)
+    is never reused. Files are written atomically, so concurrent jobs can
+    share a store. Only complete, successful pages are stored.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the store
+
+        Args:
+            root: Folder holding the stored page results
+        """
+        self.root = root
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stored': 0}
+
+    def _path(self, key: str, fingerprint: str) -> str:
+        return os.path.join(self.root, key, fingerprint[:2], f"{fingerprint}.json")
+
+    def get(self, key: str, fingerprint: str, page_num: int) -> Optional[PageResult]:
+        """
+        Look up a stored page
+
+        Args:
+            key: Conversion key
+            fingerprint: Page fingerprint
+            page_num: Page number of the page in the current document
+
+        Returns:
+            The stored result renumbered to page_num, or None
+        """
+        path = self._path(key, fingerprint)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable stored page {path}: {e}")
+            data = None
+        with self._lock:
+            self._stats['hits' if data is not None else 'misses'] += 1
+        if data is None:
+            return None
+        data['page_num'] = page_num
+        return PageResult.from_dict(data)
+
+    def put(self, key: str, fingerprint: str, result: PageResult) -> None:
+        """Store a successfully converted page; pages cut off at the output cap are not kept"""
+        if result['status'] != 'success' or result.get('truncated'):
+            return
+        data = result.to_dict()
+        # Render paths belong to one version of the document
+        data.pop('image_path', None)
+        path = self._path(key, fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._stats['stored'] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get lookup and store counters"""
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Page offset index for random access into combined markdown files
+"""
+
+import os
+import re
+import json
+import mmap
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+INDEX_SUFFIX = ".pages.json"
+INDEX_VERSION = 1
+
+# Page headers written by LLMPdf2MarkdownTool._format_page_section
+_PAGE_HEADER = re.compile(rb"\n## Page (\d+)(?: - Error)?\n")
+
+
+def index_path_for(markdown_path: str) -> str:
+    """Get the sidecar index path of a markdown file"""
+    return markdown_path + INDEX_SUFFIX
+
+
+def _write_index(markdown_path: str, size: int, pages: List[Tuple[int, int, int]]) -> str:
+    """Atomically write the sidecar index of a markdown file"""
+    index_path = index_path_for(markdown_path)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'size': size, 'pages': pages}, f)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def write_paged_markdown(markdown_path: str, sections: Iterable[Tuple[int, str]]) -> str:
+    """
+    Write page sections to a markdown file and record each page's byte range
+
+    Sections are joined with a newline, so the file matches the combined
+    markdown of the same sections. The markdown file is written first and
+    the index last, both atomically.
+
+    Args:
+        markdown_path: Output markdown file
+        sections: (page_num, section text) in document order
+
+    Returns:
+        Path of the sidecar index
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(markdown_path)), exist_ok=True)
+    tmp_path = f"{markdown_path}.{os.getpid()}.tmp"
+    pages = []
+    offset = 0
+    with open(tmp_path, 'wb') as f:
+        for page_num, section in sections:
+            if pages:
+                f.write(b"\n")
+                offset += 1
+            data = section.encode('utf-8')
+            f.write(data)
+            pages.append((page_num, offset, offset + len(data)))
+            offset += len(data)
+    os.replace(tmp_path, markdown_path)
+    return _write_index(markdown_path, offset, pages)
+
+
+def build_page_index(markdown_path: str) -> str:
+    """
+    Build the sidecar index of an existing markdown file by scanning its page headers
+
+    For outputs written before the index existed. A page whose content
+    contains a line "## Page N" of its own is split there, so prefer
+    write_paged_markdown() for new files.
+
+    Args:
+        markdown_path: Combined markdown file
+
+    Returns:
+        Path of the sidecar index
+    """
+    size = os.path.getsize(markdown_path)
+    pages = []
+    if size:
+        with open(markdown_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            starts = [(int(m.group(1)), m.start()) for m in _PAGE_HEADER.finditer(data)]
+        for i, (page_num, start) in enumerate(starts):
+            # Sections are separated by one newline
+            end = starts[i + 1][1] - 1 if i + 1 < len(starts) else size
+            pages.append((page_num, start, end))
+    return _write_index(markdown_path, size, pages)
+
+
+class PagedMarkdownReader:
+    """
+    Read single pages or page ranges of a combined markdown file.
+
+    The file is memory-mapped and located through its sidecar index, so
+    only the requested bytes are read, however large the document.
+    """
+
+    def __init__(self, markdown_path: str, index_path: Optional[str] = None):
+        """
+        Open a markdown file and its page index
+
+        Args:
+            markdown_path: Combined markdown file
+            index_path: Sidecar index (defaults to <markdown_path>.pages.json)
+
+        Raises:
+            FileNotFoundError: If the index does not exist (see build_page_index())
+            ValueError: If the index does not match the file
+        """
+        self.markdown_path = markdown_path
+        with open(index_path or index_path_for(markdown_path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported page index version: {index.get('version')}")
+        self._ranges: Dict[int, Tuple[int, int]] = {page: (start, end) for page, start, end in index['pages']}
+        self._order = [page for page, _, _ in index['pages']]
+
+        self._file = open(markdown_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size != index['size']:
+            self._file.close()
+            raise ValueError(f"Page index is stale: {markdown_path} has {size} bytes, index expects {index['size']}")
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __enter__(self) -> "PagedMarkdownReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, page_num: int) -> bool:
+        return page_num in self._ranges
+
+    @property
+    def page_numbers(self) -> List[int]:
+        """Page numbers in file order"""
+        return list(self._order)
+
+    def get_page(self, page_num: int) -> str:
+        """
+        Get one page section (header, content and separator)
+
+        Raises:
+            KeyError: If the page is not in the file
+        """
+        start, end = self._ranges[page_num]
+        return self._data[start:end].decode('utf-8')
+
+    def get_pages(self, start_page: int, end_page: int) -> str:
+        """
+        Get the sections of the pages from start_page to end_page (inclusive) as one string
+
+        Pages of the range missing from the file are skipped; an empty
+        string is returned if none is present.
+        """
+        positions = [i for i, p in enumerate(self._order) if start_page <= p <= end_page]
+        if not positions:
+            return ""
+        if positions[-1] - positions[0] + 1 == len(positions):
+            # Adjacent in the file (the usual, page-sorted case): one slice covers the range
+            start = self._ranges[self._order[positions[0]]][0]
+            end = self._ranges[self._order[positions[-1]]][1]
+            return self._data[start:end].decode('utf-8')
+        return "\n".join(self.get_page(self._order[i]) for i in positions)
+
+    def iter_pages(self, start_page: Optional[int] = None,
+                   end_page: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Yield (page_num, section) in file order, optionally limited to a page range"""
+        for page_num in self._order:
+            if (start_page is None or page_num >= start_page) and (end_page is None or page_num <= end_page):
+                yield page_num, self.get_page(page_num)
+
+    def close(self) -> None:
+        """Unmap and close the file"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
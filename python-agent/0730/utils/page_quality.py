@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Cheap quality heuristics for page markdown produced by a vision model
+"""
+
+import re
+from typing import List, Optional
+
+from PIL import Image
+
+
+# Phrases that indicate the model refused or failed instead of transcribing
+REFUSAL_PATTERNS = [
+    r"\bI'?m sorry\b",
+    r"\bI (?:cannot|can't|am unable to)\b",
+    r"\bunable to (?:read|process|recognize|extract)\b",
+    r"\bas an AI\b",
+    r"抱歉",
+    r"无法(?:识别|处理|读取|提取|看清)",
+    r"不能(?:识别|处理|读取)",
+]
+
+_REFUSAL_RE = re.compile("|".join(REFUSAL_PATTERNS), re.IGNORECASE)
+_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+
+class PageQualityChecker:
+    """Score page markdown with cheap heuristics to decide on escalation"""
+
+    def __init__(self,
+                 refusal_max_chars: int = 300,
+                 dense_ink_ratio: float = 0.04,
+                 min_chars_for_dense_page: int = 200):
+        """
+        Initialize the quality checker
+
+        Args:
+            refusal_max_chars: Only outputs shorter than this are checked for refusals,
+                so documents that merely quote such phrases are not flagged
+            dense_ink_ratio: Fraction of dark pixels above which a page counts as text dense
+            min_chars_for_dense_page: Minimum output length expected for a dense page
+        """
+        self.refusal_max_chars = refusal_max_chars
+        self.dense_ink_ratio = dense_ink_ratio
+        self.min_chars_for_dense_page = min_chars_for_dense_page
+
+    def check(self, content: Optional[str], image_path: Optional[str] = None) -> List[str]:
+        """
+        Check page markdown for signs of a low-quality conversion
+
+        Args:
+            content: Markdown returned by the model
+            image_path: Path to the page image, used for the text density check
+
+        Returns:
+            List of issue names (empty if the page looks fine)
+        """
+        text = (content or "").strip()
+        if not text:
+            return ['empty_output']
+
+        issues = []
+        if len(text) < self.refusal_max_chars and _REFUSAL_RE.search(text):
+            issues.append('refusal')
+        if has_broken_table(text):
+            issues.append('broken_table')
+        if image_path is not None and len(text) < self.min_chars_for_dense_page:
+            try:
+                if estimate_ink_ratio(image_path) >= self.dense_ink_ratio:
+                    issues.append('too_short_for_page')
+            except OSError:
+                pass
+        return issues
+
+
+def has_broken_table(text: str) -> bool:
+    """
+    Check markdown tables for a missing separator row or inconsistent column counts
+
+    Args:
+        text: Markdown text
+
+    Returns:
+        True if any table looks malformed
+    """
+    table: List[str] = []
+    for line in text.splitlines() + [""]:
+        stripped = line.strip()
+        if stripped.startswith("|"):
+            table.append(stripped)
+            continue
+        if len(table) >= 2 and _is_broken_table(table):
+            return True
+        table = []
+    return False
+
+
+def _is_broken_table(rows: List[str]) -> bool:
+    """Check a single block of table rows"""
+    if not _TABLE_SEPARATOR_RE.match(rows[1]):
+        return True
+    widths = {len(row.strip("|").split("|")) for row in rows}
+    return len(widths) > 1
+
+
+def estimate_ink_ratio(image_path: str, threshold: int = 128, thumb_size: int = 256) -> float:
+    """
+    Estimate how much of a page is covered by ink
+
+    Args:
+        image_path: Path to the page image
+        threshold: Gray level below which a pixel counts as ink
+        thumb_size: Longest side of the thumbnail used for the estimate
+
+    Returns:
+        Fraction of dark pixels between 0 and 1
+    """
+    with Image.open(image_path) as img:
+        gray = img.convert("L")
+        gray.thumbnail((thumb_size, thumb_size))
+        histogram = gray.histogram()
+    total = sum(histogram)
+    return sum(histogram[:threshold]) / total if total else 0.0
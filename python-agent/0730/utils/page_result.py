@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Compact page result records and lazily combined conversion results
+"""
+
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+@dataclass(slots=True)
+class PageResult:
+    """
+    Result of converting a single page.
+
+    Slotted to keep per-page overhead small on large batches. Supports
+    read-only dict-style access (result['content'], result.get('error'))
+    so code written against the former per-page dicts keeps working;
+    optional fields that are None behave like missing keys.
+    """
+
+    page_num: int
+    content: str
+    status: str
+    image_path: Optional[str] = None
+    error: Optional[str] = None
+    model_id: Optional[str] = None
+    escalated: Optional[bool] = None
+    quality_issues: Optional[List[str]] = None
+    ttft_seconds: Optional[float] = None
+    output_tokens: Optional[int] = None
+    truncated: Optional[bool] = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_NAMES:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key not in _REQUIRED_FIELDS:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return key in _FIELD_NAMES and (key in _REQUIRED_FIELDS or getattr(self, key) is not None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a field like dict.get"""
+        return self[key] if key in self else default
+
+    def keys(self) -> List[str]:
+        """Get the names of the fields that are set"""
+        return [name for name in _FIELD_NAMES if name in self]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dict containing only the fields that are set"""
+        return {name: getattr(self, name) for name in self.keys()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PageResult":
+        """Build a page result from a dict, ignoring unknown keys"""
+        return cls(**{k: v for k, v in data.items() if k in _FIELD_NAMES})
+
+
+_FIELD_NAMES = tuple(f.name for f in fields(PageResult))
+_REQUIRED_FIELDS = frozenset(('page_num', 'content', 'status'))
+
+
+class ConversionResult(dict):
+    """
+    Conversion result whose 'combined_markdown' is built on demand.
+
+    The combined document is not stored, so page content is held only once
+    (in 'results'); every access to result['combined_markdown'] rebuilds it.
+    Use iter_markdown() to stream the document without building the string.
+    """
+
+    def __init__(self, *args,
+                 combine: Optional[Callable[[List[PageResult]], str]] = None,
+                 format_page: Optional[Callable[[PageResult], str]] = None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self._combine = combine
+        self._format_page = format_page
+
+    def __missing__(self, key: str) -> Any:
+        if key == 'combined_markdown' and self._combine is not None:
+            return self._combine(self['results'])
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return super().__contains__(key) or (key == 'combined_markdown' and self._combine is not None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def iter_markdown(self) -> Iterator[str]:
+        """Yield the combined markdown page by page ("".join() gives combined_markdown)"""
+        if self._format_page is None:
+            yield self['combined_markdown']
+            return
+        for index, result in enumerate(self.get('results', [])):
+            yield ("\n" if index else "") + self._format_page(result)
+
+    def write_markdown(self, path: str) -> str:
+        """
+        Write the combined markdown to a file, page by page, with a page offset index
+
+        The sidecar index (<path>.pages.json) maps each page to its byte range,
+        so PagedMarkdownReader can return single pages without loading the file.
+
+        Args:
+            path: Output markdown file
+
+        Returns:
+            Path of the sidecar index
+        """
+        if self._format_page is None:
+            raise ValueError("Page sections are not available for this result")
+        # Imported here: page_offsets is only needed when writing files
+        from utils.page_offsets import write_paged_markdown
+        return write_paged_markdown(
+            path, ((result['page_num'], self._format_page(result)) for result in self.get('results', []))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a plain dict with page results and combined markdown materialized"""
+        data = dict(self)
+        if 'results' in data:
+            data['results'] = [r.to_dict() if isinstance(r, PageResult) else r for r in data['results']]
+        if 'combined_markdown' in self:
+            data['combined_markdown'] = self['combined_markdown']
+        return data
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+Tenant-fair, priority and deadline aware scheduler for page conversion tasks
+"""
+
+import math
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.tenant_quota import DEFAULT_TENANT, TenantQuota, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class _PageTask:
+    """A queued page task"""
+
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'job_id', 'deadline', 'tenant', 'submitted_at')
+
+    def __init__(self, fn, args, kwargs, job_id, deadline, tenant):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.job_id = job_id
+        self.deadline = deadline
+        self.tenant = tenant
+        self.submitted_at = time.time()
+
+
+class _TenantState:
+    """Queue, quota and usage of one tenant"""
+
+    __slots__ = ('quota', 'heap', 'bucket', 'running', 'finish_tag', 'usage')
+
+    def __init__(self, quota: TenantQuota):
+        self.quota = quota
+        self.heap: List[tuple] = []
+        self.bucket = TokenBucket.for_quota(quota)
+        self.running = 0
+        self.finish_tag = 0.0
+        self.usage = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+            'queue_wait_seconds': 0.0, 'run_seconds': 0.0,
+        }
+
+
+class PageScheduler:
+    """
+    Shared worker pool that runs page tasks fairly across tenants, then by
+    priority and deadline within a tenant.
+
+    Workers pick the next tenant by weighted fair queueing (start-time fair
+    queueing, one unit of cost per page), so a tenant with weight 2 gets
+    twice the pages of a tenant with weight 1 while both have work queued,
+    and one tenant's bulk job cannot hold every worker. Tenants may also be
+    limited to a page rate (token bucket) and a number of pages in flight.
+
+    Within a tenant, tasks with a higher priority are always dequeued before
+    lower priority ones, so a newly submitted interactive job overtakes the
+    queued pages of a running backfill (pages already in flight are not
+    interrupted). Within a priority level tasks run earliest-deadline-first,
+    then FIFO. When a task's deadline cannot be met given the observed task
+    duration, the remaining pages of its job are cancelled.
+
+    Tasks at or above urgent_priority (interactive previews, for instance)
+    run ahead of every tenant's ordinary pages, highest priority first. The
+    tenant's rate and concurrency limits still apply, and the pages are
+    charged to its fair share, so its other pages wait longer afterwards.
+    """
+
+    def __init__(self,
+                 max_workers: int = 10,
+                 duration_alpha: float = 0.2,
+                 tenant_quotas: Optional[Dict[str, TenantQuota]] = None,
+                 default_quota: Optional[TenantQuota] = None,
+                 urgent_priority: Optional[int] = None):
+        """
+        Initialize the page scheduler
+
+        Args:
+            max_workers: Number of worker threads shared by all jobs
+            duration_alpha: Smoothing factor for the task duration estimate
+            tenant_quotas: Quotas by tenant
+            default_quota: Quota of tenants without one (unlimited, weight 1 by default)
+            urgent_priority: Priority from which tasks run before other tenants'
+                pages (None applies fair sharing to all tasks)
+        """
+        self.max_workers = max_workers
+        self.urgent_priority = urgent_priority
+        self.duration_alpha = duration_alpha
+        self.default_quota = default_quota or TenantQuota()
+        self._tenants: Dict[str, _TenantState] = {}
+        self._virtual_time = 0.0
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+        self._avg_duration: Optional[float] = None
+        self._cancelled_jobs: Dict[str, str] = {}
+        for tenant, quota in (tenant_quotas or {}).items():
+            self.set_tenant_quota(tenant, quota)
+
+    def _ensure_workers(self) -> None:
+        """Start worker threads on first use"""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"page-scheduler-{len(self._workers)}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _tenant(self, tenant: str) -> _TenantState:
+        """Get the state of a tenant, creating it with the default quota (lock held)"""
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = _TenantState(self.default_quota)
+        return state
+
+    def set_tenant_quota(self, tenant: str, quota: TenantQuota) -> None:
+        """
+        Set the quota of a tenant
+
+        Args:
+            tenant: Tenant identifier
+            quota: Weight, page rate and concurrency limit of the tenant
+        """
+        with self._cond:
+            state = self._tenant(tenant)
+            state.quota = quota
+            state.bucket = TokenBucket.for_quota(quota)
+            self._cond.notify_all()
+
+    def submit(self,
+               fn: Callable[..., Any],
+               *args,
+               job_id: Optional[str] = None,
+               priority: int = 0,
+               deadline: Optional[float] = None,
+               tenant: Optional[str] = None,
+               **kwargs) -> Future:
+        """
+        Submit a page task
+
+        Args:
+            fn: Callable to run
+            job_id: Identifier of the job the task belongs to
+            priority: Higher values run first within the tenant (and across
+                tenants from urgent_priority on)
+            deadline: Absolute time (time.time()) by which the job must finish
+            tenant: Tenant the task is accounted to (DEFAULT_TENANT if not given)
+
+        Returns:
+            Future for the task result
+        """
+        tenant = tenant or DEFAULT_TENANT
+        task = _PageTask(fn, args, kwargs, job_id, deadline, tenant)
+        key = (-priority, deadline if deadline is not None else math.inf, next(self._counter))
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a scheduler that has been shut down")
+            self._ensure_workers()
+            state = self._tenant(tenant)
+            if not state.heap:
+                # A tenant that was idle starts at the current virtual time
+                state.finish_tag = max(state.finish_tag, self._virtual_time)
+            heapq.heappush(state.heap, (key, task))
+            state.usage['submitted'] += 1
+            self._cond.notify()
+        return task.future
+
+    def cancel_job(self, job_id: str, reason: str = "cancelled") -> int:
+        """
+        Cancel all queued tasks of a job
+
+        Args:
+            job_id: Identifier of the job
+            reason: Reason recorded for the cancellation
+
+        Returns:
+            Number of tasks cancelled
+        """
+        with self._cond:
+            self._cancelled_jobs[job_id] = reason
+            cancelled = []
+            for state in self._tenants.values():
+                remaining = []
+                for entry in state.heap:
+                    if entry[1].job_id == job_id:
+                        cancelled.append(entry[1])
+                        state.usage['cancelled'] += 1
+                    else:
+                        remaining.append(entry)
+                if len(remaining) != len(state.heap):
+                    heapq.heapify(remaining)
+                    state.heap = remaining
+        for task in cancelled:
+            self._cancel_task(task)
+        if cancelled:
+            logger.info(f"Cancelled {len(cancelled)} queued pages of job {job_id}: {reason}")
+        return len(cancelled)
+
+    def get_cancel_reason(self, job_id: str) -> Optional[str]:
+        """Get the reason a job was cancelled, if it was"""
+        with self._cond:
+            return self._cancelled_jobs.get(job_id)
+
+    def forget_job(self, job_id: str) -> None:
+        """Drop bookkeeping for a finished job"""
+        with self._cond:
+            self._cancelled_jobs.pop(job_id, None)
+
+    def estimated_task_seconds(self) -> Optional[float]:
+        """Get the smoothed duration of recent tasks"""
+        with self._cond:
+            return self._avg_duration
+
+    def queued_tasks(self) -> int:
+        """Get the number of tasks waiting to run"""
+        with self._cond:
+            return sum(len(state.heap) for state in self._tenants.values())
+
+    def get_tenant_usage(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get usage counters per tenant
+
+        Args:
+            tenant: Only report this tenant
+
+        Returns:
+            Counters (submitted, completed, failed, cancelled, queued, running,
+            queue/run seconds) by tenant, or of one tenant if given
+        """
+        with self._cond:
+            usage = {
+                name: dict(state.usage, queued=len(state.heap), running=state.running,
+                           weight=state.quota.weight)
+                for name, state in self._tenants.items()
+                if tenant is None or name == tenant
+            }
+        if tenant is not None:
+            return usage.get(tenant, {})
+        return usage
+
+    @staticmethod
+    def _cancel_task(task: _PageTask) -> None:
+        """Cancel a queued task and wake anyone waiting on it"""
+        # cancel() alone does not notify as_completed()/wait() waiters
+        if task.future.cancel():
+            task.future.set_running_or_notify_cancel()
+
+    def _deadline_unreachable(self, task: _PageTask) -> bool:
+        """Check whether a task can no longer finish before its deadline"""
+        if task.deadline is None:
+            return False
+        expected = self._avg_duration or 0.0
+        return time.time() + expected > task.deadline
+
+    def _next_task(self):
+        """
+        Dequeue the next task by weighted fair queueing across eligible tenants,
+        urgent tasks first (lock held)
+
+        Returns:
+            Tuple of (task or None, unreachable flag, seconds until a rate-limited
+            tenant may run again or None to wait for a notification)
+        """
+        now = time.monotonic()
+        best = None
+        urgent = None
+        retry_in = None
+        for state in self._tenants.values():
+            if not state.heap:
+                continue
+            quota = state.quota
+            if quota.max_concurrent is not None and state.running >= quota.max_concurrent:
+                continue
+            if state.bucket is not None:
+                delay = state.bucket.delay(now)
+                if delay > 0:
+                    retry_in = delay if retry_in is None else min(retry_in, delay)
+                    continue
+            key = state.heap[0][0]
+            if self.urgent_priority is not None and -key[0] >= self.urgent_priority:
+                if urgent is None or key < urgent.heap[0][0]:
+                    urgent = state
+            if best is None or state.finish_tag < best.finish_tag:
+                best = state
+        if best is None:
+            return None, False, retry_in
+        # Fair order sets the virtual time; urgent pages are only charged to their tenant
+        fair = urgent is None
+        best = urgent or best
+
+        _, task = heapq.heappop(best.heap)
+        if self._deadline_unreachable(task):
+            # Cancelled without using the tenant's quota
+            best.usage['cancelled'] += 1
+            return task, True, None
+        if best.bucket is not None:
+            best.bucket.take(now)
+        best.running += 1
+        if fair:
+            self._virtual_time = best.finish_tag
+        best.finish_tag += 1.0 / best.quota.weight
+        best.usage['queue_wait_seconds'] += time.time() - task.submitted_at
+        return task, False, None
+
+    def _worker_loop(self) -> None:
+        """Run queued tasks until the scheduler is shut down"""
+        while True:
+            with self._cond:
+                while True:
+                    task, unreachable, retry_in = self._next_task()
+                    if task is not None:
+                        break
+                    if self._shutdown and not any(state.heap for state in self._tenants.values()):
+                        return
+                    self._cond.wait(retry_in)
+
+            if unreachable:
+                self._cancel_task(task)
+                if task.job_id is not None:
+                    self.cancel_job(task.job_id, reason="deadline exceeded")
+                continue
+
+            if not task.future.set_running_or_notify_cancel():
+                self._task_done(task, None, 'cancelled')
+                continue
+
+            start = time.time()
+            try:
+                result = task.fn(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.future.set_exception(e)
+                outcome = 'failed'
+            else:
+                task.future.set_result(result)
+                outcome = 'completed'
+            self._task_done(task, time.time() - start, outcome)
+
+    def _task_done(self, task: _PageTask, duration: Optional[float], outcome: str) -> None:
+        """Release the tenant's slot and update usage and the duration estimate"""
+        with self._cond:
+            state = self._tenants[task.tenant]
+            state.running -= 1
+            state.usage[outcome] += 1
+            if duration is not None:
+                state.usage['run_seconds'] += duration
+                if self._avg_duration is None:
+                    self._avg_duration = duration
+                else:
+                    self._avg_duration += self.duration_alpha * (duration - self._avg_duration)
+            # A concurrency slot freed up
+            self._cond.notify_all()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting tasks and let workers drain the queue
+
+        Args:
+            wait: Whether to wait for worker threads to exit
+        """
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
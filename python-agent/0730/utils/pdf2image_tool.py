@@ -6,12 +6,27 @@ import datetime
 import requests
 from PIL import Image
 import io
+import json
+import threading
 
 from utils.file_downloader_tool import FileDownloaderTool
+from utils.image_preprocessor import ImagePreprocessor
+from utils.memory_governor import get_memory_governor, estimate_raster_bytes
+from utils.page_fingerprint import page_fingerprint
 
 # PDF 文件转换为图片工具
 class pdf2imageTool:
-    def __init__(self, base_storage_path = None, quality = 75):
+    # 支持的输出图片格式及文件后缀
+    # Supported output image formats and their file extensions
+    IMAGE_FORMATS = {'jpeg': 'jpg', 'png': 'png'}
+
+    # 默认内存打开阈值：不超过该大小的 PDF 直接在内存中打开，不落盘
+    # PDFs up to this size are opened from memory instead of a file
+    DEFAULT_IN_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, base_storage_path = None, quality = 80, dpi = 72, image_format = 'jpeg',
+                 in_memory_max_bytes = DEFAULT_IN_MEMORY_MAX_BYTES, preprocessor = None,
+                 memory_governor = None):
         # if base_path is None
         if base_storage_path is None:
             self.base_path = 'storage'
@@ -22,26 +37,73 @@ class pdf2imageTool:
         # Set image quality
         self.quality = quality
 
+        # Set render resolution (72 dpi is the pixmap default) and output format
+        self.dpi = dpi
+        image_format = image_format.lower()
+        if image_format == 'jpg':
+            image_format = 'jpeg'
+        if image_format not in self.IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.image_format = image_format
+
+        # Size threshold for in-memory opening (0 disables it)
+        self.in_memory_max_bytes = in_memory_max_bytes
+
+        # Optional preprocessing (margin cropping, grayscale/bitonal) of rendered pages
+        self.preprocessor = preprocessor
+
+        # Preprocessing results of pages rendered or reused by this instance, by image path
+        self.preprocess_stats = {}
+        self._stats_lock = threading.Lock()
+
+        # Byte budget for rasters being rendered (process-wide by default)
+        self.memory_governor = memory_governor or get_memory_governor()
+
+    # 渲染参数标识，用于区分同一文档不同参数下的渲染结果
+    # Key identifying the render settings, part of the cache folder path
+    def render_settings_key(self):
+        key = f"dpi{self.dpi}_q{self.quality}_{self.image_format}"
+        if self.preprocessor is not None:
+            key += '_' + self.preprocessor.settings_key()
+        return key
+
+    # 汇总预处理节省的字节数（包括复用渲染缓存的页面）
+    # Sum up preprocessing savings for the given pages, including pages reused from the render cache
+    def get_preprocess_summary(self, image_paths):
+        with self._stats_lock:
+            stats = [self.preprocess_stats[p] for p in image_paths if p in self.preprocess_stats]
+        return {
+            'preprocessed_pages': len(stats),
+            'original_bytes': sum(s['original_bytes'] for s in stats),
+            'output_bytes': sum(s['output_bytes'] for s in stats),
+            'bytes_saved': sum(s['bytes_saved'] for s in stats),
+            'color_modes': {mode: sum(1 for s in stats if s['color_mode'] == mode)
+                            for mode in sorted({s['color_mode'] for s in stats})},
+        }
+
+    # 渲染缓存目录：按文档摘要 + 渲染参数寻址，与日期无关
+    # Render cache folder addressed by document digest and render settings,
+    # so the same PDF converted on different days reuses its pages
+    def get_render_folder(self, pdf_md5):
+        return os.path.join(self.base_path, 'pdf2images', pdf_md5, self.render_settings_key())
+
     # 从 pdf url 下载 pdf 文件并转换为图片
     # Convert pdf to images from url
-    def convert_pdf_to_images_from_url(self, pdf_url, start_page=1, end_page=None):
-        # 1. Download pdf file from pdf url and save to temp folder
-        # 从pdf url下载pdf文件并保存到临时文件夹
+    def convert_pdf_to_images_from_url(self, pdf_url, start_page=1, end_page=None, cancel_token=None):
+        # 1. Download pdf file from pdf url; small files stay in memory,
+        #    larger ones are saved to the downloads folder
+        # 从pdf url下载pdf文件；小文件保留在内存中，大文件保存到下载目录
         today = datetime.date.today()
         date_path = today.strftime('%Y/%m/%d')
         temp_folder_path = os.path.join(self.base_path, 'downloads', date_path)
-        os.makedirs(temp_folder_path, exist_ok=True)
 
-        temp_name = str(uuid.uuid4())[:8] + '.pdf'
-        pdf_path = os.path.join(temp_folder_path, temp_name)
-
-        # Download pdf file from url
-        # 从url下载pdf文件
-        file_downloader_tool = FileDownloaderTool()
-        pdf_path = file_downloader_tool.download_pdf(pdf_url)
+        file_downloader_tool = FileDownloaderTool(temp_folder_path)
+        pdf_bytes, pdf_path = file_downloader_tool.fetch_pdf(pdf_url, self.in_memory_max_bytes)
 
         # 2. Convert pdf to images
-        return self.convert_pdf_to_images(pdf_path, start_page, end_page)
+        if pdf_bytes is not None:
+            return self.convert_pdf_bytes_to_images(pdf_bytes, start_page, end_page, cancel_token)
+        return self.convert_pdf_to_images(pdf_path, start_page, end_page, cancel_token)
 
     # Download pdf file from url
     def download_pdf(self, pdf_url, pdf_path):
@@ -55,22 +117,99 @@ class pdf2imageTool:
             print(f"Error downloading PDF: {e}")
             raise Exception(f"Error downloading PDF: {e}")
 
-    # Convert pdf to images
-    def convert_pdf_to_images(self, pdf_path, start_page=1, end_page=None):
-        images = []
-        doc = fitz.open(pdf_path)
-        today = datetime.date.today()
+    # 获取 pdf 页数
+    # Get the number of pages of a pdf (a file path, or pdf data held in memory)
+    def get_page_count(self, pdf_path):
+        if isinstance(pdf_path, (bytes, bytearray, memoryview)):
+            doc = fitz.open(stream=pdf_path, filetype='pdf')
+        else:
+            doc = fitz.open(pdf_path)
+        with doc:
+            return len(doc)
 
-        # Calcuate pdf file md5
-        pdf_md5 = FileDownloaderTool().calculate_file_md5(pdf_path)
+    # Convert pdf to images; rendering stops early once cancel_token is cancelled.
+    # pages optionally limits rendering to the given page numbers of the range
+    def convert_pdf_to_images(self, pdf_path, start_page=1, end_page=None, cancel_token=None, pages=None):
+        doc, pdf_md5 = self._open_pdf(pdf_path)
+        try:
+            return self._render_pages(doc, pdf_md5, start_page, end_page, cancel_token, pages)
+        finally:
+            doc.close()
 
-        # Generate image folder
-        date_path = today.strftime('%Y/%m/%d')
-        folder_path = f"{self.base_path}/pdf2images/{date_path}/{pdf_md5}"
+    # 计算每页内容指纹（基于内容流和资源，无需渲染）
+    # Fingerprint each page of the range from its content streams and
+    # resources, without rendering; returns {page_num: fingerprint}
+    def get_page_fingerprints(self, pdf_path, start_page=1, end_page=None):
+        with fitz.open(pdf_path) as doc:
+            start_page, end_page = self._page_range(doc, start_page, end_page)
+            return {page_num + 1: page_fingerprint(doc, doc.load_page(page_num))
+                    for page_num in range(start_page - 1, end_page)}
 
-        # Generate image temp folder
-        os.makedirs(folder_path, exist_ok=True)
+    # 从内存中的 pdf 数据（如上传文件）转换为图片，不写临时文件
+    # Convert pdf held in memory (e.g. an upload) to images without a temp file
+    def convert_pdf_bytes_to_images(self, pdf_bytes, start_page=1, end_page=None, cancel_token=None):
+        pdf_md5 = FileDownloaderTool.calculate_bytes_md5(pdf_bytes)
+        doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+        try:
+            return self._render_pages(doc, pdf_md5, start_page, end_page, cancel_token)
+        finally:
+            doc.close()
+
+    # 版面分析：文字区域本地提取，只渲染表格和图片区域
+    # Analyze page layouts: text regions are extracted locally and only
+    # table/figure regions are rendered (whole pages when the analyzer asks for it)
+    def render_layout_plans(self, pdf_path, layout_analyzer, start_page=1, end_page=None, cancel_token=None):
+        doc, pdf_md5 = self._open_pdf(pdf_path)
+        try:
+            start_page, end_page = self._page_range(doc, start_page, end_page)
+            page_folder = self.get_render_folder(pdf_md5)
+            region_folder = os.path.join(page_folder, 'regions_' + layout_analyzer.settings_key())
+            os.makedirs(region_folder, exist_ok=True)
+            ext = self.IMAGE_FORMATS[self.image_format]
+
+            plans = []
+            for page_num in range(start_page - 1, end_page):
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+                page = doc.load_page(page_num)
+                plan = layout_analyzer.analyze(page)
+                if plan.needs_full_page:
+                    plan.full_page_image = os.path.join(page_folder, f"page_{page_num + 1:03d}.{ext}")
+                    if self._render_page(page, plan.full_page_image, cancel_token=cancel_token) is None:
+                        break
+                else:
+                    for index, region in enumerate(plan.regions):
+                        if region.kind != 'text':
+                            region.image_path = os.path.join(
+                                region_folder, f"page_{page_num + 1:03d}_region_{index:02d}.{ext}"
+                            )
+                            self._render_page(page, region.image_path, clip=fitz.Rect(region.bbox),
+                                              cancel_token=cancel_token)
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+                plans.append(plan)
+            return plans
+        finally:
+            doc.close()
+
+    # Open a pdf and hash it; small files are read once and both hashed
+    # and opened from that buffer
+    def _open_pdf(self, pdf_path):
+        if os.path.getsize(pdf_path) <= self.in_memory_max_bytes:
+            with open(pdf_path, 'rb') as f:
+                pdf_bytes = f.read()
+            return fitz.open(stream=pdf_bytes, filetype='pdf'), FileDownloaderTool.calculate_bytes_md5(pdf_bytes)
+
+        doc = fitz.open(pdf_path)
+        try:
+            # Calcuate pdf file md5
+            return doc, FileDownloaderTool().calculate_file_md5(pdf_path)
+        except Exception:
+            doc.close()
+            raise
 
+    # Clamp a 1-based page range to the document
+    def _page_range(self, doc, start_page=1, end_page=None):
         # Adjust the end page if not provided or out of range
         if end_page is None or end_page < 1 or end_page > len(doc):
             end_page = len(doc)
@@ -78,45 +217,115 @@ class pdf2imageTool:
         # Adjust the start page if out of range
         if start_page is None or start_page < 1:
             start_page = 1
-        # Adjust the start page if out of range
-        if start_page < 1:
-            start_page = 1
 
         # Ensure start_page and end_page are within the document's range
         start_page = max(1, min(start_page, len(doc)))
         end_page = max(1, min(end_page, len(doc)))
+        return start_page, end_page
 
-        for page_num in range(start_page - 1, end_page):
-            try:
-                page = doc.load_page(page_num)
-                # Generate unique file name
-                output_image_format = 'page_{:03d}.jpg'
-                image_path = os.path.join(folder_path, output_image_format.format(page_num + 1))
+    # Render the page range of an open document into its render cache folder,
+    # returning the pages rendered so far if cancel_token is cancelled
+    def _render_pages(self, doc, pdf_md5, start_page=1, end_page=None, cancel_token=None, pages=None):
+        images = []
 
-                # # Generate the image
-                # pix = page.get_pixmap(matrix=fitz.Matrix(3.5, 3.5))
-                # # Save the image with specified quality
-                # pix.save(image_path, "jpeg", quality=50)
-                # images.append(image_path)
-                 # Generate the image
+        # Generate image folder
+        folder_path = self.get_render_folder(pdf_md5)
 
-                # pix = page.get_pixmap(matrix=fitz.Matrix(3.5, 3.5))
-                pix = page.get_pixmap()
+        # Generate image temp folder
+        os.makedirs(folder_path, exist_ok=True)
 
-                # Convert pixmap to PIL Image
-                img = Image.open(io.BytesIO(pix.tobytes("ppm")))
+        start_page, end_page = self._page_range(doc, start_page, end_page)
 
-                # Convert to grayscale
-                # img = img.convert("L")
+        for page_num in range(start_page - 1, end_page):
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            if pages is not None and page_num + 1 not in pages:
+                continue
+            try:
+                # Generate unique file name
+                output_image_format = 'page_{:03d}.' + self.IMAGE_FORMATS[self.image_format]
+                image_path = os.path.join(folder_path, output_image_format.format(page_num + 1))
 
-                # Save the image with specified quality
-                img.save(image_path, "JPEG", quality=80)
+                if self._render_page(doc.load_page(page_num), image_path, cancel_token=cancel_token) is None:
+                    break
                 images.append(image_path)
 
             except IndexError:
                 print(f"Page {page_num + 1} is out of range.")
                 break
 
-        doc.close()
-
         return images
+
+    # Render a page (or the clip rectangle of a page) to an image file;
+    # returns None if cancel_token is cancelled while waiting for memory
+    def _render_page(self, page, image_path, clip=None, cancel_token=None):
+        # Reuse the image if it was already rendered with the same settings
+        if os.path.exists(image_path) and os.path.getsize(image_path) > 0:
+            self._load_preprocess_stats(image_path)
+            return image_path
+
+        # Wait until the raster fits in the memory budget
+        rect = fitz.Rect(clip) if clip is not None else page.rect
+        raster_bytes = estimate_raster_bytes(int(rect.width * self.dpi / 72) + 1,
+                                             int(rect.height * self.dpi / 72) + 1)
+        if not self.memory_governor.acquire(raster_bytes, cancel_token=cancel_token):
+            return None
+        try:
+            return self._render_image(page, image_path, clip)
+        finally:
+            self.memory_governor.release(raster_bytes)
+
+    def _render_image(self, page, image_path, clip=None):
+        # Generate the image
+        pix = page.get_pixmap(dpi=self.dpi, clip=clip)
+
+        # Convert pixmap to PIL Image
+        img = Image.open(io.BytesIO(pix.tobytes("ppm")))
+        del pix
+
+        # Crop margins and drop color from text pages
+        info = None
+        if self.preprocessor is not None:
+            original_bytes = None
+            if self.preprocessor.report_savings:
+                original_bytes = ImagePreprocessor.encoded_size(img, self.image_format, self.quality)
+            img, info = self.preprocessor.process(img, self.image_format)
+
+        # Save to a temp file first so a partially written page is never reused
+        temp_path = f"{image_path}.{uuid.uuid4().hex[:8]}.tmp"
+        if self.image_format == 'jpeg':
+            img.save(temp_path, "JPEG", quality=self.quality)
+        else:
+            img.save(temp_path, "PNG")
+        os.replace(temp_path, image_path)
+
+        if info is not None:
+            output_bytes = os.path.getsize(image_path)
+            info['output_bytes'] = output_bytes
+            info['original_bytes'] = original_bytes if original_bytes is not None else output_bytes
+            info['bytes_saved'] = info['original_bytes'] - output_bytes
+            with self._stats_lock:
+                self.preprocess_stats[image_path] = info
+            # Kept next to the image so reruns that hit the cache report it too
+            stats_path = self._preprocess_stats_path(image_path)
+            temp_path = f"{stats_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+            os.replace(temp_path, stats_path)
+        return image_path
+
+    @staticmethod
+    def _preprocess_stats_path(image_path):
+        return image_path + '.preprocess.json'
+
+    # Load the preprocessing result saved when a cached page was rendered
+    def _load_preprocess_stats(self, image_path):
+        if self.preprocessor is None:
+            return
+        try:
+            with open(self._preprocess_stats_path(image_path), 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._stats_lock:
+            self.preprocess_stats[image_path] = info
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Hedged requests for cutting tail latency on slow model calls
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Any, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 10):
+        """
+        Initialize the latency tracker
+
+        Args:
+            window: Number of most recent latencies to keep
+            min_samples: Minimum samples before a percentile is reported
+        """
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Record a call latency in seconds"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Get the latency at the given percentile
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None if there are not enough samples yet
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        # Nearest-rank percentile
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class RequestHedger:
+    """Issue a duplicate request when a call exceeds a latency percentile"""
+
+    def __init__(self,
+                 percentile: float = 95.0,
+                 max_hedge_rate: float = 0.1,
+                 min_samples: int = 10,
+                 window: int = 200,
+                 max_workers: int = 20):
+        """
+        Initialize the request hedger
+
+        Args:
+            percentile: Latency percentile after which a hedge is issued
+            max_hedge_rate: Maximum fraction of calls that may be hedged
+            min_samples: Minimum observed latencies before hedging starts
+            window: Number of recent latencies used for the percentile
+            max_workers: Size of the pool running primary and hedge calls
+        """
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.tracker = LatencyTracker(window=window, min_samples=min_samples)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedges_issued = 0
+        self._hedges_won = 0
+
+    def _timed(self, func: Callable[[], T]) -> Callable[[], T]:
+        """Wrap a call so its latency is recorded once it completes"""
+        def run():
+            start = time.time()
+            result = func()
+            self.tracker.record(time.time() - start)
+            return result
+        return run
+
+    def _try_reserve_hedge(self) -> bool:
+        """Reserve a hedge if the hedge rate cap allows it"""
+        with self._lock:
+            if self._hedges_issued + 1 > self.max_hedge_rate * self._calls:
+                return False
+            self._hedges_issued += 1
+            return True
+
+    def call(self, primary: Callable[[], T], backup: Optional[Callable[[], T]] = None) -> T:
+        """
+        Run a call, hedging it with a duplicate request if it is slow
+
+        Args:
+            primary: Callable performing the request
+            backup: Callable performing the duplicate request (defaults to primary)
+
+        Returns:
+            The result of whichever request succeeds first
+        """
+        if backup is None:
+            backup = primary
+        with self._lock:
+            self._calls += 1
+
+        threshold = self.tracker.percentile(self.percentile)
+        if threshold is None:
+            return self._timed(primary)()
+
+        primary_future = self._executor.submit(self._timed(primary))
+        done, _ = wait([primary_future], timeout=threshold)
+        if done or not self._try_reserve_hedge():
+            return primary_future.result()
+
+        logger.info(f"Call exceeded p{self.percentile:g} latency ({threshold:.2f}s), issuing hedge request")
+        backup_future = self._executor.submit(backup)
+        pending = {primary_future, backup_future}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup_future:
+                        with self._lock:
+                            self._hedges_won += 1
+                    return future.result()
+                if first_error is None:
+                    first_error = future.exception()
+        raise first_error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hedging metrics"""
+        with self._lock:
+            return {
+                'calls': self._calls,
+                'hedges_issued': self._hedges_issued,
+                'hedges_won': self._hedges_won,
+                'hedge_rate': self._hedges_issued / self._calls if self._calls else 0.0,
+                'threshold_seconds': self.tracker.percentile(self.percentile),
+            }
+
+    def shutdown(self) -> None:
+        """Shut down the hedge worker pool without waiting for abandoned calls"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Per-tenant quotas for the shared page scheduler
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+# Tenant of tasks submitted without one
+DEFAULT_TENANT = "default"
+
+
+@dataclass(slots=True)
+class TenantQuota:
+    """Share and limits of one tenant in the shared worker pool"""
+
+    weight: float = 1.0
+    pages_per_minute: Optional[float] = None
+    burst: Optional[int] = None
+    max_concurrent: Optional[int] = None
+
+    def __post_init__(self):
+        if self.weight <= 0:
+            raise ValueError("weight must be positive")
+        if self.pages_per_minute is not None and self.pages_per_minute <= 0:
+            raise ValueError("pages_per_minute must be positive")
+        if self.max_concurrent is not None and self.max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at a constant rate.
+
+    Not thread-safe; the scheduler only uses it under its own lock.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate_per_second: Tokens added per second
+            capacity: Maximum tokens held (the burst size)
+        """
+        self.rate_per_second = rate_per_second
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    @classmethod
+    def for_quota(cls, quota: TenantQuota) -> Optional["TokenBucket"]:
+        """Bucket enforcing a quota's page rate (None without a rate limit)"""
+        if quota.pages_per_minute is None:
+            return None
+        # Default burst: ten seconds' worth of pages
+        burst = quota.burst if quota.burst is not None else quota.pages_per_minute / 6
+        return cls(quota.pages_per_minute / 60.0, burst)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate_per_second
+
+    def take(self, now: Optional[float] = None) -> bool:
+        """Take a token if one is available"""
+        if self.delay(now) > 0:
+            return False
+        self.tokens -= 1.0
+        return True
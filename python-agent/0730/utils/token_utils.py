@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight token estimation without a tokenizer
+
+The heuristic is shared with the repository-level utils package, which this
+package's name shadows, so it is loaded from its file.
+"""
+
+import importlib.util
+from pathlib import Path
+
+_SHARED_PATH = Path(__file__).resolve().parents[3] / "utils" / "token_utils.py"
+_spec = importlib.util.spec_from_file_location("_shared_token_utils", _SHARED_PATH)
+_shared = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_shared)
+
+estimate_tokens = _shared.estimate_tokens
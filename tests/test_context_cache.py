@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the Gemini context cache manager
+"""
+
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+# Add repository root to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from agno.models.google import Gemini
+
+from utils.context_cache import CachedContextGemini, ContextCacheManager, LocalContextCacheBackend
+from utils.session_memory import uncached_model
+
+MODEL_ID = "gemini-2.5-flash"
+
+
+class FakeClock:
+    """Controllable replacement for time.time()"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def request_context(model):
+    """Cached content name sent with the model's next request"""
+    config = model.get_request_params().get("config")
+    return config.cached_content if config is not None else None
+
+
+@pytest.fixture
+def clock():
+    """Patch the clock used by the context cache"""
+    fake = FakeClock()
+    with patch("utils.context_cache.time.time", fake):
+        yield fake
+
+
+class TestContextCacheManager:
+    """Test class for ContextCacheManager"""
+
+    def test_create_and_reuse(self, clock):
+        """Test the same prompt is uploaded once and reused"""
+        backend = LocalContextCacheBackend()
+        manager = ContextCacheManager(backend, ttl_seconds=600, refresh_margin=60)
+
+        first = manager.get_or_create(MODEL_ID, "You are a florist")
+        second = manager.get_or_create(MODEL_ID, "You are a florist")
+
+        assert first.name == second.name
+        assert backend.uploads == 1
+        assert manager.get_or_create(MODEL_ID, "You are a poet").name != first.name
+        assert backend.uploads == 2
+
+    def test_refresh_near_expiry(self, clock):
+        """Test a handle close to expiry gets its TTL extended"""
+        backend = LocalContextCacheBackend()
+        manager = ContextCacheManager(backend, ttl_seconds=600, refresh_margin=60)
+        handle = manager.get_or_create(MODEL_ID, "You are a florist")
+
+        clock.now += 550
+        refreshed = manager.get_or_create(MODEL_ID, "You are a florist")
+
+        assert refreshed.name == handle.name
+        assert refreshed.expires_at == clock.now + 600
+        assert backend.contexts[handle.name]["expires_at"] == clock.now + 600
+        assert backend.uploads == 1
+
+    def test_recreate_after_expiry(self, clock):
+        """Test an expired handle is replaced by a new upload"""
+        backend = LocalContextCacheBackend()
+        manager = ContextCacheManager(backend, ttl_seconds=600, refresh_margin=60)
+        handle = manager.get_or_create(MODEL_ID, "You are a florist")
+
+        clock.now += 700
+        recreated = manager.get_or_create(MODEL_ID, "You are a florist")
+
+        assert recreated.name != handle.name
+        assert backend.uploads == 2
+
+    def test_close_deletes_contexts(self, clock):
+        """Test closing the manager deletes its cached contexts"""
+        backend = LocalContextCacheBackend()
+        manager = ContextCacheManager(backend)
+        manager.get_or_create(MODEL_ID, "You are a florist")
+
+        manager.close()
+
+        assert backend.contexts == {}
+
+
+class TestBuildAgent:
+    """Test class for agents built on a cached context"""
+
+    def test_handle_is_resolved_per_request(self, clock):
+        """Test an agent keeps a live handle after the TTL has passed"""
+        backend = LocalContextCacheBackend()
+        manager = ContextCacheManager(backend, ttl_seconds=600, refresh_margin=60)
+        agent = manager.build_agent(MODEL_ID, description="Florist", instructions=["Be brief"])
+        model = agent.model
+        first = model.cached_content
+
+        assert isinstance(model, CachedContextGemini)
+        assert agent.create_default_system_message is False
+        assert request_context(model) == first
+
+        clock.now += 550
+        assert request_context(model) == first
+        assert backend.contexts[first]["expires_at"] == clock.now + 600
+
+        clock.now += 700
+        current = request_context(model)
+        assert current != first
+        assert current in backend.contexts
+        assert backend.uploads == 2
+
+    def test_small_prompt_falls_back_to_inline_instructions(self, clock):
+        """Test prompts below the cache minimum are sent inline"""
+        backend = LocalContextCacheBackend(min_chars=10 ** 6)
+        manager = ContextCacheManager(backend)
+        agent = manager.build_agent(MODEL_ID, description="Florist")
+
+        assert type(agent.model) is Gemini
+        assert agent.model.cached_content is None
+        assert agent.description == "Florist"
+
+    def test_uncached_model_drops_resolver(self, clock):
+        """Test the uncached copy does not resolve the context again"""
+        manager = ContextCacheManager(LocalContextCacheBackend())
+        model = manager.build_agent(MODEL_ID, description="Florist").model
+
+        copy = uncached_model(model)
+
+        assert copy.cached_content is None and copy.context_resolver is None
+        assert request_context(copy) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
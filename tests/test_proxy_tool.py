@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the proxy pool and its httpx transports
+"""
+
+import os
+import sys
+import time
+import asyncio
+import pytest
+
+import httpx
+
+# Add repository root to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from utils.proxy_tool import AsyncProxyPoolTransport, ProxyPool, ProxyPoolTransport
+
+PROXIES = ["http://proxy-a:8080", "http://proxy-b:8080"]
+API_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+
+def recording_handler(name, calls, status=200):
+    """Mock upstream recording which route served each request"""
+    def handler(request):
+        calls.append(name)
+        return httpx.Response(status, json={"via": name})
+    return handler
+
+
+def failing_handler(name, calls):
+    """Mock proxy that cannot be reached"""
+    def handler(request):
+        calls.append(name)
+        raise httpx.ConnectError("proxy unreachable", request=request)
+    return handler
+
+
+def mock_routes(transport, handlers, direct):
+    """Replace the real proxy transports with mock ones"""
+    transport._transports = {proxy: httpx.MockTransport(h) for proxy, h in handlers.items()}
+    transport._direct = httpx.MockTransport(direct)
+
+
+class TestProxyPool:
+    """Test class for ProxyPool selection"""
+
+    def test_unhealthy_proxy_is_reprobed_after_cooldown(self):
+        """Test a proxy taken out by failures gets one probe request per cooldown and recovers on success"""
+        pool = ProxyPool(PROXIES, failure_threshold=1, recovery_timeout=0.05)
+        pool.record_result(PROXIES[0], ok=False)
+
+        assert pool.select(API_URL) == PROXIES[1]
+        time.sleep(0.06)
+        assert pool.select(API_URL) == PROXIES[0]
+        assert pool.select(API_URL) == PROXIES[1]
+
+        pool.record_result(PROXIES[0], ok=False)
+        time.sleep(0.06)
+        assert pool.select(API_URL) == PROXIES[0]
+        pool.record_result(PROXIES[0], latency=0.1)
+
+        assert pool.get_stats()[0]["healthy"] is True
+
+
+class TestProxyPoolTransport:
+    """Test class for ProxyPoolTransport"""
+
+    def test_rotates_proxies_per_request(self):
+        """Test consecutive requests of one client use different proxies and report latency"""
+        # Mock latencies are noise, so keep both proxies in the fast set
+        pool = ProxyPool(PROXIES, latency_tolerance=1e9)
+        transport = ProxyPoolTransport(pool)
+        calls = []
+        mock_routes(transport, {p: recording_handler(p, calls) for p in PROXIES},
+                    recording_handler("direct", calls))
+
+        with httpx.Client(transport=transport) as client:
+            for _ in range(4):
+                client.get(API_URL)
+
+        assert calls == PROXIES * 2
+        stats = {s["proxy"]: s for s in pool.get_stats()}
+        assert all(stats[p]["requests"] == 2 for p in PROXIES)
+        assert all(stats[p]["latency_seconds"] is not None for p in PROXIES)
+
+    def test_failing_proxy_is_skipped(self):
+        """Test connection failures are recorded and an unhealthy proxy stops being used"""
+        pool = ProxyPool(PROXIES, failure_threshold=2)
+        transport = ProxyPoolTransport(pool)
+        calls = []
+        mock_routes(transport, {PROXIES[0]: failing_handler(PROXIES[0], calls),
+                                PROXIES[1]: recording_handler(PROXIES[1], calls)},
+                    recording_handler("direct", calls))
+
+        with httpx.Client(transport=transport) as client:
+            for _ in range(8):
+                try:
+                    client.get(API_URL)
+                except httpx.ConnectError:
+                    pass
+
+        assert calls.count(PROXIES[0]) == 2
+        assert calls.count(PROXIES[1]) == 6
+        stats = {s["proxy"]: s for s in pool.get_stats()}
+        assert stats[PROXIES[0]]["healthy"] is False
+
+    def test_gateway_error_counts_as_failure(self):
+        """Test a 502 from the proxy is recorded as a failure"""
+        pool = ProxyPool(PROXIES[:1])
+        transport = ProxyPoolTransport(pool)
+        mock_routes(transport, {PROXIES[0]: recording_handler(PROXIES[0], [], status=502)},
+                    recording_handler("direct", []))
+
+        with httpx.Client(transport=transport) as client:
+            assert client.get(API_URL).status_code == 502
+
+        assert pool.get_stats()[0]["consecutive_failures"] == 1
+
+    def test_bypassed_hosts_go_direct(self):
+        """Test local addresses skip the proxies"""
+        pool = ProxyPool(PROXIES)
+        transport = ProxyPoolTransport(pool)
+        calls = []
+        mock_routes(transport, {p: recording_handler(p, calls) for p in PROXIES},
+                    recording_handler("direct", calls))
+
+        with httpx.Client(transport=transport) as client:
+            client.get("http://localhost:8000/health")
+            client.get("http://192.168.1.5/api")
+
+        assert calls == ["direct", "direct"]
+        assert all(s["requests"] == 0 for s in pool.get_stats())
+
+
+class TestAsyncProxyPoolTransport:
+    """Test class for AsyncProxyPoolTransport"""
+
+    def test_rotates_and_records_failures(self):
+        """Test the async transport rotates proxies and records failures"""
+        pool = ProxyPool(PROXIES, failure_threshold=1)
+        transport = AsyncProxyPoolTransport(pool)
+        calls = []
+        transport._transports = {
+            PROXIES[0]: httpx.MockTransport(failing_handler(PROXIES[0], calls)),
+            PROXIES[1]: httpx.MockTransport(recording_handler(PROXIES[1], calls)),
+        }
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport) as client:
+                for _ in range(4):
+                    try:
+                        await client.get(API_URL)
+                    except httpx.ConnectError:
+                        pass
+
+        asyncio.run(run())
+
+        assert calls == [PROXIES[0]] + [PROXIES[1]] * 3
+        assert pool.get_stats()[0]["consecutive_failures"] == 1
+
+
+class TestGeminiClientParams:
+    """Test class for the google-genai client parameters"""
+
+    def test_client_uses_pool_transports(self):
+        """Test a genai Client sends its requests through the pool transports"""
+        from google import genai
+
+        pool = ProxyPool(PROXIES)
+        params = pool.gemini_client_params()
+        client = genai.Client(api_key="test-key", **params)
+
+        api_client = client._api_client
+        assert isinstance(api_client._httpx_client._transport, ProxyPoolTransport)
+        assert isinstance(api_client._async_httpx_client._transport, AsyncProxyPoolTransport)
+        assert api_client._httpx_client._transport.pool is pool
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
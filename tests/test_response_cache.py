@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the exact and semantic response cache
+"""
+
+import os
+import sys
+import pytest
+from unittest.mock import Mock
+
+# Add repository root to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from agno.agent import Agent
+from agno.models.google import Gemini
+from agno.run.response import RunResponse
+
+from utils.context_cache import ContextCacheManager, LocalContextCacheBackend
+from utils.response_cache import (GROUNDED_TTL_SECONDS, CachedAgent, ResponseCache, agent_context_key,
+                                  normalize_prompt)
+
+VOCABULARY = ["flowers", "pink", "purple", "roses", "budget", "story", "horror"]
+
+
+def bag_of_words(text):
+    """Embedding stand-in: word counts over a small vocabulary"""
+    words = text.replace(",", " ").split()
+    return [words.count(w) for w in VOCABULARY] + [0.01]
+
+
+def one_hot(text):
+    """Embedding stand-in giving "prompt N" prompts orthogonal vectors"""
+    vector = [0.0] * 64
+    vector[int(text.split()[-1])] = 1.0
+    return vector
+
+
+class TestResponseCache:
+    """Test class for ResponseCache"""
+
+    def test_exact_hit_after_normalization(self):
+        """Test prompts differing only in case, spacing and punctuation share an entry"""
+        cache = ResponseCache()
+        cache.store("ctx", "Tell me  a story?", "Once upon a time", latency=2.0)
+
+        entry = cache.lookup("ctx", "tell me a story")
+
+        assert entry.content == "Once upon a time"
+        assert cache.lookup("other-ctx", "tell me a story") is None
+        stats = cache.get_stats()
+        assert stats['exact_hits'] == 1 and stats['misses'] == 1
+        assert stats['latency_saved_seconds'] == 2.0
+
+    def test_semantic_hit(self):
+        """Test a similar prompt is answered from the embedding index"""
+        cache = ResponseCache(embed_fn=bag_of_words, similarity_threshold=0.9)
+        cache.store("ctx", "pink purple flowers", "Try roses", latency=1.0)
+
+        assert cache.lookup("ctx", "flowers pink purple please").content == "Try roses"
+        assert cache.lookup("ctx", "horror story") is None
+        assert cache.get_stats()['semantic_hits'] == 1
+
+    def test_expired_entries_miss(self):
+        """Test entries past their TTL are not returned"""
+        cache = ResponseCache(embed_fn=bag_of_words)
+        cache.store("ctx", "pink flowers", "old", latency=1.0, ttl_seconds=-1)
+
+        assert cache.lookup("ctx", "pink flowers") is None
+
+    def test_replaced_entry_is_not_served(self):
+        """Test storing a prompt again replaces its semantic match as well"""
+        cache = ResponseCache(embed_fn=bag_of_words, similarity_threshold=0.9)
+        cache.store("ctx", "pink flowers", "old", latency=1.0)
+        cache.store("ctx", "pink flowers", "new", latency=1.0)
+
+        assert cache.lookup("ctx", "pink flowers please").content == "new"
+
+    def test_full_cache_evicts_least_recently_used(self):
+        """Test live entries are evicted once the cache is full"""
+        cache = ResponseCache(embed_fn=one_hot, max_entries=10)
+        cache.store("ctx", "prompt 0", "answer 0", latency=1.0)
+        for i in range(1, 50):
+            cache.store("ctx", f"prompt {i}", f"answer {i}", latency=1.0)
+            # Keep the first entry in use
+            cache.lookup("ctx", "prompt 0")
+
+        assert cache.get_stats()['entries'] <= 10
+        assert cache.lookup("ctx", "prompt 0").content == "answer 0"
+        assert cache.lookup("ctx", "prompt 49").content == "answer 49"
+        assert cache.lookup("ctx", "prompt 5") is None
+        assert len(cache._semantic["ctx"].entries) <= 10
+
+    def test_embedding_matrix_grows_geometrically(self):
+        """Test the embedding matrix is not reallocated on every store"""
+        cache = ResponseCache(embed_fn=one_hot)
+        capacities = set()
+        for i in range(40):
+            cache.store("ctx", f"prompt {i}", "answer", latency=1.0)
+            capacities.add(len(cache._semantic["ctx"].matrix))
+
+        assert capacities == {16, 32, 64}
+
+    def test_persistent_cache_survives_restart(self, tmp_path):
+        """Test entries and embeddings stored by one process are served to the next"""
+        path = str(tmp_path / "cache" / "responses.jsonl")
+        first = ResponseCache(embed_fn=bag_of_words, similarity_threshold=0.9, path=path)
+        first.store("ctx", "pink purple flowers", "Try roses", latency=2.0)
+
+        second = ResponseCache(embed_fn=bag_of_words, similarity_threshold=0.9, path=path)
+
+        assert second.lookup("ctx", "Pink purple flowers?").content == "Try roses"
+        assert second.lookup("ctx", "flowers pink purple please").content == "Try roses"
+        assert second.get_stats()['latency_saved_seconds'] == 4.0
+
+    def test_persistent_cache_drops_dead_entries(self, tmp_path):
+        """Test expired and replaced entries are left out when the file is loaded"""
+        path = str(tmp_path / "responses.jsonl")
+        cache = ResponseCache(path=path)
+        cache.store("ctx", "old news", "stale", latency=1.0, ttl_seconds=-1)
+        cache.store("ctx", "story", "first draft", latency=1.0)
+        cache.store("ctx", "story", "final draft", latency=1.0)
+
+        reloaded = ResponseCache(path=path)
+
+        assert reloaded.lookup("ctx", "old news") is None
+        assert reloaded.lookup("ctx", "story").content == "final draft"
+        with open(path, encoding="utf-8") as f:
+            assert len(f.readlines()) == 1
+
+    def test_normalize_prompt(self):
+        """Test full-width characters and trailing punctuation are normalized"""
+        assert normalize_prompt("  有什么建议吗？ ") == normalize_prompt("有什么建议吗")
+
+
+class TestCachedAgent:
+    """Test class for CachedAgent"""
+
+    def test_repeated_question_skips_model(self):
+        """Test a repeated question is answered without calling the model"""
+        agent = Agent(model=Gemini(id="gemini-2.5-flash"), description="Florist")
+        agent.run = Mock(return_value=RunResponse(content="Roses"))
+        cached = CachedAgent(agent)
+
+        assert cached.run("Which flowers?").content == "Roses"
+        assert cached.run("which flowers").content == "Roses"
+        assert agent.run.call_count == 1
+        assert cached.get_stats()['hit_rate'] == 0.5
+
+    def test_request_arguments_bypass_cache(self):
+        """Test runs with images or other request arguments are not answered from the cache"""
+        agent = Agent(model=Gemini(id="gemini-2.5-flash"), description="Florist")
+        agent.run = Mock(side_effect=[RunResponse(content="Roses"), RunResponse(content="Tulips"),
+                                      RunResponse(content="Lilies")])
+        cached = CachedAgent(agent)
+
+        assert cached.run("Which flowers are these?").content == "Roses"
+        assert cached.run("Which flowers are these?", images=[Mock()]).content == "Tulips"
+        assert cached.run("Which flowers are these?", session_id="s2").content == "Lilies"
+        assert cached.run("Which flowers are these?", session_id=None).content == "Roses"
+        assert agent.run.call_count == 3
+
+    def test_context_key_ignores_cache_name(self):
+        """Test the context key stays the same when the cached context is uploaded again"""
+        manager = ContextCacheManager(LocalContextCacheBackend())
+        agent = manager.build_agent("gemini-2.5-flash", description="Florist")
+        key = agent_context_key(agent)
+
+        agent.model.cached_content = "cachedContents/reuploaded"
+
+        assert agent_context_key(agent) == key
+        assert agent_context_key(manager.build_agent("gemini-2.5-flash", description="Poet")) != key
+
+    def test_grounded_agent_uses_short_ttl(self):
+        """Test search-grounded agents default to a short TTL"""
+        agent = Agent(model=Gemini(id="gemini-2.5-flash", search=True))
+        assert CachedAgent(agent).ttl_seconds == GROUNDED_TTL_SECONDS
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for SQLite-backed session memory
+"""
+
+import os
+import sys
+import pytest
+
+# Add repository root to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from agno.agent import Agent
+from agno.models.google import Gemini
+from agno.run.response import RunResponse
+
+from utils.session_memory import SessionAgent, SqliteSessionStore, uncached_model
+
+
+class StubAgent:
+    """Agent stand-in that records the messages it is sent"""
+
+    def __init__(self, reply="OK", model=None):
+        self.reply = reply
+        self.model = model
+        self.calls = []
+
+    def run(self, message=None, messages=None, **kwargs):
+        self.calls.append(messages if messages is not None else message)
+        content = self.reply(len(self.calls)) if callable(self.reply) else self.reply
+        return RunResponse(content=content)
+
+
+@pytest.fixture
+def store():
+    """Create an in-memory session store"""
+    store = SqliteSessionStore(":memory:")
+    yield store
+    store.close()
+
+
+class TestSqliteSessionStore:
+    """Test class for SqliteSessionStore"""
+
+    def test_turns_and_usage(self, store):
+        """Test turns are numbered per session and tokens accumulate"""
+        assert store.append_turn("s1", "hi", "hello", 10, 5, 0.1) == 1
+        assert store.append_turn("s1", "more", "sure", 20, 7, 0.1) == 2
+        assert store.append_turn("s2", "other", "yes", 3, 1, 0.1) == 1
+
+        usage = store.get_usage("s1")
+        assert usage['turns'] == 2
+        assert usage['input_tokens'] == 30
+        assert usage['output_tokens'] == 12
+        assert usage['last_prompt_tokens'] == 20
+        assert usage['total_tokens'] == 42
+        assert store.get_usage("missing")['turns'] == 0
+
+    def test_load_context_window(self, store):
+        """Test the context is the summary plus the most recent unsummarized turns"""
+        for i in range(1, 6):
+            store.append_turn("s", f"q{i}", f"a{i}", 1, 1, 0.0)
+        store.save_summary("s", "turns 1-2", through_turn=2, tokens=4)
+
+        summary, turns = store.load_context("s", max_turns=2)
+        assert summary == "turns 1-2"
+        assert [t.turn for t in turns] == [4, 5]
+        assert [t.turn for t in store.unsummarized_turns("s")[1]] == [3, 4, 5]
+        assert store.get_usage("s")['summary_tokens'] == 4
+
+    def test_older_summary_does_not_overwrite(self, store):
+        """Test a summary covering fewer turns than the stored one is ignored"""
+        for i in range(4):
+            store.append_turn("s", "q", "a", 1, 1, 0.0)
+        store.save_summary("s", "through 3", through_turn=3, tokens=1)
+        store.save_summary("s", "through 2", through_turn=2, tokens=1)
+
+        assert store.load_context("s", 10)[0] == "through 3"
+
+    def test_delete_session(self, store):
+        """Test deleting a session forgets its turns"""
+        store.append_turn("s", "q", "a", 1, 1, 0.0)
+        store.delete_session("s")
+
+        assert store.load_context("s", 10) == ("", [])
+
+
+class TestSessionAgent:
+    """Test class for SessionAgent windowing and summarization"""
+
+    def test_old_turns_are_summarized(self, store):
+        """Test turns past the window are folded into the summary and no longer sent"""
+        agent = StubAgent(reply=lambda n: f"answer {n}")
+        summarizer = StubAgent(reply="SUMMARY")
+        session = SessionAgent(agent, store, summarizer=summarizer, window_turns=2, summary_batch=2)
+
+        for i in range(1, 5):
+            session.run(f"question {i}", session_id="s")
+        session.wait_for_summaries(timeout=5)
+
+        assert len(summarizer.calls) == 1
+        assert "question 1" in summarizer.calls[0] and "question 2" in summarizer.calls[0]
+        assert "question 3" not in summarizer.calls[0]
+
+        session.run("question 5", session_id="s")
+        messages = agent.calls[-1]
+        assert messages[0]['content'].endswith("SUMMARY")
+        assert [m['content'] for m in messages[2:]] == [
+            "question 3", "answer 3", "question 4", "answer 4", "question 5"
+        ]
+        session.close()
+
+    def test_window_before_summary(self, store):
+        """Test all unsummarized turns up to the window plus batch are sent"""
+        agent = StubAgent()
+        session = SessionAgent(agent, store, summarizer=StubAgent(), window_turns=2, summary_batch=2)
+
+        for i in range(1, 4):
+            session.run(f"question {i}", session_id="s")
+
+        assert len(agent.calls[-1]) == 5
+        assert store.get_usage("s")['turns'] == 3
+        session.close()
+
+    def test_empty_answers_are_not_recorded(self, store):
+        """Test a run without content does not add a turn"""
+        session = SessionAgent(StubAgent(reply=""), store, summarizer=StubAgent())
+
+        session.run("question", session_id="s")
+
+        assert store.get_usage("s")['turns'] == 0
+        session.close()
+
+    def test_default_summarizer_drops_cached_content(self, store):
+        """Test the default summarizer does not reuse the conversation's cached context"""
+        model = Gemini(id="gemini-2.5-flash", cached_content="cachedContents/abc")
+        session = SessionAgent(Agent(model=model), store)
+
+        assert session.summarizer.model.id == "gemini-2.5-flash"
+        assert session.summarizer.model.cached_content is None
+        assert model.cached_content == "cachedContents/abc"
+        session.close()
+
+    def test_uncached_model_keeps_plain_models(self):
+        """Test models without cached context are reused as they are"""
+        model = Gemini(id="gemini-2.5-flash")
+        assert uncached_model(model) is model
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Pytest tests for the server-sent events agent streamer
+"""
+
+import os
+import sys
+import json
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+# Add repository root to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from agno.run.response import RunEvent
+
+from utils.sse_stream import AgentStreamer, create_sse_app
+
+
+class StubAgent:
+    """Agent stand-in streaming fixed chunks"""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def arun(self, message, stream=True, session_id=None):
+        async def events():
+            for chunk in self.chunks:
+                await asyncio.sleep(self.delay)
+                yield SimpleNamespace(event=RunEvent.run_response_content.value, content=chunk)
+        return events()
+
+
+def parse_events(body):
+    """Split an SSE body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = block.split("\n")
+        event = lines[0][len("event: "):] if lines[0].startswith("event: ") else None
+        events.append((event, json.loads(lines[-1][len("data: "):])))
+    return events
+
+
+def call_app(app, send, receive, spec_version="2.4"):
+    """Send one stream request straight to the ASGI app"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/agents/stub/stream",
+        "raw_path": b"/agents/stub/stream", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80),
+    }
+    return app(scope, receive, send)
+
+
+class TestSseApp:
+    """Test class for the streaming endpoint"""
+
+    def test_streams_answer(self):
+        """Test chunks arrive between start and done events and the slot is freed"""
+        streamer = AgentStreamer()
+        app = create_sse_app({"stub": lambda: StubAgent(["Hello", " world"])}, streamer)
+
+        with TestClient(app) as client:
+            response = client.post("/agents/stub/stream", json={"message": "hi", "session_id": "s1"})
+
+        events = parse_events(response.text)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert events[0] == ("start", {"session_id": "s1"})
+        assert [data["content"] for event, data in events[1:-1]] == ["Hello", " world"]
+        assert events[-1][0] == "done" and events[-1][1]["chunks"] == 2
+        stats = streamer.get_stats()
+        assert stats["active"] == 0 and stats["completed"] == 1
+
+    def test_rejects_at_capacity(self):
+        """Test requests beyond max_streams get 429"""
+        streamer = AgentStreamer(max_streams=1)
+        app = create_sse_app({"stub": lambda: StubAgent(["x"])}, streamer)
+        held = streamer.try_open()
+
+        with TestClient(app) as client:
+            response = client.post("/agents/stub/stream", json={"message": "hi"})
+            assert response.status_code == 429
+            assert response.headers["retry-after"] == "1"
+
+            streamer.release(held)
+            assert client.post("/agents/stub/stream", json={"message": "hi"}).status_code == 200
+        assert streamer.get_stats()["active"] == 0
+
+    def test_unknown_agent(self):
+        """Test unknown agents are 404 and reserve no slot"""
+        streamer = AgentStreamer()
+        with TestClient(create_sse_app({}, streamer)) as client:
+            assert client.post("/agents/missing/stream", json={"message": "hi"}).status_code == 404
+        assert streamer.get_stats()["streams"] == 0
+
+
+class TestSlotRelease:
+    """Test class for slot release when clients go away"""
+
+    def test_disconnect_mid_stream(self):
+        """Test a client disconnecting mid-answer frees its slot"""
+        streamer = AgentStreamer()
+        app = create_sse_app({"stub": lambda: StubAgent(["a"] * 100, delay=0.05)}, streamer)
+        sent = []
+
+        async def run():
+            chunk_seen = asyncio.Event()
+            requested = []
+
+            async def receive():
+                if not requested:
+                    requested.append(True)
+                    return {"type": "http.request", "body": b'{"message": "hi"}', "more_body": False}
+                await chunk_seen.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                if message.get("body", b"").startswith(b"data:"):
+                    chunk_seen.set()
+
+            await asyncio.wait_for(call_app(app, send, receive, spec_version="2.0"), 5)
+
+        asyncio.run(run())
+
+        stats = streamer.get_stats()
+        assert sent[0]["status"] == 200
+        assert stats["active"] == 0 and stats["disconnected"] == 1
+
+    def test_disconnect_before_body(self):
+        """Test a slot is freed when the body is never iterated"""
+        streamer = AgentStreamer()
+        app = create_sse_app({"stub": lambda: StubAgent(["a"])}, streamer)
+
+        async def receive():
+            return {"type": "http.request", "body": b'{"message": "hi"}', "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                raise OSError("connection reset")
+
+        with pytest.raises(Exception):
+            asyncio.run(call_app(app, send, receive))
+
+        stats = streamer.get_stats()
+        assert stats["streams"] == 1
+        assert stats["active"] == 0 and stats["disconnected"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,206 @@
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from agno.agent import Agent
+from agno.models.google import Gemini
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContextHandle:
+    """Reference to static context uploaded once to a provider-side cache."""
+    key: str
+    name: str
+    model_id: str
+    expires_at: float
+
+
+@dataclass
+class CachedContextGemini(Gemini):
+    """Gemini model that looks up its cached context before every request.
+
+    Agents can outlive the cache TTL (sessions, servers), so the handle is not
+    fixed when the agent is built: context_resolver returns a live cache name,
+    refreshing the TTL or uploading the context again as needed.
+    system_instruction_key identifies the cached system instruction itself and
+    stays the same when the context is uploaded again.
+    """
+    context_resolver: Optional[Callable[[], str]] = None
+    system_instruction_key: Optional[str] = None
+
+    def get_request_params(self, *args, **kwargs) -> Dict[str, Any]:
+        if self.context_resolver is not None:
+            self.cached_content = self.context_resolver()
+        return super().get_request_params(*args, **kwargs)
+
+
+class ContextCacheBackend:
+    """Provider operations needed to manage cached context."""
+
+    def create(self, model_id: str, system_instruction: str, ttl_seconds: int) -> str:
+        """Upload context and return the provider's cache name."""
+        raise NotImplementedError
+
+    def refresh(self, name: str, ttl_seconds: int) -> None:
+        """Extend the lifetime of a cached context."""
+        raise NotImplementedError
+
+    def delete(self, name: str) -> None:
+        """Delete a cached context."""
+        raise NotImplementedError
+
+
+class GeminiContextCacheBackend(ContextCacheBackend):
+    """Gemini cached content via the google-genai client."""
+
+    def __init__(self, client: Optional[Any] = None, api_key: Optional[str] = None,
+                 client_params: Optional[Dict[str, Any]] = None):
+        if client is None:
+            from google import genai
+            client = genai.Client(api_key=api_key, **(client_params or {}))
+        self.client = client
+
+    def create(self, model_id: str, system_instruction: str, ttl_seconds: int) -> str:
+        from google.genai import types
+        cache = self.client.caches.create(
+            model=model_id,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                ttl=f"{ttl_seconds}s",
+            ),
+        )
+        return cache.name
+
+    def refresh(self, name: str, ttl_seconds: int) -> None:
+        from google.genai import types
+        self.client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s"))
+
+    def delete(self, name: str) -> None:
+        self.client.caches.delete(name=name)
+
+
+class LocalContextCacheBackend(ContextCacheBackend):
+    """In-memory stand-in that records uploads, for tests and offline runs."""
+
+    def __init__(self, min_chars: int = 0):
+        self.min_chars = min_chars
+        self.contexts: Dict[str, Dict[str, Any]] = {}
+        self.uploads = 0
+
+    def create(self, model_id: str, system_instruction: str, ttl_seconds: int) -> str:
+        if len(system_instruction) < self.min_chars:
+            raise ValueError("Cached content is below the minimum size")
+        name = f"cachedContents/local-{uuid.uuid4().hex[:12]}"
+        self.contexts[name] = {"model_id": model_id, "system_instruction": system_instruction,
+                               "expires_at": time.time() + ttl_seconds}
+        self.uploads += 1
+        return name
+
+    def refresh(self, name: str, ttl_seconds: int) -> None:
+        self.contexts[name]["expires_at"] = time.time() + ttl_seconds
+
+    def delete(self, name: str) -> None:
+        self.contexts.pop(name, None)
+
+
+def build_system_prompt(description: Optional[str] = None,
+                        instructions: Optional[List[str]] = None,
+                        markdown: bool = False) -> str:
+    """Assemble a system prompt the way agno lays out description and instructions."""
+    parts = []
+    if description:
+        parts.append(description)
+    if instructions:
+        parts.append("<instructions>\n" + "\n".join(f"- {i}" for i in instructions) + "\n</instructions>")
+    if markdown:
+        parts.append("<additional_information>\n- Use markdown to format your answers.\n</additional_information>")
+    return "\n\n".join(parts)
+
+
+class ContextCacheManager:
+    """Upload long static instructions once and share the handle across agents."""
+
+    def __init__(self, backend: ContextCacheBackend, ttl_seconds: int = 3600, refresh_margin: int = 300):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self._handles: Dict[str, ContextHandle] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def context_key(model_id: str, system_instruction: str) -> str:
+        return hashlib.sha256(f"{model_id}\x1f{system_instruction}".encode("utf-8")).hexdigest()
+
+    def get_or_create(self, model_id: str, system_instruction: str) -> ContextHandle:
+        """Return a live handle for the context, uploading or refreshing it when needed."""
+        key = self.context_key(model_id, system_instruction)
+        now = time.time()
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle.expires_at > now:
+                if handle.expires_at - now < self.refresh_margin:
+                    self.backend.refresh(handle.name, self.ttl_seconds)
+                    handle.expires_at = now + self.ttl_seconds
+                return handle
+            name = self.backend.create(model_id, system_instruction, self.ttl_seconds)
+            handle = ContextHandle(key=key, name=name, model_id=model_id, expires_at=now + self.ttl_seconds)
+            self._handles[key] = handle
+            logger.info(f"Uploaded cached context {name} for {model_id}")
+            return handle
+
+    def build_agent(self,
+                    model_id: str,
+                    description: Optional[str] = None,
+                    instructions: Optional[List[str]] = None,
+                    markdown: bool = False,
+                    model_params: Optional[Dict[str, Any]] = None,
+                    **agent_kwargs) -> Agent:
+        """Create a Gemini agent whose system prompt is served from the context cache.
+
+        Falls back to sending the prompt inline if the provider rejects the cache
+        (for example when the content is below the provider's minimum size).
+        model_params are passed to the Gemini model (e.g. client_params).
+        """
+        model_params = model_params or {}
+        system_instruction = build_system_prompt(description, instructions, markdown)
+        try:
+            handle = self.get_or_create(model_id, system_instruction)
+        except Exception as e:
+            logger.warning(f"Context caching unavailable, sending instructions inline: {e}")
+            return Agent(model=Gemini(id=model_id, **model_params), description=description,
+                         instructions=instructions, markdown=markdown, **agent_kwargs)
+        # The cached content already carries the system instruction; the handle is
+        # resolved again on every request so the agent survives the TTL
+        model = CachedContextGemini(
+            id=model_id,
+            cached_content=handle.name,
+            context_resolver=lambda: self.get_or_create(model_id, system_instruction).name,
+            system_instruction_key=self.context_key(model_id, system_instruction),
+            **model_params,
+        )
+        return Agent(model=model, create_default_system_message=False, **agent_kwargs)
+
+    def release(self, model_id: str, system_instruction: str) -> None:
+        """Delete a cached context before it expires."""
+        key = self.context_key(model_id, system_instruction)
+        with self._lock:
+            handle = self._handles.pop(key, None)
+        if handle is not None:
+            self.backend.delete(handle.name)
+
+    def close(self) -> None:
+        """Delete every context uploaded by this manager."""
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            try:
+                self.backend.delete(handle.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete cached context {handle.name}: {e}")
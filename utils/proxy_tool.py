@@ -1,8 +1,16 @@
 import os
+import time
+import itertools
+import ipaddress
+import threading
+from typing import Any, Optional, Dict, List
+from urllib.parse import urlparse
 
-from typing import Optional, Dict
+import httpx
+import requests
 
 class ProxyTool:
+    """Process-wide proxy via environment variables; prefer ProxyPool for concurrent clients."""
     PROXY_VARS = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']
     _original_proxies: Dict[str, Optional[str]] = {}
     _is_enabled: bool = False
@@ -41,3 +49,199 @@ class ProxyTool:
     def is_enabled(cls) -> bool:
         """Check if proxy is currently enabled."""
         return cls._is_enabled
+
+
+class ProxyPool:
+    """Per-request proxy selection across upstream proxies, without touching os.environ."""
+
+    DEFAULT_BYPASS = ['localhost', '127.0.0.1', '::1', '*.local', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
+
+    def __init__(self,
+                 proxies: Optional[List[str]] = None,
+                 bypass: Optional[List[str]] = None,
+                 health_check_url: str = "https://www.google.com/generate_204",
+                 health_check_timeout: float = 5.0,
+                 latency_tolerance: float = 1.5,
+                 failure_threshold: int = 3,
+                 recovery_timeout: float = 30.0):
+        """Create a pool; proxies default to the comma-separated PROXY_VALUE env var."""
+        if proxies is None:
+            proxies = [p.strip() for p in os.getenv("PROXY_VALUE", "http://localhost:7897").split(",") if p.strip()]
+        if not proxies:
+            raise ValueError("At least one proxy is required")
+        self.proxies = list(proxies)
+        self.bypass = list(self.DEFAULT_BYPASS if bypass is None else bypass)
+        self.health_check_url = health_check_url
+        self.health_check_timeout = health_check_timeout
+        self.latency_tolerance = latency_tolerance
+        self.failure_threshold = failure_threshold
+        # Seconds before a proxy taken out by failures is re-probed with one live request
+        self.recovery_timeout = recovery_timeout
+        self._latency: Dict[str, Optional[float]] = {p: None for p in self.proxies}
+        self._failures: Dict[str, int] = {p: 0 for p in self.proxies}
+        self._requests: Dict[str, int] = {p: 0 for p in self.proxies}
+        # When an unhealthy proxy may next be probed
+        self._retry_at: Dict[str, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def should_bypass(self, url: Optional[str]) -> bool:
+        """Check whether a URL should be reached directly rather than through a proxy."""
+        if not url:
+            return False
+        host = (urlparse(url).hostname if "://" in url else url.split(":")[0]).lower()
+        for rule in self.bypass:
+            rule = rule.lower()
+            if "/" in rule:
+                try:
+                    if ipaddress.ip_address(host) in ipaddress.ip_network(rule, strict=False):
+                        return True
+                except ValueError:
+                    continue
+            elif rule.startswith("*."):
+                if host.endswith(rule[1:]):
+                    return True
+            elif host == rule or host.endswith("." + rule.lstrip(".")):
+                return True
+        return False
+
+    def select(self, url: Optional[str] = None) -> Optional[str]:
+        """Pick a proxy for a URL: None if bypassed, an unhealthy proxy due for a re-probe, else round-robin among the fastest healthy proxies."""
+        if self.should_bypass(url):
+            return None
+        with self._lock:
+            now = time.time()
+            for proxy in self.proxies:
+                if self._failures[proxy] >= self.failure_threshold and self._retry_at[proxy] <= now:
+                    # One probe per cooldown; if its outcome is never reported, probe again after the next one
+                    self._retry_at[proxy] = now + self.recovery_timeout
+                    self._requests[proxy] += 1
+                    return proxy
+            healthy = [p for p in self.proxies if self._failures[p] < self.failure_threshold]
+            if not healthy:
+                # Everything looks down: keep trying all proxies rather than failing closed
+                healthy = list(self.proxies)
+            known = [self._latency[p] for p in healthy if self._latency[p] is not None]
+            if known:
+                limit = min(known) * self.latency_tolerance
+                healthy = [p for p in healthy if self._latency[p] is None or self._latency[p] <= limit]
+            proxy = healthy[next(self._counter) % len(healthy)]
+            self._requests[proxy] += 1
+            return proxy
+
+    def record_result(self, proxy: str, latency: Optional[float] = None, ok: bool = True) -> None:
+        """Feed back the outcome of a request made through a proxy."""
+        with self._lock:
+            if not ok:
+                self._failures[proxy] += 1
+                if self._failures[proxy] >= self.failure_threshold:
+                    # Taken out (or a probe failed): wait a full cooldown before probing
+                    self._retry_at[proxy] = time.time() + self.recovery_timeout
+                return
+            self._failures[proxy] = 0
+            if latency is not None:
+                previous = self._latency[proxy]
+                self._latency[proxy] = latency if previous is None else 0.7 * previous + 0.3 * latency
+
+    def check_health(self) -> Dict[str, bool]:
+        """Probe every proxy against the health check URL and record latency."""
+        results = {}
+        for proxy in self.proxies:
+            start = time.time()
+            try:
+                response = requests.get(self.health_check_url, proxies={"http": proxy, "https": proxy},
+                                        timeout=self.health_check_timeout)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            self.record_result(proxy, time.time() - start if ok else None, ok)
+            results[proxy] = ok
+        return results
+
+    def proxies_for(self, url: Optional[str] = None) -> Dict[str, str]:
+        """Proxy mapping for requests, empty when the URL bypasses the proxy."""
+        proxy = self.select(url)
+        return {"http": proxy, "https": proxy} if proxy else {}
+
+    def session(self, url: Optional[str] = None) -> requests.Session:
+        """A requests session pinned to one proxy that ignores proxy environment variables."""
+        session = requests.Session()
+        session.trust_env = False
+        session.proxies.update(self.proxies_for(url))
+        return session
+
+    def gemini_client_params(self) -> Dict[str, Any]:
+        """client_params for agno's Gemini model / google-genai Client picking a proxy per request."""
+        from google.genai import types
+
+        return {"http_options": types.HttpOptions(client_args={"transport": ProxyPoolTransport(self)},
+                                                  async_client_args={"transport": AsyncProxyPoolTransport(self)})}
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Per-proxy request counts, smoothed latency and consecutive failures."""
+        with self._lock:
+            return [
+                {"proxy": p, "requests": self._requests[p], "latency_seconds": self._latency[p],
+                 "consecutive_failures": self._failures[p],
+                 "healthy": self._failures[p] < self.failure_threshold}
+                for p in self.proxies
+            ]
+
+
+# Statuses produced by the proxy itself rather than the upstream service
+PROXY_ERROR_STATUSES = {407, 502, 504}
+
+
+class ProxyPoolTransport(httpx.BaseTransport):
+    """httpx transport routing every request through ProxyPool.select() and reporting the outcome."""
+
+    def __init__(self, pool: ProxyPool, **transport_kwargs):
+        self.pool = pool
+        self._direct = httpx.HTTPTransport(**transport_kwargs)
+        self._transports = {p: httpx.HTTPTransport(proxy=p, **transport_kwargs) for p in pool.proxies}
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        proxy = self.pool.select(str(request.url))
+        if proxy is None:
+            return self._direct.handle_request(request)
+        start = time.time()
+        try:
+            response = self._transports[proxy].handle_request(request)
+        except httpx.TransportError:
+            self.pool.record_result(proxy, ok=False)
+            raise
+        # Latency is time to response headers; the body streams afterwards
+        self.pool.record_result(proxy, time.time() - start, response.status_code not in PROXY_ERROR_STATUSES)
+        return response
+
+    def close(self) -> None:
+        self._direct.close()
+        for transport in self._transports.values():
+            transport.close()
+
+
+class AsyncProxyPoolTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ProxyPoolTransport."""
+
+    def __init__(self, pool: ProxyPool, **transport_kwargs):
+        self.pool = pool
+        self._direct = httpx.AsyncHTTPTransport(**transport_kwargs)
+        self._transports = {p: httpx.AsyncHTTPTransport(proxy=p, **transport_kwargs) for p in pool.proxies}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        proxy = self.pool.select(str(request.url))
+        if proxy is None:
+            return await self._direct.handle_async_request(request)
+        start = time.time()
+        try:
+            response = await self._transports[proxy].handle_async_request(request)
+        except httpx.TransportError:
+            self.pool.record_result(proxy, ok=False)
+            raise
+        self.pool.record_result(proxy, time.time() - start, response.status_code not in PROXY_ERROR_STATUSES)
+        return response
+
+    async def aclose(self) -> None:
+        await self._direct.aclose()
+        for transport in self._transports.values():
+            await transport.aclose()
@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from agno.agent import Agent
+from agno.run.response import RunEvent, RunResponse
+
+logger = logging.getLogger(__name__)
+
+# Time-to-live defaults: grounded (search) answers go stale quickly
+DEFAULT_TTL_SECONDS = 24 * 3600
+GROUNDED_TTL_SECONDS = 10 * 60
+
+EmbedFn = Callable[[str], Sequence[float]]
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize a prompt so trivially different phrasings share a cache key."""
+    text = unicodedata.normalize("NFKC", text).lower().strip()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?？!！.。")
+
+
+def agent_context_key(agent: Agent) -> str:
+    """Hash everything besides the prompt that shapes an agent's answer.
+
+    Only fields fixed when the agent is built are used. A provider-side
+    cached context is identified by its system_instruction_key, not by its
+    cache name, which changes whenever the context is uploaded again.
+    """
+    model = agent.model
+    instructions = agent.instructions
+    if isinstance(instructions, (list, tuple)):
+        instructions = "\n".join(str(i) for i in instructions)
+    parts = [
+        type(model).__name__ if model else "",
+        getattr(model, "id", "") or "",
+        str(getattr(model, "search", False) or getattr(model, "grounding", False)),
+        str(getattr(model, "system_instruction_key", "") or ""),
+        agent.description or "",
+        str(instructions or ""),
+        str(agent.markdown),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def is_grounded(agent: Agent) -> bool:
+    """Check whether an agent answers from real-time search results."""
+    model = agent.model
+    return bool(getattr(model, "search", False) or getattr(model, "grounding", False))
+
+
+def gemini_embed_fn(model_id: str = "text-embedding-004", dimensions: Optional[int] = 768,
+                    client_params: Optional[Dict[str, Any]] = None) -> EmbedFn:
+    """Build an embedding function backed by the Gemini embedding API."""
+    from agno.embedder.google import GeminiEmbedder
+
+    embedder = GeminiEmbedder(id=model_id, dimensions=dimensions, task_type="SEMANTIC_SIMILARITY",
+                              client_params=client_params)
+    return embedder.get_embedding
+
+
+@dataclass
+class CacheEntry:
+    prompt: str
+    content: Any
+    latency: float
+    expires_at: float
+
+
+class _EmbeddingIndex:
+    """Unit-norm embeddings of one agent context, in a matrix that grows geometrically."""
+
+    def __init__(self, dimensions: int, capacity: int = 16):
+        self.matrix = np.empty((capacity, dimensions), dtype=np.float32)
+        self.entries: List[CacheEntry] = []
+
+    def add(self, entry: CacheEntry, vector: np.ndarray) -> None:
+        size = len(self.entries)
+        if size == len(self.matrix):
+            # Doubling keeps appends amortized O(1) instead of copying the matrix every time
+            grown = np.empty((2 * size, self.matrix.shape[1]), dtype=np.float32)
+            grown[:size] = self.matrix
+            self.matrix = grown
+        self.matrix[size] = vector
+        self.entries.append(entry)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        return self.matrix[:len(self.entries)] @ query
+
+    def keep(self, rows: List[int]) -> None:
+        """Drop every row not listed."""
+        matrix = np.empty((max(16, 2 * len(rows)), self.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(rows)] = self.matrix[rows]
+        self.matrix = matrix
+        self.entries = [self.entries[i] for i in rows]
+
+
+class ResponseCache:
+    """Exact and embedding-similarity cache for agent responses.
+
+    Holds at most max_entries responses. When full, expired entries go first,
+    then the least recently used ones, down to 90% of max_entries so the
+    embedding index is compacted once per batch of stores rather than on each.
+
+    With a path, entries (and their embeddings) are appended to a JSONL file
+    and loaded again by the next process, so scripts that answer a single
+    prompt per run still get hits. The file is rewritten without expired or
+    replaced entries when it is loaded.
+    """
+
+    def __init__(self,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 embed_fn: Optional[EmbedFn] = None,
+                 similarity_threshold: float = 0.92,
+                 max_entries: int = 10000,
+                 path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._exact: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        # Embeddings per agent context; a row is live while its entry is still in _exact
+        self._semantic: Dict[str, _EmbeddingIndex] = {}
+        self._embedding_rows = 0
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "latency_saved_seconds": 0.0}
+        self.path = path
+        if path is not None:
+            self._load()
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, context_key: str, prompt: str) -> Optional[CacheEntry]:
+        """Return a live cached entry for the prompt, or None on a miss."""
+        normalized = normalize_prompt(prompt)
+        now = time.time()
+        with self._lock:
+            key = (context_key, normalized)
+            entry = self._exact.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._exact.move_to_end(key)
+                self._record_hit("exact_hits", entry)
+                return entry
+
+        query = self._embed(normalized)
+        if query is not None:
+            with self._lock:
+                index = self._semantic.get(context_key)
+                if index is not None and index.entries:
+                    # Brute-force cosine similarity over unit vectors
+                    scores = index.scores(query)
+                    live = np.fromiter((self._is_live(context_key, e, now) for e in index.entries),
+                                       dtype=bool, count=len(index.entries))
+                    scores = np.where(live, scores, -1.0)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        entry = index.entries[best]
+                        self._exact.move_to_end((context_key, entry.prompt))
+                        self._record_hit("semantic_hits", entry)
+                        return entry
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def store(self, context_key: str, prompt: str, content: Any, latency: float,
+              ttl_seconds: Optional[float] = None) -> None:
+        """Store a response with its original latency."""
+        normalized = normalize_prompt(prompt)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        entry = CacheEntry(prompt=normalized, content=content, latency=latency, expires_at=time.time() + ttl)
+        vector = self._embed(normalized)
+        with self._lock:
+            self._insert(context_key, entry, vector)
+            if self.path is not None:
+                self._append(context_key, entry, vector)
+
+    def _insert(self, context_key: str, entry: CacheEntry, vector: Optional[np.ndarray]) -> None:
+        """Add an entry to the exact map and the embedding index (lock held)."""
+        key = (context_key, entry.prompt)
+        self._exact.pop(key, None)
+        self._exact[key] = entry
+        if vector is not None:
+            index = self._semantic.get(context_key)
+            if index is None:
+                index = self._semantic[context_key] = _EmbeddingIndex(len(vector))
+            if index.matrix.shape[1] == len(vector):
+                index.add(entry, vector)
+                self._embedding_rows += 1
+        # Replaced and expired entries leave dead rows behind until the index is compacted
+        if len(self._exact) > self.max_entries or self._embedding_rows > 2 * self.max_entries:
+            self._evict(time.time())
+
+    @staticmethod
+    def _record(context_key: str, entry: CacheEntry, vector: Optional[np.ndarray]) -> Optional[str]:
+        """JSONL line for an entry, or None if its content cannot be stored as JSON."""
+        try:
+            return json.dumps({"context_key": context_key, "prompt": entry.prompt, "content": entry.content,
+                               "latency": entry.latency, "expires_at": entry.expires_at,
+                               "vector": vector.tolist() if vector is not None else None},
+                              ensure_ascii=False)
+        except TypeError:
+            return None
+
+    def _append(self, context_key: str, entry: CacheEntry, vector: Optional[np.ndarray]) -> None:
+        """Append an entry to the cache file (lock held)."""
+        line = self._record(context_key, entry, vector)
+        if line is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _load(self) -> None:
+        """Load live entries from the cache file and rewrite it without dead ones."""
+        if not os.path.exists(self.path):
+            return
+        now = time.time()
+        lines = 0
+        vectors: Dict[Tuple[str, str], Optional[np.ndarray]] = {}
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable line in response cache {self.path}")
+                        continue
+                    if record["expires_at"] <= now:
+                        continue
+                    entry = CacheEntry(prompt=record["prompt"], content=record["content"],
+                                       latency=record["latency"], expires_at=record["expires_at"])
+                    vector = record.get("vector")
+                    vector = np.asarray(vector, dtype=np.float32) if vector and self.embed_fn else None
+                    self._insert(record["context_key"], entry, vector)
+                    vectors[(record["context_key"], entry.prompt)] = vector
+            if lines > len(self._exact):
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    for (context_key, _), entry in self._exact.items():
+                        line = self._record(context_key, entry, vectors.get((context_key, entry.prompt)))
+                        if line is not None:
+                            f.write(line + "\n")
+                os.replace(temp_path, self.path)
+
+    def _record_hit(self, kind: str, entry: CacheEntry) -> None:
+        self._stats[kind] += 1
+        self._stats["latency_saved_seconds"] += entry.latency
+
+    def _is_live(self, context_key: str, entry: CacheEntry, now: float) -> bool:
+        return entry.expires_at > now and self._exact.get((context_key, entry.prompt)) is entry
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones (lock held)."""
+        for key in [k for k, e in self._exact.items() if e.expires_at <= now]:
+            del self._exact[key]
+        if len(self._exact) > self.max_entries:
+            target = max(1, int(self.max_entries * 0.9))
+            while len(self._exact) > target:
+                self._exact.popitem(last=False)
+        self._embedding_rows = 0
+        for context_key, index in list(self._semantic.items()):
+            rows = [i for i, e in enumerate(index.entries) if self._is_live(context_key, e, now)]
+            if not rows:
+                del self._semantic[context_key]
+                continue
+            if len(rows) < len(index.entries):
+                index.keep(rows)
+            self._embedding_rows += len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit counts, hit rate and latency saved by cache hits."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._exact)
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+
+class CachedAgent:
+    """Wrap an agno Agent so repeated questions are answered from a ResponseCache."""
+
+    def __init__(self, agent: Agent, cache: Optional[ResponseCache] = None, ttl_seconds: Optional[float] = None):
+        self.agent = agent
+        self.cache = cache or ResponseCache()
+        if ttl_seconds is None and is_grounded(agent):
+            ttl_seconds = GROUNDED_TTL_SECONDS
+        self.ttl_seconds = ttl_seconds
+        self.context_key = agent_context_key(agent)
+
+    def run(self, message: str, **kwargs) -> RunResponse:
+        """Run the agent, returning a cached response when one is available.
+
+        Only the message is part of the cache key, so runs with other request
+        arguments (images, session_id, ...) go straight to the model.
+        """
+        if kwargs.get("stream"):
+            # Streamed runs go straight to the model; use print_response to cache them
+            return self.agent.run(message, **kwargs)
+        if any(value is not None for name, value in kwargs.items() if name != "stream"):
+            return self.agent.run(message, **kwargs)
+        entry = self.cache.lookup(self.context_key, message)
+        if entry is not None:
+            return RunResponse(content=entry.content, model=getattr(self.agent.model, "id", None),
+                               metrics={"cache_hit": [True]})
+        start = time.time()
+        response = self.agent.run(message, **kwargs)
+        if response.content:
+            self.cache.store(self.context_key, message, response.content, time.time() - start, self.ttl_seconds)
+        return response
+
+    def print_response(self, message: str, stream: bool = True) -> None:
+        """Print the answer, streaming it from the model on a cache miss."""
+        entry = self.cache.lookup(self.context_key, message)
+        if entry is not None:
+            print(entry.content)
+            return
+        start = time.time()
+        if not stream:
+            response = self.agent.run(message)
+            content = response.content
+            print(content)
+        else:
+            chunks = []
+            for event in self.agent.run(message, stream=True):
+                if getattr(event, "event", None) == RunEvent.run_response_content.value and isinstance(event.content, str):
+                    chunks.append(event.content)
+                    print(event.content, end="", flush=True)
+            print()
+            content = "".join(chunks)
+        if content:
+            self.cache.store(self.context_key, message, content, time.time() - start, self.ttl_seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics."""
+        return self.cache.get_stats()
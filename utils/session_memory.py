@@ -0,0 +1,303 @@
+import time
+import sqlite3
+import logging
+import threading
+import dataclasses
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.agent import Agent
+from agno.models.base import Model
+from agno.run.response import RunEvent, RunResponse
+
+from utils.token_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = [
+    "You maintain a running summary of a conversation between a customer and a shop assistant.",
+    "Merge the previous summary with the new turns into one concise summary, in the language of the conversation.",
+    "Keep the customer's preferences, constraints, budget, recipients, dates and any recommendations or decisions made.",
+    "Output only the summary.",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_turns INTEGER NOT NULL DEFAULT 0,
+    turns INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    summary_tokens INTEGER NOT NULL DEFAULT 0,
+    last_prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    user_message TEXT NOT NULL,
+    assistant_message TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, turn)
+);
+"""
+
+
+# Model fields that attach provider-side cached context
+_CACHED_CONTEXT_FIELDS = ("cached_content", "context_resolver")
+
+
+def uncached_model(model: Model) -> Model:
+    """Copy of a model without provider-side cached context (the model itself if it has none).
+
+    Gemini rejects requests that send a system instruction together with
+    cached_content, so an agent with instructions of its own cannot reuse it.
+    """
+    overrides = {name: None for name in _CACHED_CONTEXT_FIELDS if getattr(model, name, None) is not None}
+    if not overrides:
+        return model
+    return dataclasses.replace(model, **overrides)
+
+
+def response_tokens(response: RunResponse, prompt_text: str) -> Tuple[int, int]:
+    """Input and output tokens reported by the model, estimated when missing."""
+    metrics = response.metrics or {}
+    input_tokens = sum(metrics.get("input_tokens") or [])
+    output_tokens = sum(metrics.get("output_tokens") or [])
+    if not input_tokens:
+        input_tokens = estimate_tokens(prompt_text)
+    if not output_tokens:
+        output_tokens = estimate_tokens(str(response.content or ""))
+    return input_tokens, output_tokens
+
+
+@dataclass
+class Turn:
+    turn: int
+    user_message: str
+    assistant_message: str
+
+
+class SqliteSessionStore:
+    """Conversation turns, running summaries and token usage per session, in SQLite."""
+
+    def __init__(self, db_path: str = "sessions.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _ensure_session(self, session_id: str) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)",
+            (session_id, now, now),
+        )
+
+    def append_turn(self, session_id: str, user_message: str, assistant_message: str,
+                    input_tokens: int, output_tokens: int, latency: float) -> int:
+        """Store a completed turn and add its tokens to the session; returns the turn number."""
+        with self._lock, self._conn:
+            self._ensure_session(session_id)
+            row = self._conn.execute("SELECT turns FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            turn = row["turns"] + 1
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, turn, user_message, assistant_message, input_tokens, output_tokens, latency, now),
+            )
+            self._conn.execute(
+                "UPDATE sessions SET turns = ?, input_tokens = input_tokens + ?, output_tokens = output_tokens + ?,"
+                " last_prompt_tokens = ?, updated_at = ? WHERE session_id = ?",
+                (turn, input_tokens, output_tokens, input_tokens, now, session_id),
+            )
+        return turn
+
+    def load_context(self, session_id: str, max_turns: int) -> Tuple[str, List[Turn]]:
+        """The running summary and up to max_turns most recent turns it does not cover."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summarized_turns FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return "", []
+            rows = self._conn.execute(
+                "SELECT turn, user_message, assistant_message FROM turns WHERE session_id = ? AND turn > ?"
+                " ORDER BY turn DESC LIMIT ?",
+                (session_id, row["summarized_turns"], max_turns),
+            ).fetchall()
+        return row["summary"], [Turn(*r) for r in reversed(rows)]
+
+    def unsummarized_turns(self, session_id: str) -> Tuple[str, List[Turn]]:
+        """The running summary and every turn after it."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summarized_turns FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return "", []
+            rows = self._conn.execute(
+                "SELECT turn, user_message, assistant_message FROM turns WHERE session_id = ? AND turn > ?"
+                " ORDER BY turn",
+                (session_id, row["summarized_turns"]),
+            ).fetchall()
+        return row["summary"], [Turn(*r) for r in rows]
+
+    def save_summary(self, session_id: str, summary: str, through_turn: int, tokens: int) -> None:
+        """Replace the running summary, which now covers turns up to through_turn."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, summarized_turns = ?, summary_tokens = summary_tokens + ?,"
+                " updated_at = ? WHERE session_id = ? AND summarized_turns < ?",
+                (summary, through_turn, tokens, time.time(), session_id, through_turn),
+            )
+
+    def get_usage(self, session_id: str) -> Dict[str, Any]:
+        """Turn count and token totals of a session."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT turns, summarized_turns, input_tokens, output_tokens, summary_tokens, last_prompt_tokens"
+                " FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return {"turns": 0, "summarized_turns": 0, "input_tokens": 0, "output_tokens": 0,
+                    "summary_tokens": 0, "last_prompt_tokens": 0, "total_tokens": 0}
+        usage = dict(row)
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"] + usage["summary_tokens"]
+        return usage
+
+    def delete_session(self, session_id: str) -> None:
+        """Forget a session and its turns."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SessionAgent:
+    """Multi-turn wrapper for an agno Agent with bounded, persistent history.
+
+    Each request carries the session's running summary plus the most recent
+    turns, so prompt size and latency stay flat as a conversation grows.
+    Turns that fall out of the window are folded into the summary in the
+    background by a summarizer agent. Until that finishes they are still
+    sent, up to window_turns + summary_batch turns in all.
+    """
+
+    def __init__(self, agent: Agent, store: Optional[SqliteSessionStore] = None,
+                 summarizer: Optional[Agent] = None, window_turns: int = 6, summary_batch: int = 4):
+        self.agent = agent
+        self.store = store or SqliteSessionStore()
+        # The conversation model may carry the conversation's cached system prompt
+        self.summarizer = summarizer or Agent(model=uncached_model(agent.model), instructions=SUMMARY_INSTRUCTIONS)
+        self.window_turns = window_turns
+        self.summary_batch = summary_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-summary")
+        self._pending: Dict[str, Future] = {}
+        self._pending_lock = threading.Lock()
+
+    def _build_messages(self, session_id: str, message: str) -> List[Dict[str, str]]:
+        summary, turns = self.store.load_context(session_id, self.window_turns + self.summary_batch)
+        messages = []
+        if summary:
+            messages.append({"role": "user", "content": f"Summary of our earlier conversation:\n{summary}"})
+            messages.append({"role": "assistant", "content": "OK."})
+        for turn in turns:
+            messages.append({"role": "user", "content": turn.user_message})
+            messages.append({"role": "assistant", "content": turn.assistant_message})
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def run(self, message: str, session_id: str, **kwargs) -> RunResponse:
+        """Answer one turn of a session."""
+        messages = self._build_messages(session_id, message)
+        start = time.time()
+        response = self.agent.run(messages=messages, session_id=session_id, **kwargs)
+        self._record_turn(session_id, message, response, messages, time.time() - start)
+        return response
+
+    def print_response(self, message: str, session_id: str, stream: bool = True) -> None:
+        """Print the answer to one turn of a session, streaming it when requested."""
+        if not stream:
+            print(self.run(message, session_id).content)
+            return
+        messages = self._build_messages(session_id, message)
+        start = time.time()
+        chunks = []
+        for event in self.agent.run(messages=messages, session_id=session_id, stream=True):
+            if getattr(event, "event", None) == RunEvent.run_response_content.value and isinstance(event.content, str):
+                chunks.append(event.content)
+                print(event.content, end="", flush=True)
+        print()
+        self._record_turn(session_id, message, RunResponse(content="".join(chunks)), messages, time.time() - start)
+
+    def _record_turn(self, session_id: str, message: str, response: RunResponse,
+                     messages: List[Dict[str, str]], latency: float) -> None:
+        if not response.content:
+            return
+        prompt_text = "\n".join(m["content"] for m in messages)
+        input_tokens, output_tokens = response_tokens(response, prompt_text)
+        self.store.append_turn(session_id, message, str(response.content), input_tokens, output_tokens, latency)
+        self._maybe_summarize(session_id)
+
+    def _maybe_summarize(self, session_id: str) -> None:
+        with self._pending_lock:
+            pending = self._pending.get(session_id)
+            if pending is not None and not pending.done():
+                return
+            _, turns = self.store.unsummarized_turns(session_id)
+            if len(turns) < self.window_turns + self.summary_batch:
+                return
+            self._pending[session_id] = self._executor.submit(self._summarize, session_id)
+
+    def _summarize(self, session_id: str) -> None:
+        """Fold the turns older than the window into the running summary."""
+        summary, turns = self.store.unsummarized_turns(session_id)
+        older = turns[:-self.window_turns] if self.window_turns else turns
+        if not older:
+            return
+        lines = [f"Previous summary:\n{summary or '(none)'}", "New turns:"]
+        for turn in older:
+            lines.append(f"Customer: {turn.user_message}")
+            lines.append(f"Assistant: {turn.assistant_message}")
+        prompt = "\n".join(lines)
+        try:
+            response = self.summarizer.run(prompt)
+        except Exception as e:
+            logger.warning(f"Summarizing session {session_id} failed: {e}")
+            return
+        if not response.content:
+            return
+        input_tokens, output_tokens = response_tokens(response, prompt)
+        self.store.save_summary(session_id, str(response.content).strip(), older[-1].turn,
+                                input_tokens + output_tokens)
+        logger.info(f"Summarized turns {older[0].turn}-{older[-1].turn} of session {session_id}")
+
+    def wait_for_summaries(self, timeout: Optional[float] = None) -> None:
+        """Block until pending background summaries are written."""
+        with self._pending_lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.result(timeout)
+
+    def get_usage(self, session_id: str) -> Dict[str, Any]:
+        """Turn count and token totals of a session."""
+        return self.store.get_usage(session_id)
+
+    def close(self) -> None:
+        """Finish pending summaries and stop the background worker."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,236 @@
+import json
+import time
+import asyncio
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from agno.agent import Agent
+from agno.run.response import RunEvent
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from pydantic import BaseModel
+
+from utils.token_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Agents keep per-run state, so every stream gets its own instance
+AgentFactory = Callable[[], Agent]
+
+_DONE = object()
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> bytes:
+    """Encode one server-sent event; data is sent as JSON."""
+    payload = json.dumps(data, ensure_ascii=False)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n".encode("utf-8")
+
+
+@dataclass
+class StreamStats:
+    """Timing of one streamed response."""
+    started_at: float = field(default_factory=time.time)
+    ttft_seconds: Optional[float] = None
+    duration_seconds: float = 0.0
+    chunks: int = 0
+    output_tokens: int = 0
+    tokens_per_second: Optional[float] = None
+    status: str = "streaming"
+
+    def record_chunk(self, text: str) -> None:
+        if self.ttft_seconds is None:
+            self.ttft_seconds = time.time() - self.started_at
+        self.chunks += 1
+        self.output_tokens += estimate_tokens(text)
+
+    def finish(self, status: str) -> None:
+        self.status = status
+        self.duration_seconds = time.time() - self.started_at
+        if self.ttft_seconds is not None:
+            generation = self.duration_seconds - self.ttft_seconds
+            self.tokens_per_second = self.output_tokens / generation if generation > 0 else None
+
+
+class StreamSlot:
+    """A reserved stream slot; released exactly once."""
+    __slots__ = ("released",)
+
+    def __init__(self):
+        self.released = False
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that gives its stream slot back however the response ends.
+
+    The body generator only releases the slot once it has started; if the
+    client disconnects before the first chunk the generator never runs, so the
+    response releases the slot itself.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], streamer: "AgentStreamer", slot: StreamSlot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.streamer = streamer
+        self.slot = slot
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.streamer.release(self.slot)
+
+
+class AgentStreamer:
+    """Relay agent streams to many clients on one event loop.
+
+    Each stream runs the agent's async stream in a producer task that feeds a
+    bounded buffer; the HTTP response drains it. A slow client fills the buffer,
+    which pauses the producer and so stops reading from the model. If the
+    client does not catch up within slow_client_timeout the stream is dropped.
+    Client disconnects cancel the producer. At most max_streams run at once;
+    a slot reserved with try_open() must end up in release(), which stream()
+    and SlotStreamingResponse take care of.
+    """
+
+    def __init__(self, max_streams: int = 200, buffer_chunks: int = 64, slow_client_timeout: float = 30.0):
+        self.max_streams = max_streams
+        self.buffer_chunks = buffer_chunks
+        self.slow_client_timeout = slow_client_timeout
+        self._active = 0
+        self._totals = {"streams": 0, "completed": 0, "errors": 0, "slow_clients": 0, "disconnected": 0}
+        self._ttfts = []
+        self._rates = []
+
+    def try_open(self) -> Optional[StreamSlot]:
+        """Reserve a stream slot; None when the server is at capacity."""
+        if self._active >= self.max_streams:
+            return None
+        self._active += 1
+        self._totals["streams"] += 1
+        return StreamSlot()
+
+    def release(self, slot: StreamSlot, stats: Optional[StreamStats] = None) -> None:
+        """Give a slot back; streams released without stats count as disconnected."""
+        if slot.released:
+            return
+        slot.released = True
+        self._active -= 1
+        self._record(stats or StreamStats(status="disconnected"))
+
+    async def stream(self, slot: StreamSlot, agent: Agent, message: str,
+                     session_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Server-sent events for one agent answer in a slot from try_open()."""
+        stats = StreamStats()
+        buffer: asyncio.Queue = asyncio.Queue(maxsize=self.buffer_chunks)
+        producer = asyncio.create_task(self._produce(agent, message, session_id, buffer, stats))
+        try:
+            yield format_sse({"session_id": session_id}, event="start")
+            while True:
+                item = await buffer.get()
+                if item is _DONE:
+                    break
+                yield format_sse({"content": item})
+            await producer
+            yield format_sse(asdict(stats), event="done" if stats.status == "completed" else "error")
+        except asyncio.CancelledError:
+            # Client went away; Starlette cancels the response
+            stats.finish("disconnected")
+            raise
+        finally:
+            if not producer.done():
+                producer.cancel()
+            self.release(slot, stats)
+
+    async def _produce(self, agent: Agent, message: str, session_id: Optional[str],
+                       buffer: asyncio.Queue, stats: StreamStats) -> None:
+        status = "completed"
+        try:
+            events = await agent.arun(message, stream=True, session_id=session_id)
+            async for event in events:
+                if getattr(event, "event", None) == RunEvent.run_error.value:
+                    raise RuntimeError(getattr(event, "content", None) or "agent run failed")
+                if getattr(event, "event", None) != RunEvent.run_response_content.value:
+                    continue
+                if not isinstance(event.content, str) or not event.content:
+                    continue
+                stats.record_chunk(event.content)
+                try:
+                    # Blocks while the buffer is full: the client sets the pace
+                    await asyncio.wait_for(buffer.put(event.content), self.slow_client_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Dropping stream: client stalled for {self.slow_client_timeout}s")
+                    status = "slow_client"
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Agent stream failed: {e}")
+            status = "error"
+        stats.finish(status)
+        if status == "slow_client":
+            # Make room for the end marker; the client missed part of the answer anyway
+            while not buffer.empty():
+                buffer.get_nowait()
+        await buffer.put(_DONE)
+
+    def _record(self, stats: StreamStats) -> None:
+        key = {"completed": "completed", "error": "errors", "slow_client": "slow_clients"}.get(
+            stats.status, "disconnected")
+        self._totals[key] += 1
+        if stats.ttft_seconds is not None:
+            self._ttfts.append(stats.ttft_seconds)
+            self._ttfts = self._ttfts[-1000:]
+        if stats.tokens_per_second is not None:
+            self._rates.append(stats.tokens_per_second)
+            self._rates = self._rates[-1000:]
+        logger.info(f"Stream {stats.status}: ttft={stats.ttft_seconds}, tokens/s={stats.tokens_per_second}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Stream counters plus average TTFT and tokens/sec of recent streams."""
+        stats = dict(self._totals)
+        stats["active"] = self._active
+        stats["avg_ttft_seconds"] = sum(self._ttfts) / len(self._ttfts) if self._ttfts else None
+        stats["avg_tokens_per_second"] = sum(self._rates) / len(self._rates) if self._rates else None
+        return stats
+
+
+class StreamRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+
+def create_sse_app(agents: Dict[str, AgentFactory], streamer: Optional[AgentStreamer] = None) -> FastAPI:
+    """FastAPI app streaming answers of the named agents as server-sent events."""
+    streamer = streamer or AgentStreamer()
+    app = FastAPI(title="Agent streaming")
+    app.state.streamer = streamer
+
+    @app.post("/agents/{name}/stream")
+    async def stream_agent(name: str, request: StreamRequest):
+        factory = agents.get(name)
+        if factory is None:
+            raise HTTPException(status_code=404, detail=f"Unknown agent: {name}")
+        agent = factory()
+        slot = streamer.try_open()
+        if slot is None:
+            raise HTTPException(status_code=429, detail="Too many concurrent streams",
+                                headers={"Retry-After": "1"})
+        return SlotStreamingResponse(
+            streamer.stream(slot, agent, request.message, request.session_id),
+            streamer,
+            slot,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.get("/agents")
+    async def list_agents():
+        return {"agents": sorted(agents)}
+
+    @app.get("/stats")
+    async def stream_stats():
+        return streamer.get_stats()
+
+    return app